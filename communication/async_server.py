@@ -0,0 +1,182 @@
+import asyncio
+import logging
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from communication import client_thread
+
+logger = logging.getLogger("dinasore")
+
+
+class AsyncTcpServer:
+    """
+    asyncio based server for the 4diac management protocol
+
+    Every connection has a reader task that splits the stream into requests
+    and a worker task that answers them in order, so a client may pipeline
+    several requests without waiting for each response. The manager calls
+    run in a bounded thread pool, shared by all the connections.
+    """
+
+    # header of each request part: 0x50 followed by the length (2 bytes)
+    HEADER_SIZE = 3
+
+    def __init__(
+        self,
+        ip,
+        port,
+        limit_connections,
+        config_m,
+        idle_timeout=300,
+        max_workers=4,
+        pipeline_depth=8,
+    ):
+        self.config_m = config_m
+        self.ip = ip
+        self.port = port
+        self.limit_connections = limit_connections
+        self.idle_timeout = idle_timeout
+        self.pipeline_depth = pipeline_depth
+
+        # bounded pool where the manager parses the requests
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="diac_worker"
+        )
+
+        self.connections = set()
+        self.server = None
+        self.loop = None
+        self.started = threading.Event()
+
+    async def serve(self):
+        self.loop = asyncio.get_running_loop()
+        self.server = await asyncio.start_server(
+            self.handle_connection,
+            self.ip,
+            self.port,
+            reuse_address=True,
+            backlog=self.limit_connections,
+        )
+        logger.info("starting up on {0} port {1}".format(self.ip, self.port))
+        self.started.set()
+
+        async with self.server:
+            try:
+                await self.server.serve_forever()
+            except asyncio.CancelledError:
+                pass
+
+    def serve_forever(self, loop=None):
+        # loop: asyncio loop of another thread to share (e.g. the asyncua server loop)
+        try:
+            if loop is None:
+                asyncio.run(self.serve())
+            else:
+                asyncio.run_coroutine_threadsafe(self.serve(), loop).result()
+        finally:
+            self.executor.shutdown(wait=False)
+
+    def stop_server(self):
+        if self.loop is not None and self.server is not None:
+            self.loop.call_soon_threadsafe(self.server.close)
+        self.executor.shutdown(wait=False)
+
+    async def handle_connection(self, reader, writer):
+        client_address = writer.get_extra_info("peername")
+
+        # refuses the clients above the limit
+        if len(self.connections) >= self.limit_connections:
+            logger.warning(
+                "refusing connection from {0} (limit of {1} connections)".format(
+                    client_address, self.limit_connections
+                )
+            )
+            writer.close()
+            return
+
+        logger.info("connection from {0}".format(client_address))
+        requests = asyncio.Queue(maxsize=self.pipeline_depth)
+        worker = asyncio.create_task(self.answer_requests(requests, writer))
+        self.connections.add(worker)
+
+        try:
+            while True:
+                request = await self.read_request(reader)
+                if request is None:
+                    logger.info("no more data from {0}".format(client_address))
+                    break
+                # waits while the pipeline of that connection is full
+                await requests.put(request)
+        except asyncio.TimeoutError:
+            logger.warning("closing idle connection from {0}".format(client_address))
+        except (asyncio.IncompleteReadError, ConnectionError) as error:
+            logger.info("connection from {0} lost".format(client_address))
+            logger.info(error)
+        finally:
+            # lets the worker answer the pending requests
+            await requests.put(None)
+            await worker
+            self.connections.discard(worker)
+            writer.close()
+
+    async def read_request(self, reader):
+        # the first part of the header carries the configuration id
+        try:
+            header = await asyncio.wait_for(
+                reader.readexactly(self.HEADER_SIZE), self.idle_timeout
+            )
+        except asyncio.IncompleteReadError as error:
+            if len(error.partial) == 0:
+                return None
+            raise
+
+        config_id = await self.read_part(reader, header)
+        header = await asyncio.wait_for(
+            reader.readexactly(self.HEADER_SIZE), self.idle_timeout
+        )
+        data = await self.read_part(reader, header)
+
+        return config_id.decode("utf-8"), data.decode("utf-8")
+
+    async def read_part(self, reader, header):
+        (size,) = struct.unpack(">H", header[1:3])
+        if size == 0:
+            return b""
+        return await asyncio.wait_for(reader.readexactly(size), self.idle_timeout)
+
+    async def answer_requests(self, requests, writer):
+        loop = asyncio.get_running_loop()
+        closed = False
+        while True:
+            request = await requests.get()
+            if request is None:
+                break
+            # keeps consuming the queue so the reader never blocks
+            if closed:
+                continue
+
+            config_id, data_str = request
+            logger.debug("received {0}".format(data_str))
+            try:
+                response = await loop.run_in_executor(
+                    self.executor,
+                    client_thread.dispatch_request,
+                    self.config_m,
+                    config_id,
+                    data_str,
+                )
+                logger.debug("sending response {0}".format(response))
+                writer.write(response)
+                await writer.drain()
+
+            except ConnectionError as error:
+                logger.info(error)
+                closed = True
+
+            except Exception as ex:
+                # same as the thread server, drops the client
+                logger.error("can not parse the request {0}".format(data_str))
+                logger.exception(ex)
+                writer.close()
+                closed = True
@@ -4,6 +4,26 @@ import logging
 logger = logging.getLogger("dinasore")
 
 
+def remove_service_symbols(data):
+    if "&apos;" in data:
+        data = data.replace("&apos;", "")
+        logger.error(f"After replacement: {data}")
+    elif "&quote;" in data:
+        data = data.replace("&quote;", "")
+        logger.error(f"After replacement: {data}")
+    return data
+
+
+def dispatch_request(config_m, config_id, data_str):
+    # requests without a configuration id go to the device manager
+    data_str = remove_service_symbols(data_str)
+    if config_id == "":
+        response = config_m.parse_general(data_str)
+    else:
+        response = config_m.parse_configuration(data_str, config_id)
+    return response
+
+
 class ClientThread(threading.Thread):
     def __init__(self, connection, client_address, config_m):
         threading.Thread.__init__(
@@ -37,25 +57,16 @@ class ClientThread(threading.Thread):
             self.connection.close()
 
     def remove_service_symbols(self, data):
-        if "&apos;" in data:
-            data = data.replace("&apos;", "")
-            logger.error(f"After replacement: {data}")
-        elif "&quote;" in data:
-            data = data.replace("&quote;", "")
-            logger.error(f"After replacement: {data}")
-        return data
+        return remove_service_symbols(data)
 
     def parse_request(self, data):
         config_id_size = int(data[1:3].hex(), 16)
 
         if config_id_size == 0:
+            config_id = ""
             data_str = data[6:].decode("utf-8")
-            data_str = self.remove_service_symbols(data_str)
-            response = self.config_m.parse_general(data_str)
         else:
             config_id = data[3 : config_id_size + 3].decode("utf-8")
             data_str = data[config_id_size + 3 + 3 :].decode("utf-8")
-            data_str = self.remove_service_symbols(data_str)
-            response = self.config_m.parse_configuration(data_str, config_id)
 
-        return response
+        return dispatch_request(self.config_m, config_id, data_str)
@@ -0,0 +1,513 @@
+import copy
+import logging
+import math
+import os
+import sys
+import threading
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import combinations
+
+import joblib
+import numpy as np
+import sklearn
+from sklearn.cluster import DBSCAN
+from sklearn.covariance import EllipticEnvelope
+from sklearn.decomposition import PCA
+from sklearn.preprocessing import StandardScaler
+from sklearn.svm import OneClassSVM
+
+from core import anomaly_models
+from core import monitoring_log
+
+logger = logging.getLogger("dinasore")
+
+# First element is True or False either if it is a neighbourhood-based method or not
+ALGORITHMS = [
+    (False, "Empirical Covariance"),
+    (True, "DBSCAN"),
+    (False, "One Class SVM"),
+]
+
+COLLECTING, TRAINING, CLASSIFYING = "collecting", "training", "classifying"
+
+
+def avg_dist(points):
+    # mean distance between all base points for neighbourhood-based methods (e.g. DBSCAN)
+    distances = [math.dist(p1, p2) for p1, p2 in combinations(points, 2)]
+    return sum(distances) / len(distances)
+
+
+class TrainedModels:
+    """
+    Monitoring - Fitted pre-processing and algorithms of one function block
+
+    Scoring a sample goes through every support vector of the SVM and every
+    training point of DBSCAN, so its cost grows with the training set. The
+    online models (-o, anomaly_models.OnlineModels) have a bounded cost.
+    """
+
+    def __init__(self, scaler, pca, covariance, dbscan, svm, points):
+        self.scaler = scaler
+        self.pca = pca
+        self.covariance = covariance
+        self.dbscan = dbscan
+        self.svm = svm
+        # training data in the pca space, the DBSCAN neighbours
+        self.points = points
+
+    @staticmethod
+    def predict_batch(models, points):
+        return {name: PREDICTIONS[name](models, points) for _, name in ALGORITHMS}
+
+    def update(self, point):
+        # the batch models are only trained once
+        pass
+
+
+def fit_models(anomaly_data, contamination):
+    # Normalize and apply PCA to the training data
+    result = PCA(n_components=2).fit_transform(
+        StandardScaler().fit_transform(anomaly_data)
+    )
+
+    # Predict outliers - use DBSCAN (unsupervised technique) for first filtering of outliers
+    dbscan = DBSCAN(eps=avg_dist(result), metric="euclidean", min_samples=2)
+    filtered = anomaly_data[dbscan.fit_predict(result) != -1]
+
+    # Train algorithms with the filtered data
+    scaler = StandardScaler()
+    pca = PCA(n_components=2)
+    points = pca.fit_transform(scaler.fit_transform(filtered))
+    covariance = EllipticEnvelope(support_fraction=1, contamination=contamination)
+    covariance.fit(points)
+    svm = OneClassSVM(kernel="rbf", nu=contamination, gamma=0.05)
+    svm.fit(points)
+    return TrainedModels(scaler, pca, covariance, dbscan, svm, points)
+
+
+def fit_online_models(online, anomaly_data):
+    # runs in the training process, returns the fitted copy of the online models
+    online.fit_detectors(anomaly_data, avg_dist(online.transform(anomaly_data)))
+    return online
+
+
+def predict_svm(models, points):
+    # rbf kernel sum over the support vectors of every fb (padded with zero weights),
+    # the cost grows with the support vectors of the batch models
+    size = max(len(m.svm.support_vectors_) for m in models)
+    vectors = np.zeros((len(models), size, points.shape[1]))
+    weights = np.zeros((len(models), size))
+    for i, m in enumerate(models):
+        vectors[i, : len(m.svm.support_vectors_)] = m.svm.support_vectors_
+        weights[i, : len(m.svm.support_vectors_)] = m.svm.dual_coef_[0]
+    gamma = np.array([m.svm.gamma for m in models])
+    distances = ((vectors - points[:, None, :]) ** 2).sum(axis=2)
+    intercept = np.array([m.svm.intercept_[0] for m in models])
+    decision = (weights * np.exp(-gamma[:, None] * distances)).sum(axis=1) + intercept
+    return np.where(decision > 0, 1, -1)
+
+
+def predict_dbscan(models, points):
+    # with min_samples=2 a new sample joins a cluster when any training sample is within eps,
+    # every training sample is compared (the online models search a kd-tree of core points)
+    size = max(len(m.points) for m in models)
+    neighbours = np.full((len(models), size, points.shape[1]), np.inf)
+    for i, m in enumerate(models):
+        neighbours[i, : len(m.points)] = m.points
+    eps = np.array([m.dbscan.eps for m in models])
+    distances = np.sqrt(((neighbours - points[:, None, :]) ** 2).sum(axis=2))
+    return np.where(distances.min(axis=1) <= eps, 1, -1)
+
+
+PREDICTIONS = {
+    "Empirical Covariance": anomaly_models.predict_covariance,
+    "DBSCAN": predict_dbscan,
+    "One Class SVM": predict_svm,
+}
+
+
+class AnomalyDetector:
+    """
+    Monitoring - Training data and models of one monitored function block
+    """
+
+    def __init__(self, fb, models_path=None):
+        self.fb = fb
+        self.monitoring_path = fb.monitoring_path
+        # folder of the persisted models (None does not persist them)
+        self.models_path = models_path
+        training_samples, self.time_per_sample = fb.monitor_fb
+
+        # Time lag like in predictive maintenance approaches
+        self.training_samples = (training_samples * 4) - 3
+        self.contamination = 1 / self.training_samples
+        self.anomaly_data = []
+        self.models = None
+        # guards the models while they learn from the samples or are saved
+        self.lock = threading.Lock()
+        self.state = COLLECTING
+        # a training is running (the first one or a new one while classifying)
+        self.training = False
+        # classified samples since the last training
+        self.classified = 0
+        # latest results, published by the service after each tick
+        self.features = []
+        self.predictions = {name: 0 for _, name in ALGORITHMS}
+        # consecutive samples found anomalous by most of the algorithms
+        self.alerts = 0
+        self.published_state = None
+        # waits for all function blocks and then for the first event
+        self.ready_ns = time.monotonic_ns() + 5 * 10**9
+        self.start_ns = None
+
+        # event counts, training samples and predictions of the fb
+        self.log = monitoring_log.MonitoringLog(
+            monitoring_log.log_path(self.monitoring_path, fb.fb_name),
+            [name for _, name in ALGORITHMS],
+        )
+        # a restarted fb with the same schema goes straight into classification
+        self.load_models()
+
+    def schema(self):
+        # the models can only be reused with the same features and algorithms
+        return {
+            "fb_type": self.fb.fb_type,
+            "features": list(self.fb.MONITOR_FEATURES),
+            "windows": list(self.fb.MONITOR_WINDOWS),
+            "monitor": list(self.fb.monitor_fb),
+            "algorithms": [name for _, name in ALGORITHMS],
+            "models": type(self).__name__,
+            "sklearn": sklearn.__version__,
+        }
+
+    def models_file(self):
+        return os.path.join(
+            self.models_path, "{0}__{1}.joblib".format(self.fb.fb_name, self.fb.fb_type)
+        )
+
+    def save_models(self):
+        if self.models_path is None or self.models is None:
+            return
+        try:
+            os.makedirs(self.models_path, exist_ok=True)
+            # replaced at once, a crash never leaves half a file
+            temp_file = self.models_file() + ".tmp"
+            # the copy is written without holding the models
+            with self.lock:
+                saved = {"schema": self.schema(), "models": copy.deepcopy(self.models)}
+            joblib.dump(saved, temp_file)
+            os.replace(temp_file, self.models_file())
+        except OSError as exc:
+            logger.warning("can not save the models of {0}: {1}".format(self.fb.fb_name, exc))
+
+    def load_models(self):
+        if self.models_path is None or not os.path.exists(self.models_file()):
+            return
+        try:
+            saved = joblib.load(self.models_file())
+        except Exception as exc:
+            logger.warning("can not load the models of {0}: {1}".format(self.fb.fb_name, exc))
+            return
+        if saved.get("schema") != self.schema():
+            logger.info("the monitoring of {0} changed, training new models".format(self.fb.fb_name))
+            return
+        self.use_models(saved["models"])
+        logger.info("loaded the models of {0}".format(self.fb.fb_name))
+
+    def use_models(self, models):
+        self.write_points(models.points)
+        self.models = models
+        self.state = CLASSIFYING
+
+    def close(self):
+        self.log.close()
+
+    def write_2_file(self, vals, method_name, pred_val):
+        self.log.sample(method_name, vals, pred_val)
+
+    def write_points(self, points, mode="w"):
+        # Update visualization data
+        self.log.training(np.around(points, 2), mode)
+        self.log.flush()
+
+    def take_sample(self):
+        # Get new sample from Anomaly Detection
+        self.log.events(*self.fb.get_event_counts())
+        self.features = self.fb.get_monitoring()
+        return self.features
+
+    def set_predictions(self, predictions):
+        self.predictions = predictions
+        anomalous = sum(1 for prediction in predictions.values() if prediction == -1)
+        self.alerts = self.alerts + 1 if anomalous * 2 > len(predictions) else 0
+
+    def due(self, now_ns):
+        if self.start_ns is None:
+            if now_ns < self.ready_ns or not self.fb.first_event:
+                return False
+            # the first sample covers a whole time_per_sample
+            self.start_ns = now_ns + int(self.time_per_sample * 1e9)
+        return now_ns >= self.start_ns
+
+    def collect(self, new_sample):
+        # returns True when there are enough samples to train
+        self.anomaly_data.append(new_sample)
+        if len(self.anomaly_data) >= 2:
+            # just for visualization purposes - remove for accelerated processing
+            data = np.array(self.anomaly_data)
+            self.write_points(
+                PCA(n_components=2).fit_transform(StandardScaler().fit_transform(data))
+            )
+        return len(self.anomaly_data) > self.training_samples
+
+    def classified_sample(self, new_sample):
+        # the last samples are the training data of the next models
+        self.anomaly_data.append(new_sample)
+        del self.anomaly_data[: -(self.training_samples + 1)]
+        self.classified += 1
+
+    def training_job(self):
+        # picklable function and arguments that return the fitted models
+        return fit_models, np.array(self.anomaly_data), self.contamination
+
+    def trained(self, future):
+        # called when the training finishes, the models are swapped at once
+        try:
+            models = future.result()
+        except Exception as exc:
+            logger.error("can not train the models of {0}: {1}".format(self.fb.fb_name, exc))
+            self.training_failed()
+            self.training = False
+            return
+        self.classified = 0
+        self.use_models(models)
+        # a finished training always has its models in place
+        self.training = False
+        self.save_models()
+
+    def training_failed(self):
+        # starts a new training set (or keeps classifying with the old models)
+        if self.models is None:
+            self.anomaly_data = []
+            self.state = COLLECTING
+
+
+class OnlineAnomalyDetector(AnomalyDetector):
+    """
+    Monitoring - Anomaly detector with incremental pre-processing, the
+    collected samples update the scaler and PCA instead of refitting them
+    """
+
+    def __init__(self, fb, models_path=None):
+        self.online = None
+        AnomalyDetector.__init__(self, fb, models_path)
+        if self.online is None:
+            self.online = anomaly_models.OnlineModels(self.contamination)
+
+    def collect(self, new_sample):
+        self.anomaly_data.append(new_sample)
+        # only the new projections are appended to the visualization files
+        self.write_points(self.online.partial_fit_projection(new_sample), mode="a")
+        return len(self.anomaly_data) > self.training_samples
+
+    def training_job(self):
+        # the online models keep learning, they are only trained once
+        if self.models is not None:
+            return None
+        return fit_online_models, self.online, np.array(self.anomaly_data)
+
+    def training_failed(self):
+        self.anomaly_data = []
+        self.online = anomaly_models.OnlineModels(self.contamination)
+        self.state = COLLECTING
+
+    def use_models(self, models):
+        # the training data is not needed anymore
+        self.anomaly_data = []
+        self.online = models
+        AnomalyDetector.use_models(self, models)
+
+    def classified_sample(self, new_sample):
+        pass
+
+    def close(self):
+        # keeps what the detectors learned while classifying
+        self.save_models()
+        AnomalyDetector.close(self)
+
+
+class AnomalyService(threading.Thread):
+    """
+    Monitoring - Node-level thread that samples every monitored function block
+    at a common tick, scores them in one batch per algorithm and trains the
+    models in a bounded pool of processes, so the fits never hold the GIL of
+    the runtime. With retrain_samples, the models are trained again with the
+    last samples while the old ones keep classifying.
+    """
+
+    def __init__(
+        self,
+        tick=1.0,
+        max_trainings=2,
+        online=False,
+        models_path=None,
+        processes=True,
+        retrain_samples=None,
+    ):
+        threading.Thread.__init__(self, name="anomaly_service", daemon=True)
+        self.tick = tick
+        self.models_path = models_path
+        self.retrain_samples = retrain_samples
+        self.detector_class = OnlineAnomalyDetector if online else AnomalyDetector
+        self.detectors = dict()
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        if processes:
+            # spawn, forking a process with the fb threads running is not safe
+            self.pool = ProcessPoolExecutor(
+                max_workers=max_trainings, mp_context=multiprocessing.get_context("spawn")
+            )
+        else:
+            self.pool = ThreadPoolExecutor(
+                max_workers=max_trainings, thread_name_prefix="anomaly_train"
+            )
+        # callables that receive the updated detectors after each tick
+        self.publishers = []
+
+    def add_publisher(self, publisher):
+        with self.lock:
+            if publisher not in self.publishers:
+                self.publishers.append(publisher)
+
+    def remove_publisher(self, publisher):
+        with self.lock:
+            if publisher in self.publishers:
+                self.publishers.remove(publisher)
+
+    def register(self, fb):
+        detector = self.detector_class(fb, self.models_path)
+        with self.lock:
+            self.detectors[fb.fb_name] = detector
+        return detector
+
+    def unregister(self, fb):
+        with self.lock:
+            detector = self.detectors.get(fb.fb_name)
+            if detector is None or detector.fb is not fb:
+                return
+            del self.detectors[fb.fb_name]
+        # saving the models never blocks the sampling of the other fbs
+        detector.close()
+
+    def run(self):
+        while not self.stop_event.wait(self.tick):
+            self.sample(time.monotonic_ns())
+
+    def stop(self):
+        self.stop_event.set()
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+    def train(self, detector):
+        job = detector.training_job()
+        if job is None:
+            return
+        detector.training = True
+        future = self.pool.submit(*job)
+        future.add_done_callback(detector.trained)
+
+    def sample(self, now_ns):
+        with self.lock:
+            detectors = [d for d in self.detectors.values() if not d.fb.stop_thread]
+
+        scored, samples, updated = [], [], []
+        for detector in detectors:
+            if not detector.due(now_ns) or detector.state == TRAINING:
+                # the trainings finish between the ticks
+                if detector.state != detector.published_state:
+                    updated.append(detector)
+                continue
+            updated.append(detector)
+            new_sample = detector.take_sample()
+            if detector.state == CLASSIFYING:
+                scored.append(detector)
+                samples.append(new_sample)
+                detector.classified_sample(new_sample)
+                if (
+                    self.retrain_samples is not None
+                    and not detector.training
+                    and detector.classified >= self.retrain_samples
+                ):
+                    self.train(detector)
+            elif detector.collect(new_sample):
+                detector.state = TRAINING
+                self.train(detector)
+
+        if len(scored) > 0:
+            self.classify(scored, np.array(samples, dtype=float))
+        # one write per fb and tick
+        for detector in detectors:
+            detector.log.flush()
+
+        if len(updated) > 0:
+            for detector in updated:
+                detector.published_state = detector.state
+            for publisher in list(self.publishers):
+                try:
+                    publisher(updated)
+                except Exception as exc:
+                    logger.warning("can not publish the anomaly results: {0}".format(exc))
+
+    @staticmethod
+    def classify(detectors, samples):
+        # one batch per kind of models (batch or online)
+        groups = dict()
+        for index, detector in enumerate(detectors):
+            groups.setdefault(type(detector.models), []).append(index)
+
+        for models_class, indexes in groups.items():
+            models = [detectors[i].models for i in indexes]
+            points = anomaly_models.project(models, samples[indexes])
+            predictions = models_class.predict_batch(models, points)
+            rounded = np.around(points).tolist()
+            for _, name in ALGORITHMS:
+                for i, vals, prediction in zip(indexes, rounded, predictions[name]):
+                    detectors[i].write_2_file(vals, name, int(prediction))
+            for position, i in enumerate(indexes):
+                detectors[i].set_predictions(
+                    {name: int(predictions[name][position]) for _, name in ALGORITHMS}
+                )
+
+            # the samples that every algorithm finds normal
+            normal = np.all([predictions[name] == 1 for _, name in ALGORITHMS], axis=0)
+            for i, model, point, is_normal in zip(indexes, models, points, normal):
+                if is_normal:
+                    with detectors[i].lock:
+                        model.update(point)
+
+
+_service = None
+_service_lock = threading.Lock()
+_service_options = dict()
+
+
+def configure(**options):
+    # options of the service created by the first monitored fb (e.g. online=True)
+    _service_options.update(options)
+
+
+def get_service(tick=1.0):
+    # the service is shared by all the monitored fbs of the node
+    global _service
+    with _service_lock:
+        if _service is None:
+            options = dict(_service_options)
+            # not inside resources/monitoring, which is cleared at start
+            options.setdefault(
+                "models_path",
+                os.path.join(os.path.dirname(sys.path[0]), "resources", "anomaly_models"),
+            )
+            _service = AnomalyService(max(tick, 0.1), **options)
+            _service.start()
+        return _service
@@ -0,0 +1,134 @@
+import numpy as np
+from scipy.stats import chi2
+from sklearn.cluster import DBSCAN
+from sklearn.decomposition import IncrementalPCA
+from sklearn.kernel_approximation import RBFSampler
+from sklearn.linear_model import SGDOneClassSVM
+from sklearn.neighbors import KDTree
+from sklearn.preprocessing import StandardScaler
+
+
+def project(models, samples):
+    # scaler and pca of every fb applied in one pass, samples is (fbs, features)
+    mean = np.stack([m.scaler.mean_ for m in models])
+    scale = np.stack([m.scaler.scale_ for m in models])
+    pca_mean = np.stack([m.pca.mean_ for m in models])
+    components = np.stack([m.pca.components_ for m in models])
+    scaled = (samples - mean) / scale
+    return np.einsum("fd,fkd->fk", scaled - pca_mean, components)
+
+
+def predict_covariance(models, points):
+    # the EllipticEnvelope decision is the negative mahalanobis distance minus the offset
+    location = np.stack([m.covariance.location_ for m in models])
+    precision = np.stack([m.covariance.precision_ for m in models])
+    offset = np.array([m.covariance.offset_ for m in models])
+    diff = points - location
+    decision = -np.einsum("fi,fij,fj->f", diff, precision, diff) - offset
+    return np.where(decision >= 0, 1, -1)
+
+
+class OnlineCovariance:
+    """
+    Monitoring - Running mean and covariance (Welford) with a chi-square
+    threshold on the mahalanobis distance, the online EllipticEnvelope
+    """
+
+    def __init__(self, contamination, n_components=2):
+        self.count = 0
+        self.location_ = np.zeros(n_components)
+        self.comoment = np.zeros((n_components, n_components))
+        # decision = -mahalanobis - offset_, like the EllipticEnvelope
+        self.offset_ = -chi2.ppf(1 - contamination, df=n_components)
+        self.precision_ = np.eye(n_components)
+
+    def partial_fit(self, points):
+        for point in points:
+            self.count += 1
+            delta = point - self.location_
+            self.location_ = self.location_ + delta / self.count
+            self.comoment += np.outer(delta, point - self.location_)
+        if self.count > 1:
+            self.precision_ = np.linalg.pinv(self.comoment / (self.count - 1))
+        return self
+
+
+class OnlineModels:
+    """
+    Monitoring - Incremental pre-processing and novelty detectors of one function block
+
+    The scaler and PCA are updated with each collected sample, DBSCAN runs
+    once over the training data and new samples are matched to the nearest
+    core point through a KD-tree, and the covariance and the one-class SVM
+    (on random fourier features) keep learning from the normal samples.
+    """
+
+    def __init__(self, contamination, gamma=0.05, n_features=100):
+        self.contamination = contamination
+        self.scaler = StandardScaler()
+        self.pca = IncrementalPCA(n_components=2)
+        self.pending = []
+        self.covariance = OnlineCovariance(contamination)
+        self.rbf = RBFSampler(gamma=gamma, n_components=n_features, random_state=0)
+        self.svm = SGDOneClassSVM(nu=contamination, random_state=0)
+        self.dbscan = None
+        self.tree = None
+        # filtered training data in the pca space
+        self.points = None
+
+    def partial_fit_projection(self, sample):
+        # returns the projection of the samples used to update the pca (maybe none)
+        sample = np.asarray(sample, dtype=float).reshape(1, -1)
+        self.scaler.partial_fit(sample)
+        self.pending.append(sample[0])
+        # the first pca update needs n_components samples
+        if len(self.pending) < self.pca.n_components:
+            return np.empty((0, self.pca.n_components))
+        batch = self.scaler.transform(np.array(self.pending))
+        self.pending = []
+        self.pca.partial_fit(batch)
+        return self.pca.transform(batch)
+
+    def transform(self, samples):
+        return self.pca.transform(self.scaler.transform(samples))
+
+    def fit_detectors(self, anomaly_data, eps):
+        # one DBSCAN pass filters the outliers and gives the core points
+        points = self.transform(anomaly_data)
+        self.dbscan = DBSCAN(eps=eps, metric="euclidean", min_samples=2).fit(points)
+        core = points[self.dbscan.core_sample_indices_]
+        if len(core) == 0:
+            raise ValueError("DBSCAN found no core points in the training data")
+        self.tree = KDTree(core)
+        filtered = points[self.dbscan.labels_ != -1]
+
+        self.covariance.partial_fit(filtered)
+        self.rbf.fit(filtered)
+        self.svm.fit(self.rbf.transform(filtered))
+        self.points = filtered
+        return filtered
+
+    @staticmethod
+    def predict_batch(models, points):
+        # every algorithm of every fb, the cost does not depend on the training size
+        predictions = dict()
+        predictions["Empirical Covariance"] = predict_covariance(models, points)
+
+        distances = np.array([m.tree.query(p.reshape(1, -1), k=1)[0][0, 0] for m, p in zip(models, points)])
+        eps = np.array([m.dbscan.eps for m in models])
+        predictions["DBSCAN"] = np.where(distances <= eps, 1, -1)
+
+        weights = np.stack([m.rbf.random_weights_ for m in models])
+        offsets = np.stack([m.rbf.random_offset_ for m in models])
+        features = np.cos(np.einsum("fk,fkn->fn", points, weights) + offsets)
+        features *= np.sqrt(2.0) / np.sqrt(weights.shape[2])
+        coef = np.stack([m.svm.coef_ for m in models])
+        decision = np.einsum("fn,fn->f", features, coef) - np.array([m.svm.offset_[0] for m in models])
+        predictions["One Class SVM"] = np.where(decision >= 0, 1, -1)
+        return predictions
+
+    def update(self, point):
+        # normal samples keep the novelty detectors up to date
+        point = point.reshape(1, -1)
+        self.covariance.partial_fit(point)
+        self.svm.partial_fit(self.rbf.transform(point))
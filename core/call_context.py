@@ -0,0 +1,56 @@
+import itertools
+from concurrent.futures import Future, InvalidStateError
+
+
+class CallContext(Future):
+    """
+    Correlates the executions of one call that flows through a chain of fbs
+
+    The context travels with the events of the call: each fb applies the
+    inputs of the call before executing and saves its outputs in the slot
+    of the call, so concurrent calls never read each other's values. The
+    result (the values of the requested outputs) is set when the final fb
+    executes.
+    """
+
+    ids = itertools.count(1)
+
+    def __init__(self, final_fb, inputs=None, outputs=None):
+        Future.__init__(self)
+        self.call_id = next(self.ids)
+        self.final_fb = final_fb
+        # fb name -> {input var: value} given by the caller
+        self.inputs = inputs if inputs is not None else dict()
+        # [(fb name, output var)] returned as the result
+        self.outputs = outputs if outputs is not None else []
+        # fb name -> {output var: value} of the fbs executed by this call
+        self.values = dict()
+
+    def __repr__(self):
+        return "CallContext({0}, {1})".format(self.call_id, self.final_fb)
+
+    def apply_inputs(self, fb):
+        # values of this call: connections from the fbs it executed, then the caller inputs
+        for var_name in fb.input_vars:
+            connection = fb.input_connections.get(var_name)
+            if connection is None:
+                continue
+            values = self.values.get(connection.source_fb.fb_name, dict())
+            if connection.source_value_name in values:
+                fb.set_attr(var_name, new_value=values[connection.source_value_name])
+        for var_name, value in self.inputs.get(fb.fb_name, dict()).items():
+            fb.set_attr(var_name, new_value=value)
+
+    def executed(self, fb):
+        # saves the outputs of the fb in the slot of this call
+        self.values[fb.fb_name] = {
+            var_name: value for var_name, (_, value) in fb.read_values(fb.output_vars).items()
+        }
+        if fb.fb_name == self.final_fb:
+            try:
+                self.set_result(
+                    [self.values.get(fb_name, dict()).get(var_name) for fb_name, var_name in self.outputs]
+                )
+            except InvalidStateError:
+                # already expired (or the final fb executed again in this call)
+                pass
@@ -7,8 +7,9 @@ from typing import List
 
 from core import fb
 from core import fb_interface
+from core import startup_profile
 from core.fb_resources import FBResources
-from data_model_fboot.utils import create_fb_index
+from data_model_fboot.fb_files import create_fb_index
 
 logger = logging.getLogger("dinasore")
 wlog = logging.getLogger("Watch")
@@ -54,6 +55,7 @@ class Configuration:
         fb2update = self.get_fb(fb_name)
         fb2update.ua_variables_update = ua_update
 
+    @startup_profile.timed("fb creation")
     def create_fb(self, fb_name, fb_resource: FBResources, monitor=False):
         logger.info("creating a new fb...")
 
@@ -230,6 +232,7 @@ class Configuration:
         fb_watches_len = len(resources_xml.findall("FB"))
         return resources_xml, fb_watches_len
 
+    @startup_profile.timed("start_work")
     def start_work(self):
         logger.info("starting the fb flow...")
         for fb_name, fb_element in self.fb_dictionary.items():
@@ -57,6 +57,7 @@ class FB(threading.Thread, fb_interface.FBInterface):
             logger.info(f"len of inputs: {len(inputs)}")
             event = inputs[0]
 
+            started = self.usage.start()
             try:
                 outputs = self.fb_obj.schedule(*inputs)
 
@@ -78,6 +79,7 @@ class FB(threading.Thread, fb_interface.FBInterface):
                 break
 
             else:
+                self.usage.stop(started)
                 # If the thread blocks inside any fb method
                 if self.kill_event.is_set():
                     break
@@ -104,6 +106,8 @@ class FB(threading.Thread, fb_interface.FBInterface):
 
     def stop(self):
         self.stop_thread = True
+        if self.monitor_fb is not None:
+            self.anomaly_service.unregister(self)
 
         self.kill_event.set()
         self.push_event("unblock", 1)
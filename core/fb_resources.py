@@ -3,7 +3,7 @@ import os
 import sys
 import xml.etree.ElementTree as ETree
 import logging
-from data_model_fboot import utils
+from data_model_fboot import fb_files
 
 from time import perf_counter
 
@@ -93,7 +93,7 @@ class FBResources:
             for varDec in tree.findall(".//VarDeclaration"):
                 if (
                     varDec.get("Type") is not None
-                    and varDec.get("Type") not in utils.XML_4DIAC
+                    and varDec.get("Type") not in fb_files.XML_4DIAC
                 ):
                     logger.error(
                         'Unknown data type "{0}" assigned to variable {1}'.format(
@@ -0,0 +1,109 @@
+import inspect
+import sys
+import time
+import tracemalloc
+
+# columns of the summary table
+COLUMNS = ("FB", "TYPE", "EXECUTIONS", "CPU_S", "CPU_SHARE_%", "AVG_MS", "MAX_MS", "QUEUE", "QUEUE_BYTES", "ALLOC_BYTES")
+
+
+class FBUsage:
+    """
+    Cpu time spent by one fb in schedule(), measured with the clock of its thread
+
+    Only the fb thread writes the counters, the readers (monitoring thread,
+    summary) read them without a lock.
+    """
+
+    def __init__(self):
+        self.executions = 0
+        self.cpu_time = 0.0
+        self.max_cpu_time = 0.0
+        # memory traced to the source file of the fb (tracemalloc) and its change
+        self.alloc_bytes = 0
+        self.alloc_delta = 0
+
+    @staticmethod
+    def start():
+        return time.thread_time()
+
+    def stop(self, started):
+        elapsed = time.thread_time() - started
+        self.executions += 1
+        self.cpu_time += elapsed
+        if elapsed > self.max_cpu_time:
+            self.max_cpu_time = elapsed
+
+    def average(self):
+        return 0.0 if self.executions == 0 else self.cpu_time / self.executions
+
+
+def queue_bytes(fb):
+    # approximate memory of the events waiting in the queue of the fb
+    with fb.event_queue.mutex:
+        items = list(fb.event_queue.queue)
+    total = 0
+    for item in items:
+        total += sys.getsizeof(item) + sum(sys.getsizeof(part) for part in item)
+    return total
+
+
+def start_tracing(frames=1):
+    # the allocations are attributed to the fb source files (optional, slows every allocation)
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+
+
+def source_file(fb):
+    try:
+        return inspect.getsourcefile(type(fb.fb_obj))
+    except TypeError:
+        return None
+
+
+def update_allocations(fbs):
+    # memory traced to the source file of each fb, the instances of a type share it
+    if not tracemalloc.is_tracing():
+        return
+    snapshot = tracemalloc.take_snapshot()
+    sizes = {stat.traceback[0].filename: stat.size for stat in snapshot.statistics("filename")}
+    for fb in fbs:
+        alloc_bytes = sizes.get(source_file(fb), 0)
+        fb.usage.alloc_delta = alloc_bytes - fb.usage.alloc_bytes
+        fb.usage.alloc_bytes = alloc_bytes
+
+
+def measured_fbs(config):
+    return [fb for fb_name, fb in config.fb_dictionary.items() if fb_name != "START"]
+
+
+def summary(config):
+    # one row per fb (COLUMNS), the most expensive first
+    fbs = measured_fbs(config)
+    update_allocations(fbs)
+    total = sum(fb.usage.cpu_time for fb in fbs) or 1.0
+    rows = [
+        (
+            fb.fb_name,
+            fb.fb_type,
+            fb.usage.executions,
+            round(fb.usage.cpu_time, 6),
+            round(100.0 * fb.usage.cpu_time / total, 1),
+            round(1000.0 * fb.usage.average(), 3),
+            round(1000.0 * fb.usage.max_cpu_time, 3),
+            fb.event_queue.qsize(),
+            queue_bytes(fb),
+            fb.usage.alloc_bytes,
+        )
+        for fb in fbs
+    ]
+    rows.sort(key=lambda row: row[3], reverse=True)
+    return rows
+
+
+def format_table(rows):
+    cells = [COLUMNS] + [tuple(str(value) for value in row) for row in rows]
+    widths = [max(len(row[index]) for row in cells) for index in range(len(COLUMNS))]
+    return "\n".join(
+        "  ".join(value.ljust(width) for value, width in zip(row, widths)).rstrip() for row in cells
+    )
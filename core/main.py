@@ -16,8 +16,11 @@ sys.path.insert(0, os.getcwd())
 sys.path.insert(0, os.path.join(os.getcwd(), "resources"))
 # sys.path.insert(0, os.path.join(os.getcwd(),"resources","energy_management_system"))
 
-from communication import tcp_server
-from core import manager
+from core import startup_profile
+
+with startup_profile.phase("imports"):
+    from communication import tcp_server
+    from core import manager
 
 
 logger = logging.getLogger("dinasore")  # __name__ is a common choice
@@ -119,6 +122,12 @@ if __name__ == "__main__":
     secs_sample = 20
     monitor = [n_samples, secs_sample]
     agent = False
+    use_async = False
+    startup_times = False
+    headless = False
+    ua_rate = None
+    ua_backend = "opcua"
+    history_path = None
 
     help_message = (
         "Usage: python core/main.py [ARGS]\n\n"
@@ -129,11 +138,19 @@ if __name__ == "__main__":
         " -l, --log_level: logging level at the file resources/error_list.log\n"
         "                  INFO, WARN or ERROR (default: ERROR)\n"
         " -g, --agent: sets on the self-organizing agent\n"
+        " -s, --async: serves the 4diac communication with the asyncio server\n"
         " -m, --monitor: activates the behavioral anomaly detection feature. \n"
         "       If no parameters are specified, the default values are 10 samples\n"
         "       for the initial training dataset and each sample with 20 seconds. \n"
         "       As an example, you can specify the monitoring parameters in the following way (-m 5 10) \n"
         "       meaning 10 samples for training dataset with 10 seconds of monitoring per sample. \n"
+        " -o, --online: uses the online anomaly models (incremental scaler/PCA and partial-fit detectors)\n"
+        " -n, --headless: deploys from the fboot file without the opc-ua server\n"
+        " -r, --ua_rate: maximum opc-ua writes per second of each function block (default: every execution)\n"
+        " -b, --ua_backend: opc-ua server stack, opcua (default) or asyncua\n"
+        " -d, --history: directory of the history of the fb variables, served with opc-ua HistoryRead\n"
+        " -t, --startup_times: prints the time and memory spent in each startup phase\n"
+        " -f, --fb_allocations: traces the allocations of each function block (tracemalloc)\n"
     )
 
     ## build parser for application command line arguments
@@ -167,12 +184,57 @@ if __name__ == "__main__":
     parser.add_argument(
         "-g", action="store_true", help="sets on the self-organizing agent"
     )
+    parser.add_argument(
+        "-s",
+        action="store_true",
+        help="serves the 4diac communication with the asyncio server (connection limits, idle timeouts and request pipelining)",
+    )
     parser.add_argument(
         "-m",
         metavar="monitor",
         nargs="*",
         help="activates the behavioral anomaly detection feature. If no paramters are specified, the default values are 10 samples for initial training, each sample with 20 seconds (approximately 3m20s). As an example, you can specify paramters the following way (-m 5 10) meaning 10 samples for training with 10 seconds each sample.",
     )
+    parser.add_argument(
+        "-o",
+        action="store_true",
+        help="uses the online anomaly models with the monitoring feature (incremental scaler/PCA, kd-tree DBSCAN and partial-fit detectors); without it the cost of scoring a sample grows with the training set (every SVM support vector and DBSCAN training point)",
+    )
+    parser.add_argument(
+        "-n",
+        action="store_true",
+        help="headless node: deploys from data_model.fboot and serves 4diac without the opc-ua server (ignores -u)",
+    )
+    parser.add_argument(
+        "-r",
+        metavar="ua_rate",
+        nargs=1,
+        type=float,
+        help="maximum opc-ua writes per second of each function block, e.g. 10 for dashboards (default: every execution)",
+    )
+    parser.add_argument(
+        "-b",
+        metavar="ua_backend",
+        nargs=1,
+        choices=["opcua", "asyncua"],
+        help="opc-ua server stack: opcua (python-opcua, default) or asyncua (asyncio, shares its loop with -s)",
+    )
+    parser.add_argument(
+        "-d",
+        metavar="history",
+        nargs=1,
+        help="keeps the history of the fb variables in this directory (raw values for 1 hour, 1 s averages for 1 day, 1 min averages for 30 days) and serves it with opc-ua HistoryRead",
+    )
+    parser.add_argument(
+        "-t",
+        action="store_true",
+        help="prints the time and memory spent in each startup phase (imports, fb indexing, ua server, fboot parsing, ...)",
+    )
+    parser.add_argument(
+        "-f",
+        action="store_true",
+        help="traces the memory allocated by each function block (tracemalloc, slows the allocations) for the Usage folders and USAGE_SUMMARY",
+    )
     args = parser.parse_args()
 
     if args.a != None:
@@ -184,6 +246,18 @@ if __name__ == "__main__":
     if args.l != None:
         log_level = log_levels[args.l[0]]
     agent = args.g
+    use_async = args.s
+    startup_times = args.t
+    if not startup_times:
+        # reads the memory of the process in every phase, only for the report
+        startup_profile.profile.stop()
+    headless = args.n
+    if args.r != None:
+        ua_rate = args.r[0]
+    if args.b != None:
+        ua_backend = args.b[0]
+    if args.d != None:
+        history_path = args.d[0]
     if args.m != None:
         if len(args.m) == 2:
             monitor = [int(args.m[0]), int(args.m[1])]
@@ -194,6 +268,14 @@ if __name__ == "__main__":
             exit(2)
     else:
         monitor = None
+    if args.f:
+        from core import fb_usage
+
+        fb_usage.start_tracing()
+    if monitor is not None and args.o:
+        from core import anomaly
+
+        anomaly.configure(online=True)
 
     ##############################################################
     ## remove all files in monitoring folder
@@ -208,20 +290,44 @@ if __name__ == "__main__":
     # Configure the logging output
     setup_logging(log_level)
 
+    # chooses the opc-ua stack before its modules are imported
+    if not headless:
+        from opc_ua import backend
+
+        backend.select(ua_backend)
+
     # creates the 4diac manager
-    m = manager.Manager(monitor=monitor)
-    # sets the ua integration option
+    m = manager.Manager(
+        monitor=monitor, headless=headless, ua_rate=ua_rate, history_path=history_path
+    )
+    # sets the ua integration option (only the fboot loading when headless)
     m.build_ua_manager_fboot(address, port_opc)
 
     # creates the tcp server to communicate with the 4diac
-    hand = tcp_server.TcpServer(address, port_diac, 10, m)
+    if use_async:
+        from communication import async_server
+
+        hand = async_server.AsyncTcpServer(address, port_diac, 10, m)
+    else:
+        hand = tcp_server.TcpServer(address, port_diac, 10, m)
+
+    if startup_times:
+        print(startup_profile.profile.report())
+        # the next deployments are not profiled
+        startup_profile.profile.stop()
 
     try:
         # handles every client
-        while True:
-            hand.handle_client()
+        if use_async and ua_backend == "asyncua" and not headless:
+            # the 4diac and opc-ua servers share one asyncio loop
+            hand.serve_forever(backend.shared_loop().loop)
+        elif use_async:
+            hand.serve_forever()
+        else:
+            while True:
+                hand.handle_client()
     except KeyboardInterrupt:
         logger.info("interrupted server")
-        m.manager_ua.stop_ua()
+        m.manager_ua_fboot.stop_ua()
         hand.stop_server()
         sys.exit(0)
@@ -1,5 +1,5 @@
 from core import configuration
-from data_model_fboot import ua_manager as ua_manager_fboot
+from core import startup_profile
 from xml.etree import ElementTree as ETree
 import time
 import struct
@@ -19,10 +19,16 @@ class Manager:
     4Diac manager class
     """
 
-    def __init__(self, monitor=None):
+    def __init__(self, monitor=None, headless=False, ua_rate=None, history_path=None):
         self.start_time = time.time() * 1000
         self.config_dictionary = dict()
         self.monitor = monitor
+        # deploys from the fboot file without the opc-ua server
+        self.headless = headless
+        # maximum opc-ua writes per second of each fb (None: every execution)
+        self.ua_rate = ua_rate
+        # directory of the history of the fb variables (None: no history)
+        self.history_path = history_path
 
         # attributes responsible for the ua integration
         self.ua_integration = False
@@ -87,10 +93,10 @@ class Manager:
                         # check the options for ua_integration
                         if self.ua_integration:
                             # add try catch OSError: [Errno 98] Address already in use
-                            # first stop the previous manager
-                            self.manager_ua_fboot.stop()
+                            # first stop the previous manager (the configurations are already stopped)
+                            self.manager_ua_fboot.stop_ua(stop_config=False)
 
-                            self.manager_ua_fboot = ua_manager_fboot.UaManagerFboot(
+                            self.manager_ua_fboot = self.create_fboot_manager(
                                 self.manager_ua_fboot.address,
                                 self.manager_ua_fboot.port,
                             )
@@ -176,12 +182,14 @@ class Manager:
                     os.path.join(resources_path, "data_model.fboot"),
                 )
 
-                self.ua_manager_fboot = ua_manager_fboot.UaManagerFboot(
-                    self.ua_manager_fboot.address, self.ua_manager_fboot.port
+                # first stop the previous manager (frees its port and threads)
+                self.manager_ua_fboot.stop_ua()
+                self.manager_ua_fboot = self.create_fboot_manager(
+                    self.manager_ua_fboot.address, self.manager_ua_fboot.port
                 )
                 config = configuration.Configuration("EMB_RES", "EMB_RES")
                 self.set_config("EMB_RES", config)
-                self.ua_manager_fboot(config)
+                self.manager_ua_fboot(config)
 
         response = self.build_response(request_id, xml)
         return response
@@ -258,8 +266,22 @@ class Manager:
         response = b"".join([response_header, response_xml])
         return response
 
+    def create_fboot_manager(self, address, port):
+        if self.headless:
+            from data_model_fboot import fboot_loader
+
+            return fboot_loader.FbootLoader(address, port)
+
+        # the opc-ua stack is only imported by nodes that use it
+        with startup_profile.phase("ua imports"):
+            from data_model_fboot import ua_manager as ua_manager_fboot
+
+        return ua_manager_fboot.UaManagerFboot(
+            address, port, max_rate=self.ua_rate, history_path=self.history_path
+        )
+
     def build_ua_manager_fboot(self, address, port):
-        self.manager_ua_fboot = ua_manager_fboot.UaManagerFboot(address, port)
+        self.manager_ua_fboot = self.create_fboot_manager(address, port)
         # creates the opc-ua manager
         config = configuration.Configuration("EMB_RES", "EMB_RES", monitor=self.monitor)
         self.set_config("EMB_RES", config)
@@ -0,0 +1,226 @@
+import bisect
+import logging
+import math
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger("dinasore")
+
+
+class TimestampRing:
+    """
+    Monitoring - Preallocated ring buffer of event timestamps (time.monotonic_ns)
+
+    Appending is O(1) and the oldest timestamps are overwritten once the
+    buffer is full (unless it grows). The timestamps are monotonic, so the
+    ring is always sorted and the window boundaries are found by binary search.
+    """
+
+    def __init__(self, capacity=32768):
+        self.capacity = capacity
+        self.buffer = np.zeros(capacity, dtype=np.int64)
+        # number of timestamps appended since the creation
+        self.total = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def append(self, timestamp=None):
+        if timestamp is None:
+            timestamp = time.monotonic_ns()
+        with self.lock:
+            self.buffer[self.total % self.capacity] = timestamp
+            self.total += 1
+
+    def grow(self, capacity):
+        # the timestamps keep their absolute indexes (index % capacity)
+        with self.lock:
+            older, newer = self.segments()
+            kept = np.concatenate((older, newer))
+            buffer = np.zeros(capacity, dtype=np.int64)
+            buffer[np.arange(self.total - len(kept), self.total) % capacity] = kept
+            self.buffer = buffer
+            self.capacity = capacity
+
+    def segments(self):
+        # the stored timestamps in order, as (at most) two views of the buffer
+        if self.total <= self.capacity:
+            return self.buffer[: self.total], self.buffer[:0]
+        head = self.total % self.capacity
+        return self.buffer[head:], self.buffer[:head]
+
+    def count_since(self, start_ns):
+        with self.lock:
+            older, newer = self.segments()
+            return (
+                len(older)
+                - np.searchsorted(older, start_ns, side="right")
+                + len(newer)
+                - np.searchsorted(newer, start_ns, side="right")
+            )
+
+
+class WindowStats:
+    """
+    Monitoring - Running sums of the intervals inside one sliding window
+
+    An interval belongs to the window while the event that opens it is newer
+    than the window start.
+    """
+
+    def __init__(self, length_ns, keep_sorted=False):
+        self.length_ns = length_ns
+        # absolute index (in the ring) of the oldest event inside the window
+        self.first = 0
+        self.count = 0
+        self.total = 0
+        self.total_sq = 0
+        # sorted intervals, only needed for the percentiles
+        self.sorted = [] if keep_sorted else None
+
+    def add(self, interval):
+        self.count += 1
+        self.total += interval
+        self.total_sq += interval * interval
+        if self.sorted is not None:
+            bisect.insort(self.sorted, interval)
+
+    def remove(self, interval):
+        self.count -= 1
+        self.total -= interval
+        self.total_sq -= interval * interval
+        if self.sorted is not None:
+            del self.sorted[bisect.bisect_left(self.sorted, interval)]
+
+    def mean(self):
+        return self.total / self.count / 1e9
+
+    def std(self):
+        variance = (self.total_sq - self.total * self.total / self.count) / (
+            self.count - 1
+        )
+        return math.sqrt(max(variance, 0)) / 1e9
+
+    def percentile(self, q):
+        position = (len(self.sorted) - 1) * q / 100
+        low = int(position)
+        high = min(low + 1, len(self.sorted) - 1)
+        value = self.sorted[low] + (self.sorted[high] - self.sorted[low]) * (
+            position - low
+        )
+        return value / 1e9
+
+    def feature(self, name):
+        if name == "count":
+            return self.count
+        if self.count == 0:
+            return 0
+        if name == "mean":
+            return round(self.mean(), 4)
+        if self.count <= 1:
+            return 0
+        if name == "std":
+            return round(self.std(), 4)
+        if name == "burstiness":
+            # -1 for periodic, 0 for poisson and 1 for bursty arrivals
+            mean, std = self.mean(), self.std()
+            return 0 if mean + std == 0 else round((std - mean) / (std + mean), 4)
+        if name.startswith("p"):
+            return round(self.percentile(float(name[1:])), 4)
+        raise ValueError("unknown monitoring feature {0}".format(name))
+
+
+class EventStatistics:
+    """
+    Monitoring - Incremental inter-arrival statistics of one event direction
+
+    Each event updates the running sums of every window and evicts the
+    intervals that left them, so the features are read in constant time
+    (percentiles keep a sorted list per window). The timestamps live in a
+    TimestampRing, which must hold every event of the longest window: it
+    doubles while an event still inside a window would be overwritten, up to
+    max_capacity (by default it does not grow), and then the windows only
+    keep the newest events.
+    """
+
+    def __init__(
+        self, windows_ns, features=("count", "mean", "std"), capacity=32768, max_capacity=None
+    ):
+        self.ring = TimestampRing(capacity)
+        self.max_capacity = capacity if max_capacity is None else max(max_capacity, capacity)
+        # the windows were truncated by the ring (warned once)
+        self.truncated = False
+        self.features_names = tuple(features)
+        keep_sorted = any(name.startswith("p") for name in self.features_names)
+        self.windows = [WindowStats(length, keep_sorted) for length in windows_ns]
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.ring)
+
+    def timestamp(self, index):
+        return int(self.ring.buffer[index % self.ring.capacity])
+
+    def evict(self, window, cutoff, last):
+        # removes the events up to cutoff, never beyond the event at last
+        while window.first <= last and self.timestamp(window.first) <= cutoff:
+            if window.first < last:
+                window.remove(
+                    self.timestamp(window.first + 1) - self.timestamp(window.first)
+                )
+            window.first += 1
+
+    def append(self, timestamp=None):
+        if timestamp is None:
+            timestamp = time.monotonic_ns()
+        with self.lock:
+            index = self.ring.total
+            overwritten = index - self.ring.capacity
+            if overwritten >= 0 and any(window.first <= overwritten for window in self.windows):
+                overwritten = self.make_room(index, timestamp)
+            for window in self.windows:
+                # the oldest slot is about to be reused
+                if window.first <= overwritten:
+                    self.evict(window, self.timestamp(overwritten), index - 1)
+                if index > 0 and window.first <= index - 1:
+                    window.add(timestamp - self.timestamp(index - 1))
+            self.ring.append(timestamp)
+            for window in self.windows:
+                self.evict(window, timestamp - window.length_ns, index)
+
+    def make_room(self, index, timestamp):
+        # the oldest slot may still belong to a window, grows the ring if it can
+        overwritten = index - self.ring.capacity
+        for window in self.windows:
+            self.evict(window, timestamp - window.length_ns, index - 1)
+        if all(window.first > overwritten for window in self.windows):
+            return overwritten
+        if self.ring.capacity < self.max_capacity:
+            self.ring.grow(min(self.ring.capacity * 2, self.max_capacity))
+        elif not self.truncated:
+            self.truncated = True
+            span = (timestamp - self.timestamp(index - self.ring.capacity)) / 1e9
+            logger.warning(
+                "the monitoring ring of {0} events spans {1:.3f} s, shorter than the longest "
+                "window ({2:.3f} s): the windows only keep the newest events".format(
+                    self.ring.capacity, span, max(w.length_ns for w in self.windows) / 1e9
+                )
+            )
+        return index - self.ring.capacity
+
+    def features(self, now_ns=None):
+        # features of every window, in the order of the windows
+        if now_ns is None:
+            now_ns = time.monotonic_ns()
+        values = []
+        with self.lock:
+            for window in self.windows:
+                self.evict(window, now_ns - window.length_ns, self.ring.total - 1)
+                values += [window.feature(name) for name in self.features_names]
+        return values
+
+    def count_since(self, start_ns):
+        return self.ring.count_since(start_ns)
@@ -0,0 +1,137 @@
+import json
+import os
+import struct
+import threading
+import time
+
+import numpy as np
+
+MAGIC = b"DINAMLOG"
+VERSION = 1
+
+# Record kinds
+EVENTS = 0  # x, y: input and output events during the last sample
+SAMPLE = 1  # x, y: sample in the pca space, label: prediction of the algorithm
+TRAINING = 2  # x, y: training sample in the pca space
+RESET = 3  # the training samples of the algorithm written before are discarded
+
+RECORD = np.dtype(
+    [
+        ("time", "<i8"),
+        ("kind", "u1"),
+        ("algorithm", "u1"),
+        ("label", "i1"),
+        ("x", "<f8"),
+        ("y", "<f8"),
+    ]
+)
+
+EXTENSION = ".mlog"
+
+
+def log_path(folder, fb_name):
+    return os.path.join(folder, fb_name + EXTENSION)
+
+
+class MonitoringLog:
+    """
+    Monitoring - Buffered append-only binary log of one function block
+
+    The file starts with a header holding the algorithm names, followed by
+    fixed-size records (RECORD). Records are buffered in memory and written
+    in one call by flush(), so readers only see whole records.
+    """
+
+    def __init__(self, path, algorithms, buffer_records=256):
+        self.path = path
+        self.algorithms = list(algorithms)
+        self.buffer = np.zeros(buffer_records, dtype=RECORD)
+        self.size = 0
+        self.lock = threading.Lock()
+
+        names = json.dumps(self.algorithms).encode("utf-8")
+        self.file = open(path, "wb")
+        self.file.write(MAGIC + struct.pack("<HH", VERSION, len(names)) + names)
+        self.file.flush()
+
+    def append(self, kind, x, y, algorithm=0, label=0):
+        with self.lock:
+            if self.size == len(self.buffer):
+                self._flush()
+            self.buffer[self.size] = (time.time_ns(), kind, algorithm, label, x, y)
+            self.size += 1
+
+    def events(self, n_in, n_out):
+        self.append(EVENTS, n_in, n_out)
+
+    def sample(self, algorithm_name, point, label):
+        self.append(SAMPLE, point[0], point[1], self.algorithms.index(algorithm_name), label)
+
+    def training(self, points, mode="w"):
+        # replaces (mode "w") or extends (mode "a") the training samples of every algorithm
+        for algorithm in range(len(self.algorithms)):
+            if mode == "w":
+                self.append(RESET, 0, 0, algorithm)
+            for point in points:
+                self.append(TRAINING, point[0], point[1], algorithm, 1)
+
+    def _flush(self):
+        # the records of a closed log are dropped
+        if self.size > 0 and not self.file.closed:
+            self.file.write(self.buffer[: self.size].tobytes())
+            self.file.flush()
+        self.size = 0
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def close(self):
+        with self.lock:
+            self._flush()
+            self.file.close()
+
+
+class LogReader:
+    """
+    Monitoring - Reads the new records of a MonitoringLog from a cursor
+
+    The cursor is the byte offset of the next record, so a reader can be
+    recreated from a saved cursor and only new records are ever read.
+    """
+
+    def __init__(self, path, cursor=None):
+        self.path = path
+        self.algorithms = None
+        self.header_size = None
+        self.cursor = cursor
+
+    def read_header(self, f):
+        start = f.read(len(MAGIC) + 4)
+        if len(start) < len(MAGIC) + 4 or start[: len(MAGIC)] != MAGIC:
+            return False
+        version, names_len = struct.unpack("<HH", start[len(MAGIC) :])
+        if version != VERSION:
+            raise ValueError("unsupported monitoring log version {0}".format(version))
+        self.algorithms = json.loads(f.read(names_len).decode("utf-8"))
+        self.header_size = len(MAGIC) + 4 + names_len
+        return True
+
+    def read(self, max_records=None):
+        # returns the records after the cursor and moves the cursor
+        with open(self.path, "rb") as f:
+            if self.header_size is None and not self.read_header(f):
+                return np.zeros(0, dtype=RECORD)
+            if self.cursor is None or self.cursor < self.header_size:
+                self.cursor = self.header_size
+            # a smaller file was recreated (e.g. dinasore restarted)
+            end = os.fstat(f.fileno()).st_size
+            if end < self.cursor:
+                self.cursor = self.header_size
+            n_records = (end - self.cursor) // RECORD.itemsize
+            if max_records is not None:
+                n_records = min(n_records, max_records)
+            f.seek(self.cursor)
+            records = np.frombuffer(f.read(n_records * RECORD.itemsize), dtype=RECORD)
+        self.cursor += n_records * RECORD.itemsize
+        return records
@@ -0,0 +1,102 @@
+import functools
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+def rss():
+    # resident memory of the process in bytes
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        try:
+            import resource
+        except ImportError:
+            return 0
+        # peak memory, in kilobytes on linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class StartupProfile:
+    """
+    Time and memory (RSS) spent in each phase of the node start
+
+    A nested phase is subtracted from the phase that contains it, so the
+    report shows the own cost of each phase. Phases that run more than
+    once (e.g. one per FB) are accumulated. Once stopped the phases run
+    without any accounting (the redeployments reuse the timed functions).
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.start_rss = rss()
+        # name: [calls, seconds, rss bytes]
+        self.phases = dict()
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.enabled = True
+
+    def stop(self):
+        self.enabled = False
+
+    @contextmanager
+    def phase(self, name):
+        if not self.enabled:
+            yield
+            return
+        stack = self.local.__dict__.setdefault("stack", [])
+        # start time, start rss, nested time and nested rss
+        frame = [time.perf_counter(), rss(), 0.0, 0]
+        stack.append(frame)
+        try:
+            yield
+        finally:
+            stack.pop()
+            elapsed = time.perf_counter() - frame[0]
+            grown = rss() - frame[1]
+            with self.lock:
+                entry = self.phases.setdefault(name, [0, 0.0, 0])
+                entry[0] += 1
+                entry[1] += elapsed - frame[2]
+                entry[2] += grown - frame[3]
+            if len(stack) > 0:
+                stack[-1][2] += elapsed
+                stack[-1][3] += grown
+
+    def report(self):
+        lines = [
+            "{0:<16}{1:>8}{2:>12}{3:>12}".format("phase", "calls", "time (ms)", "rss (MB)")
+        ]
+        with self.lock:
+            for name, (calls, seconds, grown) in self.phases.items():
+                lines.append(
+                    "{0:<16}{1:>8}{2:>12.1f}{3:>12.1f}".format(
+                        name, calls, seconds * 1000, grown / 2**20
+                    )
+                )
+        lines.append(
+            "{0:<16}{1:>8}{2:>12.1f}{3:>12.1f}".format(
+                "total", "", (time.perf_counter() - self.start) * 1000, rss() / 2**20
+            )
+        )
+        return "\n".join(lines)
+
+
+# started when the module is imported, main.py imports it first
+profile = StartupProfile()
+phase = profile.phase
+
+
+def timed(name):
+    # decorator that accounts every call of the function to the phase
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with profile.phase(name):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
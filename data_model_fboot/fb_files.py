@@ -0,0 +1,78 @@
+import glob
+import logging
+import os
+import sys
+from typing import Dict
+
+from core import startup_profile
+
+# function block files and 4diac types, without the opc-ua stack
+
+logger = logging.getLogger("dinasore")
+
+XML_4DIAC = {
+    "String": "String",
+    "STRING": "String",
+    "Double": "Double",
+    "Integer": "Integer",
+    "INT": "Integer",
+    "UINT": "Integer",
+    "Float": "Float",
+    "REAL": "Float",
+    "LREAL": "Float",
+    "BOOL": "Boolean",
+    "Boolean": "Boolean",
+    "ANY": None,
+    "DATE_AND_TIME": "Datetime",
+}  # not sure if this is right
+
+
+def get_fb_files_path(fb_name):
+    root_fbs_path = os.path.join(os.path.dirname(sys.path[0]), "resources")
+
+    try:
+        path = next(scan_match(fb_name, root_fbs_path))
+    except Exception:
+        print("Name {0} path {1}".format(fb_name, root_fbs_path))
+        sys.exit(0)
+    if "__pycache__" in path:
+        path = path.replace("/__pycache__", "")
+    return path
+
+
+def scan_match(fb_name, dir):
+    for root, dirs, files in os.walk(dir):
+        for file in files:
+            if file.split(".")[0] == fb_name:
+                yield root
+
+
+@startup_profile.timed("fb indexing")
+def create_fb_index(root_directory: str) -> Dict[str, str]:
+    # Find all .fbt files
+    fbt_files = glob.glob(os.path.join(root_directory, "**/*.fbt"), recursive=True)
+    fb_index: Dict[str, str] = {}
+
+    for fbt_file in fbt_files:
+        dir_name = os.path.dirname(fbt_file)
+        fbt_file_name = os.path.basename(fbt_file)
+        fb_type = fbt_file_name.replace(".fbt", "")
+        py_file = os.path.join(dir_name, fbt_file_name.replace(".fbt", ".py"))
+
+        # Check if the corresponding .py file exists
+        if os.path.exists(py_file):
+            fb_index[fb_type] = dir_name
+        else:
+            logger.warning(
+                f"Discovered {py_file} but not its corresponding python implementation *.py"
+            )
+
+    return fb_index
+
+
+def any_element_in_string(array, string):
+    for element in array:
+        if element in string:
+            return True
+
+    return False
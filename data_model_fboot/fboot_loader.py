@@ -0,0 +1,210 @@
+import logging
+import os
+import sys
+from time import perf_counter
+from xml.etree import ElementTree as ETree
+
+from data_model_fboot import fb_files
+from core.configuration import Configuration
+from core.fb_resources import FBResources
+from core import startup_profile
+
+logger = logging.getLogger("dinasore")
+
+
+class FbootLoader:
+    """
+    Deploys the configuration saved in data_model.fboot, without the opc-ua stack
+
+    Used directly by the headless nodes, UaManagerFboot extends it with the
+    opc-ua address space of the function blocks.
+    """
+
+    class InvalidFbootState(Exception):
+        pass
+
+    def __init__(self, address=None, port=None):
+        self.address = address
+        self.port = port
+        self.fboot_path = os.path.join(
+            os.path.dirname(sys.path[0]), "resources", "data_model.fboot"
+        )
+        self.config = None
+        self.method_names = []
+        self.method_inputs = None
+        self.method_outputs = None
+        self.opcua_method_name = None
+
+    def __call__(self, config: Configuration):
+        # configuration (connection to 4diac code)
+        self.config = config
+
+    def save_fboot(self, requests):
+        file = open(self.fboot_path, "w")
+        start_fb = None
+        is_watch = False
+        for request in requests:
+            element = ETree.fromstring(request)
+            for child in element:
+                if child.tag == "Watch":
+                    is_watch = True
+                    break
+
+            if is_watch:
+                is_watch = False
+                continue
+
+            if start_fb is None:
+                file.write(";")
+                for child in element:
+                    start_fb = child.attrib["Name"]
+            else:
+                file.write("{0};".format(start_fb))
+            file.write(request)
+            file.write("\n")
+        file.close()
+
+    def from_fboot(self):
+        tic = perf_counter()
+        # Check if data model file exists and is not empty
+        try:
+            file = open(self.fboot_path, "r")
+        except FileNotFoundError:
+            logger.warning("Could not find fboot definition file. Awaiting deployment.")
+        else:
+            if os.stat(self.fboot_path).st_size == 0:
+                logger.warning("Fboot definition file is empty. Awaiting deployment")
+            else:
+                try:
+                    # Parse data model file
+                    self.parse_fboot(file)
+                except self.InvalidFbootState:
+                    logger.error(
+                        "Fboot definition file is in an invalid state. Awaiting deployment"
+                    )
+                else:
+                    self.generate_methods()
+                    toc = perf_counter()
+                    logger.info(f"FB generation time: {toc-tic}s")
+                    self.config.start_work()
+
+    @startup_profile.timed("fboot parsing")
+    def parse_fboot(self, file):
+        lines = file.readlines()
+        file.close()
+        # create function blocks - folders, objects and variables
+        self.generate_function_blocks(lines)
+        # create connections - write and create between variables and events
+        self.generate_connections(lines)
+        # create missing connections from START.COLD to unpopulated INIT inputs
+        self.generate_init_connections()
+
+    def generate_function_blocks(self, lines):
+        for line in lines:
+            # Remove start fb from line
+            chunks = line.split(";",maxsplit = 1)
+            if len(chunks) != 2:
+                raise self.InvalidFbootState
+            xml_element = ETree.fromstring(chunks[1])
+            try:
+                if xml_element.get("Action") == "CREATE":
+                    for child in xml_element:
+                        if child.tag == "FB" and child.get("Type") != "EMB_RES":
+                            type = child.get("Type")
+                            root_path = self.config.fb_dict[type]
+                            fb_resource = FBResources(type, root_path)
+                            self.parse_fbt(fb_resource, child.get("Name"))
+            except KeyError:
+                raise self.InvalidFbootState
+
+    def generate_connections(self, lines):
+        for line in lines:
+            # Remove start fb from line
+            chunks = line.split(";",maxsplit = 1)
+            if len(chunks) != 2:
+                raise self.InvalidFbootState
+            xml_element = ETree.fromstring(chunks[1])
+            try:
+                if xml_element.get("Action") == "CREATE":
+                    for child in xml_element:
+                        if child.tag == "Connection":
+                            if len(self.method_names) == 0 or (
+                                not fb_files.any_element_in_string(
+                                    self.method_names, child.get("Source")
+                                )
+                                and not fb_files.any_element_in_string(
+                                    self.method_names, child.get("Destination")
+                                )
+                            ):
+                                # Create connection
+                                self.config.create_connection(
+                                    child.get("Source"), child.get("Destination")
+                                )
+                            elif len(self.method_names) != 0:
+                                if fb_files.any_element_in_string(
+                                    self.method_names, child.get("Source")
+                                ):
+                                    # Save event name to be triggered
+                                    self.method_event = child.get("Destination")
+                                elif fb_files.any_element_in_string(
+                                    self.method_names, child.get("Destination")
+                                ):
+                                    # save name of final fb to execute
+                                    self.method_final_fb = child.get("Source").split(
+                                        "."
+                                    )[0]
+                elif xml_element.get("Action") == "WRITE":
+                    for child in xml_element:
+                        if child.tag == "Connection":
+                            if len(
+                                self.method_names
+                            ) == 0 or not fb_files.any_element_in_string(
+                                self.method_names, child.get("Destination")
+                            ):
+                                # Write connection
+                                self.config.write_connection(
+                                    child.get("Source"), child.get("Destination")
+                                )
+                            elif len(
+                                self.method_names
+                            ) != 0 and fb_files.any_element_in_string(
+                                self.method_names, child.get("Destination")
+                            ):
+                                # Save wrapper info
+                                info_type = child.get("Destination").split(".")[1]
+                                if info_type == "INPUT":
+                                    self.method_inputs = child.get("Source")
+                                elif info_type == "OUTPUT":
+                                    self.method_outputs = child.get("Source")
+                                elif info_type == "METHOD_NAME":
+                                    self.opcua_method_name = child.get("Source")
+            except KeyError:
+                raise self.InvalidFbootState
+
+    def generate_init_connections(self):
+        # connect all unconnected INIT event inputs to START.COLD
+        function_blocks = self.config.fb_dictionary
+        for name, fb in function_blocks.items():
+            if (
+                not fb.init_is_connected()
+                and fb.has_event_input("INIT")
+                and fb.name != "START"
+            ):
+                self.config.create_connection("START.COLD", f"{fb.fb_name}.INIT")
+
+    def parse_fbt(self, fb_resource: FBResources, fb_name: str):
+        # without opc-ua the method fbs are plain fbs of the flow
+        self.config.create_fb(fb_name, fb_resource, monitor=True)
+
+    def generate_methods(self):
+        # the opc-ua methods need the opc-ua server
+        pass
+
+    def stop(self):
+        # nothing is served
+        pass
+
+    def stop_ua(self, stop_config=True):
+        # stops the configuration work
+        if stop_config:
+            self.config.stop_work()
@@ -0,0 +1,295 @@
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from opc_ua.backend import ua
+
+logger = logging.getLogger("dinasore")
+
+
+class Tier:
+    """
+    One resolution of the history: raw values (resolution 0) or bucket averages
+
+    The values are kept in segment files of `segment` seconds, one file for
+    the timestamps and one for the values (float64), and the segments older
+    than `retention` seconds are deleted.
+    """
+
+    def __init__(self, resolution, segment, retention):
+        self.resolution = resolution
+        self.segment = segment
+        self.retention = retention
+        self.name = "raw" if resolution == 0 else "{0:g}s".format(resolution)
+
+
+# raw values for 1 hour, 1 second averages for 1 day and 1 minute averages for 30 days
+TIERS = [Tier(0, 60, 3600), Tier(1, 3600, 86400), Tier(60, 86400, 30 * 86400)]
+
+
+class Series:
+    """
+    History of one variable, written in batches to the segment files of every tier
+    """
+
+    def __init__(self, path, tiers):
+        self.path = path
+        self.tiers = tiers
+        # tier name -> open bucket of the averages (index, sum, count)
+        self.buckets = dict()
+        for tier in tiers:
+            os.makedirs(os.path.join(path, tier.name), exist_ok=True)
+
+    def append(self, times, values):
+        # times sorted, in seconds since the epoch
+        for tier in self.tiers:
+            if tier.resolution == 0:
+                self.write(tier, times, values)
+            else:
+                self.write(tier, *self.downsample(tier, times, values))
+
+    def downsample(self, tier, times, values):
+        # averages of the closed buckets, the last one stays open for the next batch
+        indexes = np.floor(times / tier.resolution).astype(np.int64)
+        sums = values.copy()
+        counts = np.ones(len(values))
+        index, total, count = self.buckets.get(tier.name, (None, 0.0, 0))
+        if index is not None:
+            indexes = np.concatenate(([index], indexes))
+            sums = np.concatenate(([total], sums))
+            counts = np.concatenate(([count], counts))
+        if len(indexes) == 0:
+            return times[:0], values[:0]
+        starts = np.flatnonzero(np.diff(indexes, prepend=indexes[0] - 1))
+        sums = np.add.reduceat(sums, starts)
+        counts = np.add.reduceat(counts, starts)
+        indexes = indexes[starts]
+        self.buckets[tier.name] = (indexes[-1], sums[-1], counts[-1])
+        return indexes[:-1] * float(tier.resolution), sums[:-1] / counts[:-1]
+
+    def close(self):
+        # writes the open buckets
+        for tier in self.tiers:
+            index, total, count = self.buckets.pop(tier.name, (None, 0.0, 0))
+            if index is not None:
+                self.write(tier, np.array([index * float(tier.resolution)]), np.array([total / count]))
+
+    def segment_path(self, tier, segment):
+        return os.path.join(self.path, tier.name, str(segment))
+
+    def write(self, tier, times, values):
+        segments = np.floor(times / tier.segment).astype(np.int64)
+        for segment in np.unique(segments):
+            selected = segments == segment
+            path = self.segment_path(tier, segment)
+            with open(path + ".t", "ab") as file:
+                times[selected].astype(np.float64).tofile(file)
+            with open(path + ".v", "ab") as file:
+                values[selected].astype(np.float64).tofile(file)
+
+    def segments(self, tier):
+        names = os.listdir(os.path.join(self.path, tier.name))
+        return sorted(int(name[:-2]) for name in names if name.endswith(".t"))
+
+    def expire(self, now):
+        for tier in self.tiers:
+            for segment in self.segments(tier):
+                if (segment + 1) * tier.segment < now - tier.retention:
+                    for suffix in (".t", ".v"):
+                        os.remove(self.segment_path(tier, segment) + suffix)
+
+    def read(self, start, end, now):
+        # values in [start, end] of the finest tier that still has start (without a start the raw values)
+        tier = next(
+            (tier for tier in self.tiers if start >= now - tier.retention or start == -np.inf),
+            self.tiers[-1],
+        )
+        times = []
+        values = []
+        for segment in self.segments(tier):
+            if (segment + 1) * tier.segment < start or segment * tier.segment > end:
+                continue
+            path = self.segment_path(tier, segment)
+            segment_times = np.fromfile(path + ".t", dtype=np.float64)
+            segment_values = np.fromfile(path + ".v", dtype=np.float64)
+            # both files of the segment may be being appended
+            length = min(len(segment_times), len(segment_values))
+            times.append(segment_times[:length])
+            values.append(segment_values[:length])
+        if len(times) == 0:
+            return np.zeros(0), np.zeros(0)
+        times = np.concatenate(times)
+        values = np.concatenate(values)
+        first = np.searchsorted(times, start, side="left")
+        last = np.searchsorted(times, end, side="right")
+        return times[first:last], values[first:last]
+
+
+class Historian(threading.Thread):
+    """
+    Disk-backed time series of the fb variables
+
+    The publisher records the values it writes in the opc-ua variables; they
+    are queued in memory (at most max_pending, the next ones are dropped) and
+    written by this thread to the tiers of each variable in one batch per
+    flush interval.
+    """
+
+    def __init__(self, path, tiers=None, flush_interval=1.0, max_pending=100000):
+        threading.Thread.__init__(self, name="historian", daemon=True)
+        self.path = path
+        self.tiers = TIERS if tiers is None else tiers
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.condition = threading.Condition()
+        # one batch of writes at a time
+        self.writing = threading.Lock()
+        # variable key -> [(time, value)] not written yet
+        self.pending = dict()
+        self.pending_count = 0
+        self.dropped = 0
+        self.series = dict()
+        # node id of the opc-ua variable -> variable key
+        self.keys = dict()
+        self.stopped = False
+        os.makedirs(path, exist_ok=True)
+
+    def register(self, nodeid, key):
+        self.keys[nodeid] = key
+
+    def record(self, key, value, timestamp=None):
+        # numeric values only, the others have no trend
+        if isinstance(value, bool):
+            value = float(value)
+        elif not isinstance(value, (int, float)):
+            return
+        if timestamp is None:
+            timestamp = time.time()
+        with self.condition:
+            if self.pending_count >= self.max_pending:
+                self.dropped += 1
+                return
+            self.pending.setdefault(key, []).append((timestamp, float(value)))
+            self.pending_count += 1
+
+    def get_series(self, key):
+        series = self.series.get(key)
+        if series is None:
+            series = Series(os.path.join(self.path, *key.split("/")), self.tiers)
+            self.series[key] = series
+        return series
+
+    def append(self, key, times, values):
+        # writes a batch of (sorted) values of one variable
+        with self.writing:
+            self.get_series(key).append(np.asarray(times, dtype=np.float64), np.asarray(values, dtype=np.float64))
+
+    def flush(self, now=None):
+        with self.writing:
+            with self.condition:
+                pending, self.pending = self.pending, dict()
+                self.pending_count = 0
+            for key, points in pending.items():
+                points = np.array(points, dtype=np.float64)
+                points = points[np.argsort(points[:, 0], kind="stable")]
+                self.get_series(key).append(points[:, 0], points[:, 1])
+            for series in self.series.values():
+                series.expire(time.time() if now is None else now)
+
+    def query(self, key, start, end, now=None):
+        # (times, values) of the variable between start and end (seconds since the epoch)
+        self.flush(now)
+        with self.writing:
+            return self.get_series(key).read(start, end, time.time() if now is None else now)
+
+    def run(self):
+        while not self.stopped:
+            with self.condition:
+                self.condition.wait(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as error:
+                logger.error("Error writing the history.")
+                logger.exception(error)
+
+    def stop(self):
+        with self.condition:
+            self.stopped = True
+            self.condition.notify()
+        if self.is_alive():
+            self.join()
+        self.flush()
+        for series in self.series.values():
+            series.close()
+
+
+class HistoryStorage:
+    """
+    History storage of the opc-ua server (HistoryRead) served by the historian
+    """
+
+    def __init__(self, historian):
+        self.historian = historian
+
+    def new_historized_node(self, node_id, period, count=0):
+        pass
+
+    def save_node_value(self, node_id, datavalue):
+        key = self.historian.keys.get(node_id)
+        if key is not None and datavalue.Value is not None:
+            timestamp = datavalue.SourceTimestamp
+            self.historian.record(key, datavalue.Value.Value, None if timestamp is None else to_seconds(timestamp))
+
+    def read_node_history(self, node_id, start, end, nb_values):
+        key = self.historian.keys.get(node_id)
+        if key is None:
+            return [], None
+        epoch = ua.get_win_epoch()
+        start = None if start is None or start == epoch else to_seconds(start)
+        end = None if end is None or end == epoch else to_seconds(end)
+        # without a start the newest values come first
+        reverse = start is None or (end is not None and start > end)
+        low, high = (start, end) if start is None or end is None or start <= end else (end, start)
+        times, values = self.historian.query(
+            key, -np.inf if low is None else low, np.inf if high is None else high
+        )
+        if reverse:
+            times, values = times[::-1], values[::-1]
+        cont = None
+        if nb_values and len(times) > nb_values:
+            cont = to_datetime(times[nb_values])
+            times, values = times[:nb_values], values[:nb_values]
+        results = []
+        for timestamp, value in zip(times.tolist(), values.tolist()):
+            data_value = ua.DataValue(ua.Variant(value, ua.VariantType.Double))
+            data_value.SourceTimestamp = to_datetime(timestamp)
+            data_value.ServerTimestamp = data_value.SourceTimestamp
+            results.append(data_value)
+        return results, cont
+
+    def new_historized_event(self, source_id, evtypes, period, count=0):
+        pass
+
+    def save_event(self, event):
+        pass
+
+    def read_event_history(self, source_id, start, end, nb_values, evfilter):
+        return [], None
+
+    def stop(self):
+        pass
+
+
+def to_seconds(timestamp):
+    # opc-ua datetimes are utc without a time zone
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return timestamp.timestamp()
+
+
+def to_datetime(seconds):
+    return datetime.fromtimestamp(seconds, timezone.utc).replace(tzinfo=None)
@@ -1,18 +1,146 @@
 from threading import Thread
 from threading import Event
+from collections import deque
 from data_model_fboot import utils
-import psutil
+from opc_ua.backend import ua
+from core import fb_usage
+import json
 import os
+import re
 import sys
+import threading
+import time
+
+# entries of the log kept in the ERROR_LOG variable
+LOG_CAPACITY = 200
+# bytes of the log read by each poll, the rest waits for the next ones
+LOG_CHUNK = 64 * 1024
+# seconds between the tracemalloc snapshots of the fb allocations (when tracing)
+ALLOC_PERIOD = 10.0
+
+# [LEVEL  |2024-01-01T00:00:00.000|thread] message (the format of main.setup_logging)
+LOG_LINE = re.compile(r"^\[(\w+)\s*\|([^|]*)\|([^\]]*)\] (.*)$")
+
+
+class LogTail:
+    """
+    Reads the lines appended to the log since the last poll
+
+    The file is read from the saved offset (at most LOG_CHUNK bytes per
+    poll) and its entries are kept in a ring of the newest ones, so the cost
+    of a poll does not depend on the size of the log. The lines without the
+    log prefix (tracebacks) belong to the previous entry.
+    """
+
+    def __init__(self, path, capacity=LOG_CAPACITY, chunk=LOG_CHUNK):
+        self.path = path
+        self.chunk = chunk
+        self.offset = 0
+        # end of a line not written yet
+        self.partial = b""
+        self.entries = deque(maxlen=capacity)
+
+    def poll(self):
+        # True when new entries were read
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return False
+        if size < self.offset:
+            # the log was truncated (main opens it with mode "w")
+            self.offset = 0
+            self.partial = b""
+        if size == self.offset:
+            return False
+        with open(self.path, "rb") as logs_file:
+            logs_file.seek(self.offset)
+            data = logs_file.read(self.chunk)
+        self.offset += len(data)
+        lines = (self.partial + data).split(b"\n")
+        self.partial = lines.pop()
+        changed = False
+        for line in lines:
+            changed = self.add_line(line.decode("utf-8", errors="replace").rstrip("\r")) or changed
+        return changed
+
+    def add_line(self, line):
+        match = LOG_LINE.match(line)
+        if match is not None:
+            level, timestamp, thread_name, message = match.groups()
+            self.entries.append(
+                {
+                    "level": level,
+                    "timestamp": timestamp,
+                    "thread_name": thread_name,
+                    "message": message,
+                }
+            )
+        elif len(self.entries) > 0 and line != "":
+            self.entries[-1]["message"] += "\n" + line
+        else:
+            return False
+        return True
+
+    def values(self):
+        # one json object per entry, oldest first
+        return [json.dumps(entry) for entry in self.entries]
+
+
+class ProcessMetrics:
+    """
+    Cpu and memory of the runtime process and cpu of each of its threads
+
+    The threads are named by their python names (the fbs run in threads
+    named after them), so the load can be attributed to the fbs. The cpu
+    percentages are measured between two samples.
+    """
+
+    def __init__(self):
+        # loaded with the first measure, only the opc-ua nodes use it
+        import psutil
+
+        self.process = psutil.Process()
+        self.process.cpu_percent()
+        # native thread id -> cpu seconds at the previous sample
+        self.thread_times = dict()
+        self.sample_time = time.monotonic()
+
+    def sample(self):
+        now = time.monotonic()
+        elapsed = max(now - self.sample_time, 1e-6)
+        self.sample_time = now
+        names = {thread.native_id: thread.name for thread in threading.enumerate()}
+        threads = []
+        thread_times = dict()
+        for thread in self.process.threads():
+            cpu_time = thread.user_time + thread.system_time
+            thread_times[thread.id] = cpu_time
+            previous = self.thread_times.get(thread.id, cpu_time)
+            threads.append(
+                (
+                    names.get(thread.id, str(thread.id)),
+                    cpu_time,
+                    100.0 * (cpu_time - previous) / elapsed,
+                )
+            )
+        self.thread_times = thread_times
+        with self.process.oneshot():
+            process = {
+                "PROCESS_CPU_PERCENT": float(self.process.cpu_percent()),
+                "PROCESS_RSS": int(self.process.memory_info().rss),
+                "PROCESS_THREADS": int(self.process.num_threads()),
+            }
+        return process, threads
 
 
 class MonitorSystem(Thread):
-    # creates the event kill thread event
-    kill_event = Event()
 
     def __init__(self, ua_peer):
         Thread.__init__(self, name="monitoring_thread")
-        self.kill_event.clear()
+        # one per monitor, the monitor of a new manager starts while the old one stops
+        self.kill_event = Event()
+        self.ua_peer = ua_peer
+        self.alloc_time = 0.0
         # creates the opc-ua folder
         folder_idx, folder_path, folder_list = utils.default_folder(
             ua_peer,
@@ -21,6 +149,7 @@ class MonitorSystem(Thread):
             ua_peer.ROOT_LIST,
             "HardwareMonitoring",
         )
+        self.folder_path = folder_path
         # variables names
         var_names = (
             "CPU_PERCENT",
@@ -47,14 +176,47 @@ class MonitorSystem(Thread):
         # joins the ua variables with the names
         self.ua_vars_dict = dict(zip(var_names, ua_vars))
 
-        # open logs file
-        self.logs_path = os.path.join(
-            os.path.dirname(sys.path[0]), "resources", "error_list.log"
+        # process and thread metrics
+        self.process_metrics = ProcessMetrics()
+        process, _ = self.process_metrics.sample()
+        initial_values = {name: ua.Variant(value) for name, value in process.items()}
+        initial_values.update(
+            {
+                "THREAD_NAMES": ua.Variant([], ua.VariantType.String),
+                "THREAD_CPU_TIME": ua.Variant([], ua.VariantType.Double),
+                "THREAD_CPU_PERCENT": ua.Variant([], ua.VariantType.Double),
+            }
         )
+        self.process_vars = dict()
+        for var_name, value in initial_values.items():
+            self.process_vars[var_name] = ua_peer.create_variable(
+                folder_path,
+                "{0}:{1}".format(folder_idx, var_name),
+                "2:{0}".format(var_name),
+                value,
+            )
 
-        # create ua variable for log
+        # tails the logs file
+        self.logs = LogTail(
+            os.path.join(os.path.dirname(sys.path[0]), "resources", "error_list.log")
+        )
+
+        # create ua variable for log (one json entry per element)
         self.ua_log = ua_peer.create_variable(
-            folder_path, "{0}:ERROR_LOG".format(folder_idx), "2:ERROR_LOG", ""
+            folder_path,
+            "{0}:ERROR_LOG".format(folder_idx),
+            "2:ERROR_LOG",
+            ua.Variant([], ua.VariantType.String),
+        )
+
+        # table of the fb usages, on demand
+        ua_peer.create_method(
+            folder_path,
+            "{0}:USAGE_SUMMARY".format(folder_idx),
+            "2:USAGE_SUMMARY",
+            self.usage_summary,
+            [],
+            [ua.VariantType.String],
         )
 
     def run(self):
@@ -66,14 +228,46 @@ class MonitorSystem(Thread):
             # iterates over the tuples and writes ua value
             for ua_var, value in tuple_vars:
                 ua_var.set_value(value)
-            # updates log variable
-            with open(self.logs_path, "r") as logs_file:
-                self.ua_log.set_value(logs_file.read())
+            self.update_process()
+            self.update_usage()
+            # updates log variable with the new entries
+            if self.logs.poll():
+                self.ua_log.set_value(ua.Variant(self.logs.values(), ua.VariantType.String))
             # waits n seconds
             self.kill_event.wait(1)
 
+    def update_process(self):
+        process, threads = self.process_metrics.sample()
+        for var_name, value in process.items():
+            self.process_vars[var_name].set_value(ua.Variant(value))
+        names = [name for name, _, _ in threads]
+        self.process_vars["THREAD_NAMES"].set_value(ua.Variant(names, ua.VariantType.String))
+        self.process_vars["THREAD_CPU_TIME"].set_value(
+            ua.Variant([cpu_time for _, cpu_time, _ in threads], ua.VariantType.Double)
+        )
+        self.process_vars["THREAD_CPU_PERCENT"].set_value(
+            ua.Variant([percent for _, _, percent in threads], ua.VariantType.Double)
+        )
+
+    def update_usage(self):
+        now = time.monotonic()
+        fbs = {fb.fb_name: fb for fb in fb_usage.measured_fbs(self.ua_peer.config)}
+        if now - self.alloc_time >= ALLOC_PERIOD:
+            self.alloc_time = now
+            fb_usage.update_allocations(list(fbs.values()))
+        for fb_name, item in list(self.ua_peer.ua_objects.items()):
+            if fb_name in fbs and len(item.usage_vars) > 0:
+                item.update_usage(fbs[fb_name])
+
+    def usage_summary(self, parent):
+        table = fb_usage.format_table(fb_usage.summary(self.ua_peer.config))
+        return [ua.Variant(table, ua.VariantType.String)]
+
     @staticmethod
     def measure_hardware():
+        # loaded with the first measure, only the opc-ua nodes use it
+        import psutil
+
         # cpu variables
         cpu_percent = [psutil.cpu_percent()]
         cpu_freq = [psutil.cpu_freq()[0]]
@@ -84,3 +278,6 @@ class MonitorSystem(Thread):
 
     def stop(self):
         self.kill_event.set()
+        # no more writes to the server that stops next
+        if self.is_alive():
+            self.join()
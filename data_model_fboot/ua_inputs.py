@@ -0,0 +1,59 @@
+import logging
+import threading
+
+logger = logging.getLogger("dinasore")
+
+
+class UaInputs:
+    """
+    Sets the fb inputs written by the opc-ua clients
+
+    The writes of one request are collected in the server loop and applied
+    once it finishes: each fb gets its new input values and then, at most
+    once per request, the input event configured for the variables.
+    """
+
+    def __init__(self, ua_server):
+        self.ua_server = ua_server
+        self.lock = threading.Lock()
+        # ua object -> ({input var: value}, [input events])
+        self.pending = dict()
+        self.scheduled = False
+        self.applied = 0
+
+    def watch(self, item, var_name, node, event_name=None):
+        # applies the client writes of the variable to the fb input
+        self.ua_server.backend.add_write_callback(
+            node.nodeid,
+            lambda handle, data_value: self.written(item, var_name, event_name, data_value.Value.Value),
+        )
+
+    def written(self, item, var_name, event_name, value):
+        # the value the publisher mirrored from the fb is not a client write
+        if value is None or not item.changed(var_name, value):
+            return
+        item.published[var_name] = value
+        with self.lock:
+            values, events = self.pending.setdefault(item, (dict(), []))
+            values[var_name] = value
+            if event_name is not None and event_name not in events:
+                events.append(event_name)
+            if not self.scheduled:
+                self.scheduled = True
+                self.ua_server.backend.call_soon(self.flush)
+
+    def flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, dict()
+            self.scheduled = False
+        for item, (values, events) in pending.items():
+            fb = self.ua_server.config.get_fb(item.fb_name)
+            if fb is None:
+                continue
+            for var_name, value in values.items():
+                fb.set_attr(var_name, new_value=value)
+            self.applied += len(values)
+            for event_name in events:
+                # the same event value increment as a "$e" connection
+                _, value, _ = fb.read_attr(event_name)
+                fb.push_event(event_name, 1 if value is None else value + 1)
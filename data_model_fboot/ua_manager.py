@@ -1,28 +1,20 @@
 import logging
-import os
-import sys
-from time import perf_counter
 
-from fb_resources import FBResources
+from opc_ua.backend import ua
+
 from opc_ua import peer
-from xml.etree import ElementTree as ETree
-from data_model_fboot import ua_object, monitor, utils, ua_method
+from data_model_fboot import ua_object, ua_publisher, ua_inputs, historian, monitor, utils, ua_method
+from data_model_fboot.fboot_loader import FbootLoader
+from opc_ua import node_builder
 from core.configuration import Configuration
 from core.fb_resources import FBResources
 
 logger = logging.getLogger("dinasore")
 
 
-class UaManagerFboot(peer.UaPeer):
-    class InvalidFbootState(Exception):
-        pass
-
-    def __init__(self, address, port):
-        self.address = address
-        self.port = port
-        self.fboot_path = os.path.join(
-            os.path.dirname(sys.path[0]), "resources", "data_model.fboot"
-        )
+class UaManagerFboot(peer.UaPeer, FbootLoader):
+    def __init__(self, address, port, max_rate=None, history_path=None):
+        FbootLoader.__init__(self, address, port)
         self.base_name = "DINASORE OPC-UA"
         self.endpoint = "opc.tcp://{0}:{1}".format(address, port)
 
@@ -30,10 +22,22 @@ class UaManagerFboot(peer.UaPeer):
 
         self.folders = dict()
         self.ua_objects = dict()
-        self.method_names = []
-        self.method_inputs = None
-        self.method_outputs = None
-        self.opcua_method_name = None
+        # collects the nodes of the fbs while the fboot file is parsed
+        self.builder = None
+        # writes the fb values in the opc-ua variables (max_rate: writes per second of each fb)
+        self.max_rate = max_rate
+        self.publisher = ua_publisher.UaPublisher(max_rate)
+        self.publisher.start()
+        # sets the fb inputs written by the clients
+        self.inputs = ua_inputs.UaInputs(self)
+        # anomaly services that publish to this server (shared by the node, they outlive it)
+        self.anomaly_services = []
+        # history of the published values, served with HistoryRead
+        self.historian = None
+        if history_path is not None:
+            self.historian = historian.Historian(history_path)
+            self.historian.start()
+            self.backend.set_history_storage(historian.HistoryStorage(self.historian))
 
     def __call__(self, config: Configuration):
         # base idx for the opc-ua nodeId
@@ -43,8 +47,7 @@ class UaManagerFboot(peer.UaPeer):
         # creates the path to that object
         self.ROOT_LIST = [(0, "Objects"), (2, self.base_name)]
         self.ROOT_PATH = self.generate_path(self.ROOT_LIST)
-        # configuration (connection to 4diac code)
-        self.config = config
+        FbootLoader.__call__(self, config)
         # create the monitor hardware variables
         self.monitor_hardware = monitor.MonitorSystem(self)
         self.monitor_hardware.start()
@@ -57,6 +60,17 @@ class UaManagerFboot(peer.UaPeer):
             "path": folder_path,
             "path_list": folder_list,
         }
+        # create the publisher counters
+        folder_idx, folder_path, folder_list = utils.default_folder(
+            self, self.base_idx, self.ROOT_PATH, self.ROOT_LIST, "Publisher"
+        )
+        for name, value in self.publisher.stats().items():
+            self.publisher.stats_vars[name.upper()] = self.create_variable(
+                folder_path,
+                "{0}:{1}".format(folder_idx, name.upper()),
+                "2:{0}".format(name.upper()),
+                ua.Variant(value, ua.VariantType.Int64),
+            )
         # create services folder
         folder_idx, folder_path, folder_list = utils.default_folder(
             self, self.base_idx, self.ROOT_PATH, self.ROOT_LIST, "OPC-UA_Methods"
@@ -67,160 +81,20 @@ class UaManagerFboot(peer.UaPeer):
             "path_list": folder_list,
         }
 
-    def save_fboot(self, requests):
-        file = open(self.fboot_path, "w")
-        start_fb = None
-        is_watch = False
-        for request in requests:
-            element = ETree.fromstring(request)
-            for child in element:
-                if child.tag == "Watch":
-                    is_watch = True
-                    break
-
-            if is_watch:
-                is_watch = False
-                continue
-
-            if start_fb is None:
-                file.write(";")
-                for child in element:
-                    start_fb = child.attrib["Name"]
-            else:
-                file.write("{0};".format(start_fb))
-            file.write(request)
-            file.write("\n")
-        file.close()
-
-    def from_fboot(self):
-        tic = perf_counter()
-        # Check if data model file exists and is not empty
-        try:
-            file = open(self.fboot_path, "r")
-        except FileNotFoundError:
-            logger.warning("Could not find fboot definition file. Awaiting deployment.")
-        else:
-            if os.stat(self.fboot_path).st_size == 0:
-                logger.warning("Fboot definition file is empty. Awaiting deployment")
-            else:
-                try:
-                    # Parse data model file
-                    self.parse_fboot(file)
-                except self.InvalidFbootState:
-                    logger.error(
-                        "Fboot definition file is in an invalid state. Awaiting deployment"
-                    )
-                else:
-                    if len(self.method_names) != 0:
-                        self.method = ua_method.UaMethod(
-                            self, self.folders.get("OPC-UA_Methods"), self.method_root
-                        )
-                    toc = perf_counter()
-                    logger.info(f"FB generation time: {toc-tic}s")
-                    self.config.start_work()
-
-    def parse_fboot(self, file):
-        lines = file.readlines()
-        file.close()
-        # create function blocks - folders, objects and variables
-        self.generate_function_blocks(lines)
-        # create connections - write and create between variables and events
-        self.generate_connections(lines)
-        # create missing connections from START.COLD to unpopulated INIT inputs
-        self.generate_init_connections()
-
     def generate_function_blocks(self, lines):
-        for line in lines:
-            # Remove start fb from line
-            chunks = line.split(";",maxsplit = 1)
-            if len(chunks) != 2:
-                raise self.InvalidFbootState
-            xml_element = ETree.fromstring(chunks[1])
-            try:
-                if xml_element.get("Action") == "CREATE":
-                    for child in xml_element:
-                        if child.tag == "FB" and child.get("Type") != "EMB_RES":
-                            type = child.get("Type")
-                            root_path = self.config.fb_dict[type]
-                            fb_resource = FBResources(type, root_path)
-                            self.parse_fbt(fb_resource, child.get("Name"))
-            except KeyError:
-                raise self.InvalidFbootState
-
-    def generate_connections(self, lines):
-        for line in lines:
-            # Remove start fb from line
-            chunks = line.split(";",maxsplit = 1)
-            if len(chunks) != 2:
-                raise self.InvalidFbootState
-            xml_element = ETree.fromstring(chunks[1])
-            try:
-                if xml_element.get("Action") == "CREATE":
-                    for child in xml_element:
-                        if child.tag == "Connection":
-                            if len(self.method_names) == 0 or (
-                                not utils.any_element_in_string(
-                                    self.method_names, child.get("Source")
-                                )
-                                and not utils.any_element_in_string(
-                                    self.method_names, child.get("Destination")
-                                )
-                            ):
-                                # Create connection
-                                self.config.create_connection(
-                                    child.get("Source"), child.get("Destination")
-                                )
-                            elif len(self.method_names) != 0:
-                                if utils.any_element_in_string(
-                                    self.method_names, child.get("Source")
-                                ):
-                                    # Save event name to be triggered
-                                    self.method_event = child.get("Destination")
-                                elif utils.any_element_in_string(
-                                    self.method_names, child.get("Destination")
-                                ):
-                                    # save name of final fb to execute
-                                    self.method_final_fb = child.get("Source").split(
-                                        "."
-                                    )[0]
-                elif xml_element.get("Action") == "WRITE":
-                    for child in xml_element:
-                        if child.tag == "Connection":
-                            if len(
-                                self.method_names
-                            ) == 0 or not utils.any_element_in_string(
-                                self.method_names, child.get("Destination")
-                            ):
-                                # Write connection
-                                self.config.write_connection(
-                                    child.get("Source"), child.get("Destination")
-                                )
-                            elif len(
-                                self.method_names
-                            ) != 0 and utils.any_element_in_string(
-                                self.method_names, child.get("Destination")
-                            ):
-                                # Save wrapper info
-                                info_type = child.get("Destination").split(".")[1]
-                                if info_type == "INPUT":
-                                    self.method_inputs = child.get("Source")
-                                elif info_type == "OUTPUT":
-                                    self.method_outputs = child.get("Source")
-                                elif info_type == "METHOD_NAME":
-                                    self.opcua_method_name = child.get("Source")
-            except KeyError:
-                raise self.InvalidFbootState
-
-    def generate_init_connections(self):
-        # connect all unconnected INIT event inputs to START.COLD
-        function_blocks = self.config.fb_dictionary
-        for name, fb in function_blocks.items():
-            if (
-                not fb.init_is_connected()
-                and fb.has_event_input("INIT")
-                and fb.name != "START"
-            ):
-                self.config.create_connection("START.COLD", f"{fb.fb_name}.INIT")
+        # the nodes of every fb are added to the address space in one call
+        self.builder = node_builder.NodeBuilder(self)
+        try:
+            FbootLoader.generate_function_blocks(self, lines)
+        finally:
+            builder, self.builder = self.builder, None
+            builder.commit()
+
+    def generate_methods(self):
+        if len(self.method_names) != 0:
+            self.method = ua_method.UaMethod(
+                self, self.folders.get("OPC-UA_Methods"), self.method_root
+            )
 
     def parse_fbt(self, fb_resource: FBResources, fb_name: str):
         xml_root = fb_resource.get_xml().getroot()
@@ -231,14 +105,40 @@ class UaManagerFboot(peer.UaPeer):
         else:
             # add ua object to dictionary
             item = ua_object.UaObject(
-                self, self.folders.get("FunctionBlocks"), fb_resource, fb_name
+                self,
+                self.folders.get("FunctionBlocks"),
+                fb_resource,
+                fb_name,
+                builder=self.builder,
             )
             self.ua_objects[fb_name] = item
 
-    def stop_ua(self):
+    def add_anomaly_service(self, service):
+        if service not in self.anomaly_services:
+            self.anomaly_services.append(service)
+        service.add_publisher(self.publish_anomaly)
+
+    def publish_anomaly(self, detectors):
+        # results of one monitoring tick, pushed to the subscribed clients
+        for detector in detectors:
+            item = self.ua_objects.get(detector.fb.fb_name)
+            if item is not None and len(item.anomaly_vars) > 0:
+                item.update_anomaly(detector)
+
+    def stop_ua(self, stop_config=True):
+        # the anomaly results are not published to the stopped server
+        for service in self.anomaly_services:
+            service.remove_publisher(self.publish_anomaly)
         # stops the monitor thread
         self.monitor_hardware.stop()
         # stops the configuration work
-        self.config.stop_work()
+        if stop_config:
+            self.config.stop_work()
+        # writes the last values and stops the publisher
+        self.publisher.flush()
+        self.publisher.stop()
+        # writes the recorded values
+        if self.historian is not None:
+            self.historian.stop()
         # stops the ua server
         self.stop()
@@ -1,8 +1,9 @@
 from collections import OrderedDict
 from xml.etree import ElementTree as ETree
-from opcua import ua
-from opcua import uamethod
+from opc_ua.backend import ua
 from data_model_fboot import utils
+from opc_ua import backend
+from core import call_context
 import os
 import logging
 
@@ -10,6 +11,9 @@ logger = logging.getLogger("dinasore")
 
 
 class UaMethod:
+    # seconds a local call waits for the final fb
+    timeout = backend.CALL_TIMEOUT
+
     def __init__(self, ua_server, ua_folder, xml_root):
         self.ua_server = ua_server
         self.ua_folder = ua_folder
@@ -41,39 +45,34 @@ class UaMethod:
         # create method on opc ua server
         self.virtualize()
 
-    @uamethod
     def __execute(self, parent, *args):
-        # set input values
-        for i, (attr_name, _) in enumerate(self.inputs.items()):
+        args = [arg.Value for arg in args]
+        # input values of this call, applied by each fb when it executes the call
+        inputs = dict()
+        for i, attr_name in enumerate(self.inputs):
             if attr_name != self.ua_server.method_event:
-                chunks = attr_name.split(".")  # fb_name.attr_name
-                self.ua_server.config.fb_dictionary.get(chunks[0]).set_attr(
-                    chunks[1], args[i]
-                )
-
-        # push event with user inserted value
-        chunks = self.ua_server.method_event.split(".")  # fb_name.event_name
-        self.ua_server.config.fb_dictionary.get(chunks[0]).push_event(
-            chunks[1], args[len(args) - 1]
+                fb_name, var_name = attr_name.split(".")  # fb_name.attr_name
+                inputs.setdefault(fb_name, dict())[var_name] = args[i]
+        context = call_context.CallContext(
+            self.ua_server.method_final_fb,
+            inputs=inputs,
+            outputs=[tuple(attr_name.split(".")) for attr_name in self.outputs],
         )
 
-        self.ua_server.config.fb_dictionary.get(
-            self.ua_server.method_final_fb
-        ).execution_end.wait()
-
-        output_return = []
-        # read and save output values
-        for i, (attr_name, _) in enumerate(self.outputs.items()):
-            chunks = attr_name.split(".")  # fb_name.attr_name
-            _, value, _ = self.ua_server.config.fb_dictionary.get(chunks[0]).read_attr(
-                chunks[1]
-            )
-            output_return.append(value)
+        # push event with user inserted value, the outputs are saved in the context
+        fb_name, event_name = self.ua_server.method_event.split(".")  # fb_name.event_name
+        self.ua_server.config.fb_dictionary.get(fb_name).push_event(
+            event_name, args[len(args) - 1], context
+        )
 
+        # the server answers when the final fb executes this call
+        if backend.deferrable():
+            return context
+        # local calls wait for the result
+        output_return = context.result(timeout=self.timeout)
         if len(output_return) == 0:
-            return None
-        else:
-            return tuple(output_return)
+            return []
+        return [ua.Variant(value) for value in output_return]
 
     def get_fbs(self, fb):
         self.fbs[fb.fb_name] = fb.fb_type
@@ -82,7 +81,7 @@ class UaMethod:
         for _, connections in fb.output_connections.items():
             for connection in connections:
                 string_connection = (
-                    connection.destination_fb.fb_name + "." + connection.value_name
+                    connection.destination_fb.fb_name + "." + connection.destination_value_name
                 )
                 if string_connection not in self.fb_connections:
                     self.fb_connections.append(string_connection)
@@ -105,7 +104,7 @@ class UaMethod:
 
         for fb_name in self.fbs:
             file_name = self.fbs[fb_name] + ".fbt"
-            root_path = utils.get_fb_files_path(self.fbs[fb_name])
+            root_path = self.ua_server.config.fb_dict[self.fbs[fb_name]]
             file_path = os.path.join(root_path, file_name)
             xml_tree = ETree.parse(file_path)
             xml_root = xml_tree.getroot()
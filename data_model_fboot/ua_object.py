@@ -1,8 +1,12 @@
 from data_model_fboot import utils
+from opc_ua.backend import ua
 import logging
 import uuid
 
 from fb_resources import FBResources
+from core import startup_profile
+from core import fb_usage
+from opc_ua import node_builder
 
 logger = logging.getLogger("dinasore")
 
@@ -11,7 +15,10 @@ class UaObject:
     class InvalidFbtState(Exception):
         pass
 
-    def __init__(self, ua_server, ua_folder, fb_resource: FBResources, fb_name: str):
+    @startup_profile.timed("ua nodes")
+    def __init__(
+        self, ua_server, ua_folder, fb_resource: FBResources, fb_name: str, builder=None
+    ):
         self.ua_server = ua_server
         self.ua_folder = ua_folder
         self.fb_resource = fb_resource
@@ -21,6 +28,13 @@ class UaObject:
         self.opc_ua_type = self.xml_root.get("OpcUa")
         self.folders = dict()
         self.ua_vars = dict()
+        self.anomaly_vars = dict()
+        self.usage_vars = dict()
+        # last published value and cached coercion of each variable
+        self.published = dict()
+        self.coercions = dict()
+        # variable name -> key of its history
+        self.history_keys = dict()
         # creates the fb inside the configuration
         self.ua_server.config.create_virtualized_fb(
             self.fb_name, fb_resource, self.update_variables
@@ -32,10 +46,25 @@ class UaObject:
         # Because of this reason i disabled it for now
         # self.set_up_connections()
 
+        # the nodes are added with the other fbs of the deployment when there is a builder
+        if builder is None:
+            builder = node_builder.NodeBuilder(ua_server)
+            self.build(builder)
+            builder.commit()
+        else:
+            self.build(builder)
+
+    def build(self, builder):
+        ua_folder = self.ua_folder
+        self.folders = dict()
+        self.ua_vars = dict()
+        self.anomaly_vars = dict()
+        self.usage_vars = dict()
+        self.published = dict()
         # create object
         self.obj_idx = "{0}:{1}".format(ua_folder.get("idx"), self.fb_name)
         self.obj_path_list, self.obj_path = utils.default_object(
-            ua_server,
+            builder,
             self.obj_idx,
             ua_folder.get("path"),
             ua_folder.get("path_list"),
@@ -43,7 +72,7 @@ class UaObject:
         )
         # create variables and events folders
         var_folder_idx, var_folder_path, var_folder_list = utils.default_folder(
-            ua_server, self.obj_idx, self.obj_path, self.obj_path_list, "Variables"
+            builder, self.obj_idx, self.obj_path, self.obj_path_list, "Variables"
         )
         var_folder = {
             "idx": var_folder_idx,
@@ -52,7 +81,7 @@ class UaObject:
         }
         self.folders["VarFolder"] = var_folder
         event_folder_idx, event_folder_path, event_folder_list = utils.default_folder(
-            ua_server, self.obj_idx, self.obj_path, self.obj_path_list, "Events"
+            builder, self.obj_idx, self.obj_path, self.obj_path_list, "Events"
         )
         event_folder = {
             "idx": event_folder_idx,
@@ -62,16 +91,110 @@ class UaObject:
         self.folders["EventFolder"] = event_folder
         # populate vars and events folders
         try:
-            self.populate_vars_folder()
-            self.populate_events_folder()
+            self.populate_vars_folder(builder)
+            self.populate_events_folder(builder)
         except self.InvalidFbtState:
             logger.error(
                 "Invalid function block definition, check {0}.fbt for mistakes".format(
                     self.fb_name
                 )
             )
+        # cpu time, queue and memory of the fb (updated by the monitoring thread)
+        self.populate_usage_folder(builder)
+        # anomaly detection results of monitored fbs
+        fb = self.ua_server.config.get_fb(self.fb_name)
+        if fb is not None and fb.monitor_fb is not None:
+            self.populate_anomaly_folder(fb.anomaly_detector, builder)
+            # publishes once the variables are in the address space
+            builder.on_commit(
+                lambda: self.ua_server.add_anomaly_service(fb.anomaly_service)
+            )
+
+    def rebuild(self):
+        # replaces the subtree of the fb, adding the new nodes in one call
+        self.ua_server.delete_nodes([self.ua_server.find_node(self.obj_path)], recursive=True)
+        self.ua_server.forget_nodes(self.obj_path)
+        builder = node_builder.NodeBuilder(self.ua_server)
+        self.build(builder)
+        builder.commit()
+
+    def populate_usage_folder(self, builder):
+        folder_idx, folder_path, _ = utils.default_folder(
+            builder, self.obj_idx, self.obj_path, self.obj_path_list, "Usage"
+        )
+        self.folders["UsageFolder"] = {"idx": folder_idx, "path": folder_path}
+        for var_name, value in self.usage_values(None).items():
+            self.usage_vars[var_name] = builder.create_variable(
+                folder_path,
+                "{0}:{1}".format(folder_idx, var_name),
+                "2:{0}".format(var_name),
+                value,
+            )
+
+    @staticmethod
+    def usage_values(fb):
+        # cpu in schedule() (thread clock), queued events and memory traced to the fb source file
+        usage = fb_usage.FBUsage() if fb is None else fb.usage
+        return {
+            "EXECUTIONS": ua.Variant(usage.executions, ua.VariantType.Int64),
+            "CPU_TIME": ua.Variant(usage.cpu_time, ua.VariantType.Double),
+            "AVG_MS": ua.Variant(1000.0 * usage.average(), ua.VariantType.Double),
+            "MAX_MS": ua.Variant(1000.0 * usage.max_cpu_time, ua.VariantType.Double),
+            "QUEUE_DEPTH": ua.Variant(0 if fb is None else fb.event_queue.qsize(), ua.VariantType.Int64),
+            "QUEUE_BYTES": ua.Variant(0 if fb is None else fb_usage.queue_bytes(fb), ua.VariantType.Int64),
+            "ALLOC_BYTES": ua.Variant(usage.alloc_bytes, ua.VariantType.Int64),
+            "ALLOC_DELTA": ua.Variant(usage.alloc_delta, ua.VariantType.Int64),
+        }
+
+    def update_usage(self, fb):
+        values = self.usage_values(fb)
+        nodeids = [self.usage_vars[var_name].nodeid for var_name in values]
+        # every counter with one request
+        self.ua_server.write_values(nodeids, list(values.values()))
+
+    def populate_anomaly_folder(self, detector, builder=None):
+        if builder is None:
+            builder = self.ua_server
+        folder_idx, folder_path, _ = utils.default_folder(
+            builder, self.obj_idx, self.obj_path, self.obj_path_list, "AnomalyDetection"
+        )
+        self.folders["AnomalyFolder"] = {"idx": folder_idx, "path": folder_path}
+
+        # latest prediction of each algorithm (1 normal, -1 anomaly, 0 not classified yet)
+        initial_values = {
+            name.upper().replace(" ", "_"): ua.Variant(0, ua.VariantType.Int64)
+            for name in detector.predictions
+        }
+        initial_values.update(
+            {
+                "ALERTS": ua.Variant(0, ua.VariantType.Int64),
+                "FEATURES": ua.Variant([], ua.VariantType.Double),
+                "TRAINING_STATE": ua.Variant(detector.state, ua.VariantType.String),
+            }
+        )
+        for var_name, value in initial_values.items():
+            self.anomaly_vars[var_name] = builder.create_variable(
+                folder_path,
+                "{0}:{1}".format(folder_idx, var_name),
+                "2:{0}".format(var_name),
+                value,
+            )
+
+    def update_anomaly(self, detector):
+        values = {
+            name.upper().replace(" ", "_"): ua.Variant(int(prediction), ua.VariantType.Int64)
+            for name, prediction in detector.predictions.items()
+        }
+        values["ALERTS"] = ua.Variant(detector.alerts, ua.VariantType.Int64)
+        values["FEATURES"] = ua.Variant(
+            [float(value) for value in detector.features], ua.VariantType.Double
+        )
+        values["TRAINING_STATE"] = ua.Variant(detector.state, ua.VariantType.String)
+        for var_name, value in values.items():
+            self.anomaly_vars[var_name].set_value(value)
 
-    def populate_vars_folder(self):
+    def populate_vars_folder(self, builder):
+        historian = self.ua_server.historian
         for child in self.xml_root:  # InterfaceList
             # skip things like identification and version info
             if child.tag != "InterfaceList":
@@ -87,18 +210,43 @@ class UaObject:
                                     self.folders["VarFolder"].get("idx"),
                                     var_declaration.get("Name"),
                                 )
-                                ua_var = self.ua_server.create_typed_variable(
+                                # inputs the clients can write (OpcUaWritable="true")
+                                writable = (
+                                    element.tag == "InputVars"
+                                    and var_declaration.get("OpcUaWritable", "").lower() == "true"
+                                )
+                                ua_var = builder.create_typed_variable(
                                     self.folders["VarFolder"].get("path"),
                                     var_idx,
                                     var_declaration.get("Name"),
                                     utils.UA_TYPES[var_declaration.get("Type")],
                                     0,
+                                    writable=writable,
+                                    historizing=historian is not None,
                                 )
                                 self.ua_vars[var_declaration.get("Name")] = ua_var
+                                if historian is not None:
+                                    key = "{0}/{1}".format(self.fb_name, var_declaration.get("Name"))
+                                    self.history_keys[var_declaration.get("Name")] = key
+                                    historian.register(ua_var.nodeid, key)
+                                if writable:
+                                    self.watch_input(
+                                        builder,
+                                        var_declaration.get("Name"),
+                                        ua_var,
+                                        var_declaration.get("OpcUaEvent"),
+                                    )
                             except KeyError:
                                 raise self.InvalidFbtState
 
-    def populate_events_folder(self):
+    def watch_input(self, builder, var_name, ua_var, event_name=None):
+        # the writes reach the fb input once the variable is in the address space,
+        # raising the input event named by OpcUaEvent (if any)
+        builder.on_commit(
+            lambda: self.ua_server.inputs.watch(self, var_name, ua_var, event_name)
+        )
+
+    def populate_events_folder(self, builder):
         for child in self.xml_root:  # InterfaceList
             # skip things like identification and version info
             if child.tag != "InterfaceList":
@@ -113,7 +261,7 @@ class UaObject:
                                 self.folders["EventFolder"].get("idx"),
                                 event.get("Name"),
                             )
-                            ua_var = self.ua_server.create_typed_variable(
+                            ua_var = builder.create_typed_variable(
                                 self.folders["EventFolder"].get("path"),
                                 var_idx,
                                 event.get("Name"),
@@ -152,24 +300,61 @@ class UaObject:
                 "{0}.{1}".format(self.fb_name, "INIT"),
             )
 
+    def to_variant(self, var_name, v_type, value):
+        # the coercion of the fb type, replaced by the first one that works
+        if var_name not in self.coercions:
+            self.coercions[var_name] = utils.UA_COERCIONS.get(v_type)
+        coercion = self.coercions[var_name]
+        if coercion is not None:
+            convert, variant_type = coercion
+            try:
+                return ua.Variant(convert(value), variant_type)
+            except (TypeError, ValueError):
+                pass
+        # variant type guessed from the value
+        variant = ua.Variant(value)
+        if variant.VariantType == ua.VariantType.ExtensionObject:
+            # values without an opc-ua type are written as strings
+            logger.warning(
+                "{0}.{1} has no opc-ua type, it is written as a string.".format(
+                    self.fb_name, var_name
+                )
+            )
+            self.coercions[var_name] = (str, ua.VariantType.String)
+            return ua.Variant(str(value), ua.VariantType.String)
+        self.coercions[var_name] = None
+        return variant
+
+    def changed(self, var_name, value):
+        return var_name not in self.published or not utils.same_value(
+            self.published[var_name], value
+        )
+
     def update_variables(self):
         # gets the function block
         fb = self.ua_server.config.get_fb(self.fb_name)
-        # iterates over the variables dict
-        for var_name, var_ua in self.ua_vars.items():
-            # reads the variable value
-            v_type, value, _ = fb.read_attr(var_name)
+        # the publisher writes the values outside the fb thread
+        self.ua_server.publisher.push(self, fb.read_values(self.ua_vars))
 
-            try:
-                # writes the value inside the opc-ua variable
-                var_ua.set_value(value)
-
-            except Exception as error:
-                # reports the error
-                logger.warning("Error writing the value in the opc-ua server.")
-                logger.warning(error)
-                if v_type == "STRING":
-                    # writes the value as a string
-                    var_ua.set_value(str(value))
-                    # writes the solution
-                    logger.warning("Error solved writing the variable as string.")
+    def publish(self, values):
+        nodeids = []
+        variants = []
+        # only the variables that changed since the last publication
+        for var_name, (v_type, value) in values.items():
+            # the fb values are never reset, the variables keep their initial value until set
+            if value is None or not self.changed(var_name, value):
+                continue
+            self.published[var_name] = value
+            if var_name in self.history_keys:
+                self.ua_server.historian.record(self.history_keys[var_name], value)
+            nodeids.append(self.ua_vars[var_name].nodeid)
+            variants.append(self.to_variant(var_name, v_type, value))
+
+        if len(nodeids) > 0:
+            # writes every changed value with one request
+            for nodeid, status in zip(nodeids, self.ua_server.write_values(nodeids, variants)):
+                if not status.is_good():
+                    logger.warning(
+                        "Error writing {0} in the opc-ua server: {1}".format(nodeid, status)
+                    )
+        return len(nodeids)
@@ -0,0 +1,142 @@
+import logging
+import threading
+import time
+
+from data_model_fboot import utils
+
+logger = logging.getLogger("dinasore")
+
+
+class UaPublisher(threading.Thread):
+    """
+    Writes the fb values in the opc-ua variables, outside the fb threads
+
+    The fb threads push the latest values and return. Values not yet
+    published are replaced by newer ones (counted as dropped), and each
+    variable is published at most at the rate of its fb or its own rate.
+    """
+
+    def __init__(self, max_rate=None):
+        threading.Thread.__init__(self, name="ua_publisher", daemon=True)
+        self.condition = threading.Condition()
+        self.notified = False
+        # one batch of writes at a time, so an older batch never overwrites a newer one
+        self.writing = threading.Lock()
+        # ua object -> {variable name: (type, value)}
+        self.pending = dict()
+        # fb name or (fb name, variable name) -> minimum seconds between writes
+        self.periods = dict()
+        self.default_period = 0.0 if not max_rate else 1.0 / max_rate
+        # (fb name, variable name) -> earliest time of the next write
+        self.next_times = dict()
+        self.stopped = False
+
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self.dropped = 0
+        self.published = 0
+        # opc-ua variables with the counters, written about once per second
+        self.stats_vars = dict()
+        self.stats_time = 0.0
+
+    def set_rate(self, fb_name, max_rate, var_name=None):
+        # maximum writes per second of a fb or of one of its variables (None: no limit)
+        key = fb_name if var_name is None else (fb_name, var_name)
+        self.periods[key] = 0.0 if not max_rate else 1.0 / max_rate
+
+    def period(self, fb_name, var_name):
+        period = self.periods.get((fb_name, var_name))
+        if period is None:
+            period = self.periods.get(fb_name, self.default_period)
+        return period
+
+    def push(self, item, values):
+        with self.condition:
+            pending = self.pending.setdefault(item, dict())
+            for var_name, value in values.items():
+                if var_name in pending:
+                    if not utils.same_value(pending[var_name][1], value[1]):
+                        self.dropped += 1
+                elif not item.changed(var_name, value[1]):
+                    continue
+                else:
+                    self.queue_depth += 1
+                pending[var_name] = value
+            self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+            if len(pending) == 0:
+                del self.pending[item]
+            else:
+                self.notified = True
+                self.condition.notify()
+
+    def take_due(self, now, force=False):
+        # removes the values that can be written now, returns them and the time to wait
+        due = []
+        wait = None
+        for item in list(self.pending):
+            pending = self.pending[item]
+            values = dict()
+            for var_name in list(pending):
+                key = (item.fb_name, var_name)
+                next_time = self.next_times.get(key, 0.0)
+                if force or next_time <= now:
+                    values[var_name] = pending.pop(var_name)
+                    self.next_times[key] = now + self.period(item.fb_name, var_name)
+                elif wait is None or next_time - now < wait:
+                    wait = next_time - now
+            if len(pending) == 0:
+                del self.pending[item]
+            if len(values) > 0:
+                due.append((item, values))
+                self.queue_depth -= len(values)
+        return due, wait
+
+    def publish(self, due):
+        for item, values in due:
+            try:
+                self.published += item.publish(values)
+            except Exception as error:
+                logger.error("Error publishing {0} in the opc-ua server.".format(item.fb_name))
+                logger.exception(error)
+
+    def flush(self):
+        # writes every pending value now, without the rate limits
+        with self.writing:
+            with self.condition:
+                due, _ = self.take_due(time.monotonic(), force=True)
+            self.publish(due)
+
+    def stats(self):
+        return {
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "dropped": self.dropped,
+            "published": self.published,
+        }
+
+    def update_stats(self, now):
+        if len(self.stats_vars) == 0 or now - self.stats_time < 1.0:
+            return
+        self.stats_time = now
+        for name, value in self.stats().items():
+            self.stats_vars[name.upper()].set_value(value)
+
+    def run(self):
+        while not self.stopped:
+            with self.writing:
+                with self.condition:
+                    due, wait = self.take_due(time.monotonic())
+                    self.notified = False
+                self.publish(due)
+            self.update_stats(time.monotonic())
+            if len(due) == 0:
+                with self.condition:
+                    if not self.stopped and not self.notified:
+                        self.condition.wait(1.0 if wait is None else min(wait, 1.0))
+
+    def stop(self):
+        with self.condition:
+            self.stopped = True
+            self.condition.notify()
+        if self.is_alive():
+            self.join()
@@ -1,10 +1,15 @@
 import logging
 
-from opcua import ua
-import os
-import sys
-import glob
-from typing import Dict
+from opc_ua.backend import ua
+
+# kept here for the modules that use them through utils
+from data_model_fboot.fb_files import (
+    XML_4DIAC,
+    any_element_in_string,
+    create_fb_index,
+    get_fb_files_path,
+    scan_match,
+)
 
 UA_TYPES = {
     "String": ua.VariantType.String,
@@ -15,26 +20,28 @@ UA_TYPES = {
     "UINT": ua.VariantType.UInt64,
     "Float": ua.VariantType.Float,
     "REAL": ua.VariantType.Float,
-    "LREAL": ua.VariantType.Float,
+    "LREAL": ua.VariantType.Double,
     "BOOL": ua.VariantType.Boolean,
     "Boolean": ua.VariantType.Boolean,
 }
 
-XML_4DIAC = {
-    "String": "String",
-    "STRING": "String",
-    "Double": "Double",
-    "Integer": "Integer",
-    "INT": "Integer",
-    "UINT": "Integer",
-    "Float": "Float",
-    "REAL": "Float",
-    "LREAL": "Float",
-    "BOOL": "Boolean",
-    "Boolean": "Boolean",
-    "ANY": None,
-    "DATE_AND_TIME": "Datetime",
-}  # not sure if this is right
+# conversion of the fb values written in the opc-ua variables
+# (the variant type of each variable, the asyncua server refuses the others)
+UA_COERCIONS = {
+    "String": (str, ua.VariantType.String),
+    "STRING": (str, ua.VariantType.String),
+    "Double": (float, ua.VariantType.Double),
+    "Float": (float, ua.VariantType.Float),
+    "REAL": (float, ua.VariantType.Float),
+    "LREAL": (float, ua.VariantType.Double),
+    "Integer": (int, ua.VariantType.Int64),
+    "INT": (int, ua.VariantType.Int64),
+    "UINT": (int, ua.VariantType.UInt64),
+    "BOOL": (bool, ua.VariantType.Boolean),
+    "Boolean": (bool, ua.VariantType.Boolean),
+    # the event variables are strings
+    "Event": (str, ua.VariantType.String),
+}
 
 UA_NODE = {
     ua.VariantType.String: ua.NodeId(ua.ObjectIds.String),
@@ -57,6 +64,14 @@ XML_NODE = {
 logger = logging.getLogger("dinasore")
 
 
+# values compared with the last publication, the others are always written
+SCALAR_TYPES = (int, float, str, bool, type(None))
+
+
+def same_value(old, new):
+    return isinstance(new, SCALAR_TYPES) and type(old) is type(new) and old == new
+
+
 def default_folder(ua_peer, obj_idx, obj_path, path_list, folder_name):
     # creates the methods folder
     folder_idx = "{0}:{1}".format(obj_idx, folder_name)
@@ -112,56 +127,6 @@ def parse_fb_description(fb_xml):
     return input_events_xml, output_events_xml, input_vars_xml, output_vars_xml
 
 
-def any_element_in_string(array, string):
-    for element in array:
-        if element in string:
-            return True
-
-    return False
-
-
-def get_fb_files_path(fb_name):
-    root_fbs_path = os.path.join(os.path.dirname(sys.path[0]), "resources")
-
-    try:
-        path = next(scan_match(fb_name, root_fbs_path))
-    except Exception:
-        print("Name {0} path {1}".format(fb_name, root_fbs_path))
-        sys.exit(0)
-    if "__pycache__" in path:
-        path = path.replace("/__pycache__", "")
-    return path
-
-
-def scan_match(fb_name, dir):
-    for root, dirs, files in os.walk(dir):
-        for file in files:
-            if file.split(".")[0] == fb_name:
-                yield root
-
-
-def create_fb_index(root_directory: str) -> Dict[str, str]:
-    # Find all .fbt files
-    fbt_files = glob.glob(os.path.join(root_directory, "**/*.fbt"), recursive=True)
-    fb_index: Dict[str, str] = {}
-
-    for fbt_file in fbt_files:
-        dir_name = os.path.dirname(fbt_file)
-        fbt_file_name = os.path.basename(fbt_file)
-        fb_type = fbt_file_name.replace(".fbt", "")
-        py_file = os.path.join(dir_name, fbt_file_name.replace(".fbt", ".py"))
-
-        # Check if the corresponding .py file exists
-        if os.path.exists(py_file):
-            fb_index[fb_type] = dir_name
-        else:
-            logger.warning(
-                f"Discovered {py_file} but not its corresponding python implementation *.py"
-            )
-
-    return fb_index
-
-
 class UaInterface:
     def from_xml(self, item_xml):
         raise NotImplementedError
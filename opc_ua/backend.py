@@ -0,0 +1,294 @@
+import asyncio
+import importlib
+import threading
+from concurrent.futures import Future
+
+# opc-ua stack of the server, chosen before the opc-ua modules are imported (main.py -b)
+selected = "opcua"
+# stack whose types were already given to a module
+loaded = None
+
+# set while a network request calls the methods, so they may return a Future
+local = threading.local()
+
+# seconds a client waits for a method that returned a Future before BadTimeout
+CALL_TIMEOUT = 30.0
+
+# asyncio loop thread shared by the asyncua servers and the asyncio 4diac server
+shared = None
+shared_lock = threading.Lock()
+
+
+def select(name):
+    global selected
+    if name not in BACKENDS:
+        raise ValueError(
+            "unknown opc-ua backend {0} (options: {1})".format(name, ", ".join(BACKENDS))
+        )
+    if loaded is not None and loaded != name:
+        raise RuntimeError("the opc-ua modules already use the {0} backend".format(loaded))
+    selected = name
+
+
+def __getattr__(attr):
+    # ua (types) and manage_nodes of the selected stack, e.g. from opc_ua.backend import ua
+    global loaded
+    if attr not in ("ua", "manage_nodes"):
+        raise AttributeError("module {0} has no attribute {1}".format(__name__, attr))
+    loaded = selected
+    module = "ua" if attr == "ua" else "common.manage_nodes"
+    return importlib.import_module("{0}.{1}".format(BACKENDS[selected].package, module))
+
+
+def create(address, server_name, name=None):
+    return BACKENDS[selected if name is None else name](address, server_name)
+
+
+def deferrable():
+    # True when the method can return a Future instead of waiting for the result
+    return getattr(local, "deferrable", False)
+
+
+def shared_loop():
+    global shared
+    with shared_lock:
+        if shared is None:
+            from asyncua import sync
+
+            shared = sync.ThreadLoop()
+            shared.daemon = True
+            shared.start()
+    return shared
+
+
+class UaBackend:
+    """
+    Server stack behind UaPeer
+
+    The address space is built and updated through the nodes the stack
+    returns (add_object, add_variable, set_value, ... as in python-opcua)
+    and the bulk requests below, so UaPeer, UaBase and NodeBuilder do not
+    depend on one stack.
+    """
+
+    # package with the ua types and common.manage_nodes
+    package = None
+
+    def __init__(self, address, server_name):
+        self.server = None
+        self.ua = importlib.import_module("{0}.ua".format(self.package))
+
+    def start(self):
+        raise NotImplementedError
+
+    def stop(self):
+        raise NotImplementedError
+
+    def get_root_node(self):
+        return self.server.get_root_node()
+
+    def get_node(self, nodeid):
+        return self.server.get_node(nodeid)
+
+    def register_namespace(self, uri):
+        return self.server.register_namespace(uri)
+
+    def delete_nodes(self, nodes, recursive=False):
+        return self.server.delete_nodes(nodes, recursive=recursive)
+
+    # node calls, with the python-opcua names
+    def type_definition(self, node):
+        return node.get_type_definition()
+
+    def set_value_rank(self, node, value_rank, dimensions):
+        node.set_value_rank(value_rank)
+        node.set_array_dimensions(dimensions)
+
+    def set_data_value(self, node, data_value):
+        node.set_attribute(self.ua.AttributeIds.Value, data_value)
+
+    def method(self, func):
+        # callback of a method node, may return a Future (see deferrable)
+        raise NotImplementedError
+
+    def add_nodes(self, items):
+        # AddNodesItem list in one request, returns the AddNodesResult list
+        raise NotImplementedError
+
+    def add_method_callback(self, nodeid, func):
+        raise NotImplementedError
+
+    def write(self, params):
+        # WriteParameters in one request, returns the status codes
+        raise NotImplementedError
+
+    def add_write_callback(self, nodeid, func):
+        # func(handle, data value) after a write of the node value (python-opcua: only when it changes)
+        raise NotImplementedError
+
+    def call_soon(self, func):
+        # runs func in the server loop, after the request being processed
+        raise NotImplementedError
+
+    def set_history_storage(self, storage):
+        # storage with the python-opcua HistoryStorageInterface methods, serves HistoryRead
+        raise NotImplementedError
+
+
+class OpcUaBackend(UaBackend):
+    """
+    python-opcua: synchronous server with its own threads (default)
+    """
+
+    package = "opcua"
+
+    def __init__(self, address, server_name):
+        UaBackend.__init__(self, address, server_name)
+        from opcua import Server
+        from opc_ua import deferred_call
+
+        self.server = Server()
+        self.server.set_endpoint(address)
+        self.server.set_server_name(server_name)
+        # the method calls that return a Future are answered without stalling the server loop
+        self.server.bserver = deferred_call.DeferredCallServer(
+            self.server.iserver, self.server.endpoint.hostname, self.server.endpoint.port
+        )
+
+    def start(self):
+        self.server.start()
+
+    def stop(self):
+        self.server.stop()
+
+    def method(self, func):
+        # the connections answer the Futures (deferred_call.DeferredCallProcessor)
+        return func
+
+    def add_nodes(self, items):
+        return self.server.iserver.isession.add_nodes(items)
+
+    def add_method_callback(self, nodeid, func):
+        self.server.iserver.isession.add_method_callback(nodeid, self.method(func))
+
+    def write(self, params):
+        return self.server.iserver.isession.write(params)
+
+    def add_write_callback(self, nodeid, func):
+        self.server.iserver.aspace.add_datachange_callback(nodeid, self.ua.AttributeIds.Value, func)
+
+    def call_soon(self, func):
+        self.server.iserver.loop.call_soon(func)
+
+    def set_history_storage(self, storage):
+        self.server.iserver.history_manager.set_storage(storage)
+
+
+class AsyncUaBackend(UaBackend):
+    """
+    asyncua: asyncio server on the loop thread shared by the runtime
+
+    The methods run as coroutines of the server, so the ones returning a
+    Future are awaited without blocking the other requests.
+    """
+
+    package = "asyncua"
+
+    def __init__(self, address, server_name):
+        UaBackend.__init__(self, address, server_name)
+        from asyncua import sync
+
+        self.tloop = shared_loop()
+        self.server = sync.Server(tloop=self.tloop)
+        self.server.set_endpoint(address)
+        self.server.set_server_name(server_name)
+
+    @property
+    def session(self):
+        return self.server.aio_obj.iserver.isession
+
+    def start(self):
+        self.server.start()
+
+    def stop(self):
+        self.server.stop()
+
+    def get_root_node(self):
+        return self.server.nodes.root
+
+    def delete_nodes(self, nodes, recursive=False):
+        return self.tloop.post(
+            self.server.aio_obj.delete_nodes([node.aio_obj for node in nodes], recursive=recursive)
+        )
+
+    def type_definition(self, node):
+        return node.read_type_definition()
+
+    def set_value_rank(self, node, value_rank, dimensions):
+        node.write_value_rank(value_rank)
+        node.write_array_dimensions(dimensions)
+
+    def set_data_value(self, node, data_value):
+        node.write_attribute(self.ua.AttributeIds.Value, data_value)
+
+    def method(self, func):
+        ua = self.ua
+
+        async def call(parent, *args):
+            local.deferrable = True
+            try:
+                result = func(parent, *args)
+            finally:
+                local.deferrable = False
+            if not isinstance(result, Future):
+                return result
+            try:
+                values = await asyncio.wait_for(asyncio.wrap_future(result), CALL_TIMEOUT)
+            except asyncio.TimeoutError:
+                return ua.StatusCode(ua.StatusCodes.BadTimeout)
+            return [value if isinstance(value, ua.Variant) else ua.Variant(value) for value in values]
+
+        return call
+
+    def add_nodes(self, items):
+        return self.tloop.post(self.session.add_nodes(items))
+
+    def add_method_callback(self, nodeid, func):
+        self.session.add_method_callback(nodeid, self.method(func))
+
+    def write(self, params):
+        return self.tloop.post(self.session.write(params))
+
+    def add_write_callback(self, nodeid, func):
+        async def changed(handle, data_value):
+            func(handle, data_value)
+
+        self.server.aio_obj.iserver.aspace.add_datachange_callback(
+            nodeid, self.ua.AttributeIds.Value, changed
+        )
+
+    def call_soon(self, func):
+        self.tloop.loop.call_soon_threadsafe(func)
+
+    def set_history_storage(self, storage):
+        self.server.aio_obj.iserver.history_manager.set_storage(AsyncHistoryStorage(storage))
+
+
+class AsyncHistoryStorage:
+    """
+    Coroutines of the asyncua history manager calling a synchronous storage
+    """
+
+    def __init__(self, storage):
+        self.storage = storage
+
+    def __getattr__(self, name):
+        method = getattr(self.storage, name)
+
+        async def call(*args, **kwargs):
+            return method(*args, **kwargs)
+
+        return call
+
+
+BACKENDS = {"opcua": OpcUaBackend, "asyncua": AsyncUaBackend}
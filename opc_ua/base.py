@@ -1,65 +1,95 @@
-from opcua import ua
-
-
 class UaBase:
-    def __init__(self):
+    def __init__(self, ua_types=None):
+        if ua_types is None:
+            from opcua import ua as ua_types
+        # ua types of the opc-ua stack (python-opcua or asyncua)
+        self.ua = ua_types
         self.root = None
         self.methods_dictionary = dict()
         self.variables_dictionary = dict()
+        # browse path (tuple) -> node, filled as the nodes are created or found
+        self.node_cache = dict()
+
+    def find_node(self, path):
+        key = tuple(path)
+        node = self.node_cache.get(key)
+        if node is None:
+            node = self.root.get_child(path)
+            self.node_cache[key] = node
+        return node
+
+    def forget_nodes(self, path):
+        # drops the cached nodes of a deleted subtree
+        prefix = tuple(path)
+        for key in [key for key in self.node_cache if key[: len(prefix)] == prefix]:
+            del self.node_cache[key]
+
+    def cache_node(self, path, index, name, node):
+        # caches the new child with the browse name the path generator uses
+        if isinstance(index, int):
+            browse_name = "{0}:{1}".format(index, name)
+        else:
+            browse_name = self.ua.QualifiedName.from_string(name).to_string()
+        self.node_cache[tuple(path) + (browse_name,)] = node
+        return node
 
     def get_object(self, path):
-        obj = self.root.get_child(path)
+        obj = self.find_node(path)
         return obj
 
     def create_object(self, index, new_obj_name, path=None):
         if path is None:
-            self.root.add_object(index, new_obj_name)
+            path = []
+            my_obj = self.root
         else:
-            my_obj = self.root.get_child(path)
-            my_obj.add_object(index, new_obj_name)
+            my_obj = self.find_node(path)
+        new_obj = my_obj.add_object(index, new_obj_name)
+        return self.cache_node(path, index, new_obj_name, new_obj)
 
     def create_variable(self, path, index, var_name, val, writable=False):
-        my_obj = self.root.get_child(path)
+        my_obj = self.find_node(path)
         my_var = my_obj.add_variable(index, var_name, val)
 
         if writable:
             my_var.set_writable()
 
-        return my_var
+        return self.cache_node(path, index, var_name, my_var)
 
     def create_typed_variable(
         self, path, index, var_name, var_type, value_rank, dimensions=0, writable=False
     ):
-        my_obj = self.root.get_child(path)
+        my_obj = self.find_node(path)
         my_var = my_obj.add_variable(index, var_name, [], var_type)
-        my_var.set_value_rank(value_rank)
-        my_var.set_array_dimensions([dimensions])
+        self.set_value_rank(my_var, value_rank, [dimensions])
 
         if writable:
             my_var.set_writable()
 
-        return my_var
+        return self.cache_node(path, index, var_name, my_var)
 
     def create_folder(self, path, index, folder_name):
-        my_obj = self.root.get_child(path)
-        my_obj.add_folder(index, folder_name)
+        my_obj = self.find_node(path)
+        my_folder = my_obj.add_folder(index, folder_name)
+        return self.cache_node(path, index, folder_name, my_folder)
 
     def create_property(self, path, index, property_name, value):
-        my_obj = self.root.get_child(path)
-        my_obj.add_property(index, property_name, value)
+        my_obj = self.find_node(path)
+        my_property = my_obj.add_property(index, property_name, value)
+        return self.cache_node(path, index, property_name, my_property)
 
     def create_method(
         self, path, index, method_name, func, input_args=None, output_args=None
     ):
-        my_obj = self.root.get_child(path)
-        my_obj.add_method(index, method_name, func, input_args, output_args)
+        my_obj = self.find_node(path)
+        my_method = my_obj.add_method(index, method_name, func, input_args, output_args)
+        return self.cache_node(path, index, method_name, my_method)
 
     def write(self, path, val):
-        my_obj = self.root.get_child(path)
-        my_obj.set_attribute(ua.AttributeIds.Value, ua.DataValue(val))
+        my_obj = self.find_node(path)
+        self.set_data_value(my_obj, self.ua.DataValue(val))
 
     def read(self, path):
-        my_obj = self.root.get_child(path)
+        my_obj = self.find_node(path)
         val = my_obj.get_value()
         return val
 
@@ -69,11 +99,22 @@ class UaBase:
 
         path_string = "-".join(path)
         if path_string not in self.methods_dictionary:
-            self.methods_dictionary[path_string] = self.root.get_child(path)
+            self.methods_dictionary[path_string] = self.find_node(path)
 
         result = self.methods_dictionary[path_string].call_method(method_name, *args)
         return result
 
+    # node calls named differently by the opc-ua stacks (UaPeer asks its backend)
+    def type_definition(self, node):
+        return node.get_type_definition()
+
+    def set_value_rank(self, node, value_rank, dimensions):
+        node.set_value_rank(value_rank)
+        node.set_array_dimensions(dimensions)
+
+    def set_data_value(self, node, data_value):
+        node.set_attribute(self.ua.AttributeIds.Value, data_value)
+
     @staticmethod
     def generate_path(pair_list):
         path = []
@@ -1,12 +1,24 @@
-from opcua import Client
+from opcua import Client, ua
 from opc_ua import base
+from opc_ua import subscriptions
 import logging
 
 
 class UaClient(base.UaBase, Client):
+    # status codes of a lost connection (the request can be sent again on a new session)
+    RECONNECT_CODES = (
+        ua.StatusCodes.BadConnectionClosed,
+        ua.StatusCodes.BadSecureChannelClosed,
+        ua.StatusCodes.BadSessionClosed,
+        ua.StatusCodes.BadSessionIdInvalid,
+        ua.StatusCodes.BadServerNotConnected,
+        ua.StatusCodes.BadNotConnected,
+        ua.StatusCodes.BadCommunicationError,
+    )
+
     def __init__(self, address):
         Client.__init__(self, url=address, timeout=60 * 8)
-        base.UaBase.__init__(self)
+        base.UaBase.__init__(self, ua)
         logging.basicConfig(
             level=logging.INFO,
             format="[%(asctime)s][%(levelname)s][%(threadName)-15s] %(message)s",
@@ -15,28 +27,73 @@ class UaClient(base.UaBase, Client):
         self.connect()
         self.root = self.get_root_node()
 
-        self.subs_dictionary = dict()
+        # monitored items grouped by publishing interval
+        self.subscriptions = subscriptions.SubscriptionManager(self)
 
-    def subscribe(self, path, handler, period=100):
-        my_obj = self.root.get_child(path)
+    def connect(self):
+        Client.connect(self)
+        # the nodes found in a previous session may not exist in a restarted server
+        self.node_cache.clear()
+        self.methods_dictionary.clear()
+
+    def reconnect(self):
+        # drops what is left of the lost connection and opens a new session
+        if self.keepalive is not None:
+            self.keepalive.stop()
+        try:
+            self.disconnect_socket()
+        except Exception:
+            pass
+        self.connect()
+        self.subscriptions.restore()
 
-        sub = self.create_subscription(period=period, handler=handler)
-        handle = sub.subscribe_data_change(my_obj)
+    def disconnect(self):
+        Client.disconnect(self)
+        self.subscriptions.close()
 
-        self.subs_dictionary[self.generate_key(path)] = (sub, handle)
+    @classmethod
+    def connection_lost(cls, error):
+        if isinstance(error, ua.UaStatusCodeError):
+            return error.code in cls.RECONNECT_CODES
+        return isinstance(error, (OSError, TimeoutError))
 
-    def unsubscribe(self, path):
-        (sub, handle) = self.subs_dictionary[self.generate_key(path)]
+    def find_nodes(self, paths):
+        # resolves the paths not cached yet with one TranslateBrowsePathsToNodeIds request
+        missing = [path for path in paths if tuple(path) not in self.node_cache]
+        if len(missing) > 0:
+            browse_paths = []
+            for path in missing:
+                browse_path = ua.BrowsePath()
+                browse_path.StartingNode = self.root.nodeid
+                browse_path.RelativePath = self.root._make_relative_path(path)
+                browse_paths.append(browse_path)
+            results = self.uaclient.translate_browsepaths_to_nodeids(browse_paths)
+            for path, result in zip(missing, results):
+                result.StatusCode.check()
+                self.node_cache[tuple(path)] = self.get_node(result.Targets[0].TargetId)
+        return [self.node_cache[tuple(path)] for path in paths]
+
+    def read_many(self, paths):
+        # values of several variables with one read request
+        return self.get_values(self.find_nodes(paths))
 
-        sub.unsubscribe(handle)
-        sub.delete()
+    def write_many(self, paths, values):
+        # writes several variables with one write request
+        self.set_values(self.find_nodes(paths), values)
 
-        self.subs_dictionary.pop(self.generate_key(path))
+    def subscribe(self, path, handler, period=100):
+        self.subscriptions.subscribe_many([path], handler, period)
+
+    def subscribe_many(self, paths, handler, period=100):
+        # monitors several variables with one request
+        self.subscriptions.subscribe_many(paths, handler, period)
+
+    def unsubscribe(self, path):
+        self.subscriptions.unsubscribe_many([path])
+
+    def unsubscribe_many(self, paths):
+        self.subscriptions.unsubscribe_many(paths)
 
     @staticmethod
     def generate_key(path):
-        elements = ""
-        for element in path:
-            elements.join(["/", element])
-
-        return elements
+        return "/".join(path)
@@ -0,0 +1,111 @@
+import logging
+import threading
+from concurrent.futures import Future, InvalidStateError
+
+from opcua import ua
+from opcua.server.binary_server_asyncio import BinaryServer, OPCUAProtocol
+from opcua.server.uaprocessor import UaProcessor
+from opcua.ua.ua_binary import struct_from_binary
+
+from opc_ua.backend import local, CALL_TIMEOUT
+
+logger = logging.getLogger("dinasore")
+
+
+class DeferredCallProcessor(UaProcessor):
+    """
+    Answers the call requests whose methods returned a Future once they are done
+
+    The server loop goes on with the other requests (of every client) while
+    the methods run, so a method waiting for a chain of fbs does not stall it.
+    """
+
+    # seconds to wait for a deferred method before answering BadTimeout
+    timeout = CALL_TIMEOUT
+
+    def _process_message(self, typeid, requesthdr, seqhdr, body):
+        if typeid != ua.NodeId(ua.ObjectIds.CallRequest_Encoding_DefaultBinary):
+            return UaProcessor._process_message(self, typeid, requesthdr, seqhdr, body)
+
+        params = struct_from_binary(ua.CallParameters, body)
+        local.deferrable = True
+        try:
+            results = self.session.call(params.MethodsToCall)
+        finally:
+            local.deferrable = False
+
+        pending = [result for result in results if isinstance(result.OutputArguments, Future)]
+        if len(pending) == 0:
+            self.send_call_response(requesthdr, seqhdr, results)
+            return True
+
+        remaining = [len(pending)]
+        lock = threading.Lock()
+
+        def done(_):
+            with lock:
+                remaining[0] -= 1
+                if remaining[0] != 0:
+                    return
+            # the response is sent by the server loop
+            self.iserver.loop.call_soon(lambda: self.send_call_response(requesthdr, seqhdr, results))
+
+        for result in pending:
+            future = result.OutputArguments
+            self.iserver.loop.call_later(self.timeout, lambda future=future: expire(future))
+            future.add_done_callback(done)
+        return True
+
+    def send_call_response(self, requesthdr, seqhdr, results):
+        for result in results:
+            if isinstance(result.OutputArguments, Future):
+                future, result.OutputArguments = result.OutputArguments, []
+                try:
+                    values = future.result()
+                except TimeoutError:
+                    result.StatusCode = ua.StatusCode(ua.StatusCodes.BadTimeout)
+                except Exception as error:
+                    logger.error("Error executing the opc-ua method: {0}".format(error))
+                    result.StatusCode = ua.StatusCode(ua.StatusCodes.BadUnexpectedError)
+                else:
+                    result.OutputArguments = [
+                        value if isinstance(value, ua.Variant) else ua.Variant(value) for value in values
+                    ]
+        response = ua.CallResponse()
+        response.Results = results
+        self.send_response(requesthdr.RequestHandle, seqhdr, response)
+
+
+def expire(future):
+    try:
+        future.set_exception(TimeoutError())
+    except InvalidStateError:
+        # already done
+        pass
+
+
+class DeferredCallProtocol(OPCUAProtocol):
+    def connection_made(self, transport):
+        OPCUAProtocol.connection_made(self, transport)
+        self.processor = DeferredCallProcessor(self.iserver, self.transport)
+        self.processor.set_policies(self.policies)
+
+
+class DeferredCallServer(BinaryServer):
+    """
+    BinaryServer whose connections answer the deferred method calls
+    """
+
+    def start(self):
+        prop = dict(
+            iserver=self.iserver,
+            loop=self.loop,
+            logger=self.logger,
+            policies=self._policies,
+            clients=self.clients,
+        )
+        protocol_factory = type("OPCUAProtocol", (DeferredCallProtocol,), prop)
+
+        coro = self.loop.create_server(protocol_factory, self.hostname, self.port)
+        self._server = self.loop.run_coro_and_wait(coro)
+        self.logger.warning("Listening on {0}:{1}".format(self.hostname, self.port))
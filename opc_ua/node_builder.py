@@ -0,0 +1,178 @@
+import uuid
+
+from opc_ua import base
+from opc_ua.backend import ua, manage_nodes
+
+
+class NodeBuilder:
+    """
+    Collects new nodes and adds them to the address space of a UaPeer in one call
+
+    It has the create_* methods of UaBase, so the helpers that build the
+    model take a builder in place of the peer. The returned nodes are
+    valid once commit() is called.
+    """
+
+    def __init__(self, ua_peer):
+        self.ua_peer = ua_peer
+        self.items = []
+        # browse path (tuple) -> [node, is folder] of the nodes to add
+        self.pending = dict()
+        self.method_callbacks = []
+        self.commit_callbacks = []
+        # parent node id -> is folder, for the nodes already in the server
+        self.folder_types = dict()
+
+    def __len__(self):
+        return len(self.items)
+
+    generate_path = staticmethod(base.UaBase.generate_path)
+
+    def on_commit(self, callback):
+        # called once the nodes are in the address space
+        self.commit_callbacks.append(callback)
+
+    def parent(self, path):
+        key = tuple(path)
+        if key in self.pending:
+            node, is_folder = self.pending[key]
+            return node.nodeid, is_folder
+        node = self.ua_peer.find_node(path)
+        if node.nodeid not in self.folder_types:
+            self.folder_types[node.nodeid] = (
+                self.ua_peer.type_definition(node) == ua.NodeId(ua.ObjectIds.FolderType)
+            )
+        return node.nodeid, self.folder_types[node.nodeid]
+
+    def add_item(self, path, index, name, node_class, reference, attrs, type_definition=None):
+        nodeid, qname = manage_nodes._parse_nodeid_qname(index, name)
+        if isinstance(index, int):
+            # the children of the node need its id before the server assigns one
+            nodeid = ua.NodeId(str(uuid.uuid4()), index)
+        parent_id, parent_folder = self.parent(path)
+
+        item = ua.AddNodesItem()
+        item.RequestedNewNodeId = nodeid
+        item.BrowseName = qname
+        item.ParentNodeId = parent_id
+        if reference is None:
+            reference = ua.ObjectIds.Organizes if parent_folder else ua.ObjectIds.HasComponent
+        item.ReferenceTypeId = ua.NodeId(reference)
+        item.NodeClass = node_class
+        if type_definition is not None:
+            item.TypeDefinition = ua.NodeId(type_definition)
+        attrs.Description = ua.LocalizedText(qname.Name)
+        attrs.DisplayName = ua.LocalizedText(qname.Name)
+        attrs.WriteMask = 0
+        attrs.UserWriteMask = 0
+        item.NodeAttributes = attrs
+        self.items.append(item)
+
+        node = self.ua_peer.get_node(nodeid)
+        key = tuple(path) + (qname.to_string(),)
+        self.pending[key] = [node, type_definition == ua.ObjectIds.FolderType]
+        return key, node
+
+    def add_variable_item(self, path, index, name, variant, writable, reference, type_definition,
+                          datatype=None, value_rank=None, dimensions=None, historizing=False):
+        attrs = ua.VariableAttributes()
+        attrs.DataType = datatype if datatype is not None else manage_nodes._guess_datatype(variant)
+        attrs.Value = variant
+        if value_rank is not None:
+            attrs.ValueRank = value_rank
+            attrs.ArrayDimensions = dimensions
+        elif not isinstance(variant.Value, (list, tuple)):
+            attrs.ValueRank = ua.ValueRank.Scalar
+        elif variant.Dimensions:
+            attrs.ValueRank = len(variant.Dimensions)
+            attrs.ArrayDimensions = variant.Dimensions
+        attrs.Historizing = historizing
+        access = ua.AccessLevel.CurrentRead.mask
+        if writable:
+            access |= ua.AccessLevel.CurrentWrite.mask
+        if historizing:
+            access |= ua.AccessLevel.HistoryRead.mask
+        attrs.AccessLevel = access
+        attrs.UserAccessLevel = access
+        return self.add_item(path, index, name, ua.NodeClass.Variable, reference, attrs, type_definition)[1]
+
+    def create_object(self, index, new_obj_name, path=None):
+        attrs = ua.ObjectAttributes()
+        attrs.EventNotifier = 0
+        return self.add_item(
+            [] if path is None else path, index, new_obj_name, ua.NodeClass.Object,
+            None, attrs, ua.ObjectIds.BaseObjectType,
+        )[1]
+
+    def create_folder(self, path, index, folder_name):
+        attrs = ua.ObjectAttributes()
+        attrs.EventNotifier = 0
+        return self.add_item(
+            path, index, folder_name, ua.NodeClass.Object, None, attrs, ua.ObjectIds.FolderType
+        )[1]
+
+    def create_variable(self, path, index, var_name, val, writable=False):
+        return self.add_variable_item(
+            path, index, var_name, ua.Variant(val), writable,
+            ua.ObjectIds.HasComponent, ua.ObjectIds.BaseDataVariableType,
+        )
+
+    def create_typed_variable(
+        self, path, index, var_name, var_type, value_rank, dimensions=0, writable=False,
+        historizing=False,
+    ):
+        return self.add_variable_item(
+            path, index, var_name, ua.Variant([], var_type), writable,
+            ua.ObjectIds.HasComponent, ua.ObjectIds.BaseDataVariableType,
+            datatype=ua.NodeId(var_type.value), value_rank=value_rank, dimensions=[dimensions],
+            historizing=historizing,
+        )
+
+    def create_property(self, path, index, property_name, value):
+        return self.add_variable_item(
+            path, index, property_name, ua.Variant(value), False,
+            ua.ObjectIds.HasProperty, ua.ObjectIds.PropertyType,
+        )
+
+    def create_method(
+        self, path, index, method_name, func, input_args=None, output_args=None
+    ):
+        attrs = ua.MethodAttributes()
+        attrs.Executable = True
+        attrs.UserExecutable = True
+        key, method = self.add_item(
+            path, index, method_name, ua.NodeClass.Method, ua.ObjectIds.HasComponent, attrs
+        )
+        for arguments_name, arguments in (("InputArguments", input_args), ("OutputArguments", output_args)):
+            if arguments:
+                self.add_variable_item(
+                    list(key),
+                    ua.NodeId("{0}.{1}".format(method.nodeid.Identifier, arguments_name),
+                              method.nodeid.NamespaceIndex),
+                    ua.QualifiedName(arguments_name, 0),
+                    ua.Variant([manage_nodes._vtype_to_argument(a) for a in arguments],
+                               ua.VariantType.ExtensionObject),
+                    False, ua.ObjectIds.HasProperty, ua.ObjectIds.PropertyType,
+                    datatype=ua.NodeId(ua.ObjectIds.Argument),
+                )
+        self.method_callbacks.append((method.nodeid, func))
+        return method
+
+    def commit(self):
+        # adds every collected node with one AddNodes request
+        if len(self.items) > 0:
+            results = self.ua_peer.backend.add_nodes(self.items)
+            for result in results:
+                result.StatusCode.check()
+        for method_id, func in self.method_callbacks:
+            self.ua_peer.backend.add_method_callback(method_id, func)
+        for key, (node, _) in self.pending.items():
+            self.ua_peer.node_cache[key] = node
+        callbacks = self.commit_callbacks
+
+        self.items = []
+        self.pending = dict()
+        self.method_callbacks = []
+        self.commit_callbacks = []
+        for callback in callbacks:
+            callback()
@@ -1,22 +1,27 @@
 from opc_ua import client
 from opc_ua import base
-from opcua import Server
+from opc_ua import backend
+from opc_ua.backend import ua
 import threading
 import logging
 
+from core import startup_profile
 
-class UaPeer(Server, base.UaBase):
-    def __init__(self, address, server_name="systec_ua"):
-        Server.__init__(self)
-        base.UaBase.__init__(self)
+logger = logging.getLogger("dinasore")
+
+
+class UaPeer(base.UaBase):
+    @startup_profile.timed("ua server")
+    def __init__(self, address, server_name="systec_ua", backend_name=None):
+        base.UaBase.__init__(self, ua)
 
         logging.basicConfig(
             level=logging.INFO,
             format="[%(asctime)s][%(levelname)s][%(threadName)-15s] %(message)s",
         )
 
-        self.set_endpoint(address)
-        self.set_server_name(server_name)
+        # server stack (python-opcua or asyncua, see opc_ua.backend)
+        self.backend = backend.create(address, server_name, backend_name)
 
         # setup our own namespace, not really necessary but should as spec
         self.uri = "http://systec.fe.up.pu"
@@ -24,23 +29,86 @@ class UaPeer(Server, base.UaBase):
 
         self.root = self.get_root_node()
 
+        # guards the dictionaries, the requests take the lock of their endpoint
         self.lock = threading.Lock()
         self.client_dictionary = dict()
+        self.client_locks = dict()
 
         self.start()
 
+    def __getattr__(self, name):
+        # the other server methods (get_objects_node, ...) of the stack
+        server_backend = self.__dict__.get("backend")
+        if server_backend is None:
+            raise AttributeError(name)
+        return getattr(server_backend.server, name)
+
+    def start(self):
+        self.backend.start()
+
+    def stop(self):
+        self.backend.stop()
+
+    def get_root_node(self):
+        return self.backend.get_root_node()
+
+    def get_node(self, nodeid):
+        return self.backend.get_node(nodeid)
+
+    def register_namespace(self, uri):
+        return self.backend.register_namespace(uri)
+
+    def delete_nodes(self, nodes, recursive=False):
+        return self.backend.delete_nodes(nodes, recursive=recursive)
+
+    def type_definition(self, node):
+        return self.backend.type_definition(node)
+
+    def set_value_rank(self, node, value_rank, dimensions):
+        self.backend.set_value_rank(node, value_rank, dimensions)
+
+    def set_data_value(self, node, data_value):
+        self.backend.set_data_value(node, data_value)
+
+    def create_method(
+        self, path, index, method_name, func, input_args=None, output_args=None
+    ):
+        return base.UaBase.create_method(
+            self, path, index, method_name, self.backend.method(func), input_args, output_args
+        )
+
+    def write_values(self, nodeids, variants):
+        # writes several values with one write request
+        params = ua.WriteParameters()
+        for nodeid, variant in zip(nodeids, variants):
+            write_value = ua.WriteValue()
+            write_value.NodeId = nodeid
+            write_value.AttributeId = ua.AttributeIds.Value
+            write_value.Value = ua.DataValue(variant)
+            params.NodesToWrite.append(write_value)
+        return self.backend.write(params)
+
     def add_client(self, client_address):
         self.lock.acquire()
-        if client_address not in self.client_dictionary:
-            c = client.UaClient(client_address)
-            self.client_dictionary[client_address] = c
+        if client_address in self.client_dictionary:
+            self.lock.release()
+            return
+        client_lock = self.client_locks.setdefault(client_address, threading.Lock())
         self.lock.release()
+        # connects without blocking the requests to the other endpoints
+        with client_lock:
+            if client_address not in self.client_dictionary:
+                c = client.UaClient(client_address)
+                self.lock.acquire()
+                self.client_dictionary[client_address] = c
+                self.lock.release()
 
     def remove_client(self, client_address):
         self.lock.acquire()
         c = self.client_dictionary[client_address]
         c.disconnect()
         self.client_dictionary.pop(client_address)
+        self.client_locks.pop(client_address, None)
         self.lock.release()
 
     def remove_all_clients(self):
@@ -48,21 +116,38 @@ class UaPeer(Server, base.UaBase):
         for address, c in self.client_dictionary.items():
             c.disconnect()
         self.client_dictionary.clear()
+        self.client_locks.clear()
         self.lock.release()
 
-    def client_read(self, client_address, path):
+    def client_request(self, client_address, request):
         self.lock.acquire()
-        val = self.client_dictionary[client_address].read(path)
+        c = self.client_dictionary[client_address]
+        client_lock = self.client_locks[client_address]
         self.lock.release()
-        return val
+        # one request at a time per endpoint, a slow endpoint does not block the others
+        with client_lock:
+            try:
+                return request(c)
+            except Exception as error:
+                if not c.connection_lost(error):
+                    raise
+                logger.warning("Connection to {0} lost, reconnecting.".format(client_address))
+                c.reconnect()
+                return request(c)
+
+    def client_read(self, client_address, path):
+        return self.client_request(client_address, lambda c: c.read(path))
 
     def client_write(self, client_address, path, val):
-        self.lock.acquire()
-        self.client_dictionary[client_address].write(path, val)
-        self.lock.release()
+        self.client_request(client_address, lambda c: c.write(path, val))
 
     def client_call_method(self, client_address, path, *args):
-        self.lock.acquire()
-        result = self.client_dictionary[client_address].call_method(path.copy(), *args)
-        self.lock.release()
-        return result
+        return self.client_request(client_address, lambda c: c.call_method(path.copy(), *args))
+
+    def client_read_many(self, client_address, paths):
+        # values of several variables of one endpoint with one read request
+        return self.client_request(client_address, lambda c: c.read_many(paths))
+
+    def client_write_many(self, client_address, paths, values):
+        # writes several variables of one endpoint with one write request
+        self.client_request(client_address, lambda c: c.write_many(paths, values))
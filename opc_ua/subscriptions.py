@@ -0,0 +1,202 @@
+import logging
+import queue
+import threading
+
+logger = logging.getLogger("dinasore")
+
+
+class NotificationPool:
+    """
+    Fixed number of threads that run the handlers of the data changes
+
+    The subscription thread only queues the notifications, so a slow
+    handler never delays the next publish response. When the queue is full
+    the oldest notification is dropped (and counted).
+    """
+
+    def __init__(self, workers=4, max_pending=1000):
+        self.notifications = queue.Queue(maxsize=max_pending)
+        self.dropped = 0
+        self.threads = []
+        for index in range(workers):
+            thread = threading.Thread(
+                target=self.run, name="ua_notifications_{0}".format(index), daemon=True
+            )
+            thread.start()
+            self.threads.append(thread)
+
+    def submit(self, handler, node, val, data):
+        while True:
+            try:
+                self.notifications.put_nowait((handler, node, val, data))
+                return
+            except queue.Full:
+                try:
+                    self.notifications.get_nowait()
+                    self.notifications.task_done()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def run(self):
+        while True:
+            notification = self.notifications.get()
+            try:
+                if notification is None:
+                    return
+                handler, node, val, data = notification
+                handler.datachange_notification(node, val, data)
+            except Exception as error:
+                logger.error("Error handling an opc-ua data change.")
+                logger.exception(error)
+            finally:
+                self.notifications.task_done()
+
+    def join(self):
+        # waits for the queued notifications
+        self.notifications.join()
+
+    def stop(self):
+        for _ in self.threads:
+            self.notifications.put(None)
+        for thread in self.threads:
+            thread.join()
+
+
+class SubscriptionGroup:
+    """
+    Server subscription shared by the monitored items of one publishing interval
+    """
+
+    def __init__(self, manager, period):
+        self.manager = manager
+        self.period = period
+        # server handle of the monitored item -> key of the item
+        self.keys = dict()
+        # notifications received while the items are created, before their handles are known
+        self.early = None
+        self.subscription = manager.client.create_subscription(period=period, handler=self)
+
+    def datachange_notification(self, node, val, data):
+        # runs in the receiving thread of the client, never waits for a request
+        with self.manager.items_lock:
+            key = self.keys.get(data.subscription_data.server_handle)
+            if key is None and self.early is not None:
+                self.early.append((node, val, data))
+                return
+            item = self.manager.items.get(key)
+        if item is not None:
+            self.manager.pool.submit(item.handler, node, val, data)
+
+    def add_items(self, items, handles):
+        with self.manager.items_lock:
+            for item, handle in zip(items, handles):
+                if not isinstance(handle, int):
+                    logger.error("Error subscribing {0}: {1}".format(item.key, handle))
+                    continue
+                item.handle = handle
+                self.keys[handle] = item.key
+                self.manager.items[item.key] = item
+            early, self.early = self.early, None
+        for notification in early:
+            self.datachange_notification(*notification)
+
+    def event_notification(self, event):
+        pass
+
+
+class SubscriptionItem:
+
+    def __init__(self, key, path, handler, period):
+        self.key = key
+        self.path = path
+        self.handler = handler
+        self.period = period
+        self.handle = None
+
+
+class SubscriptionManager:
+    """
+    Monitored items of a client, grouped in one subscription per publishing interval
+
+    The items are created and deleted in batches (one request per interval)
+    and the data changes are handled by a NotificationPool.
+    """
+
+    def __init__(self, client, workers=4, max_pending=1000):
+        self.client = client
+        # one subscribe or unsubscribe at a time
+        self.lock = threading.RLock()
+        # guards the items and the handles, held only for lookups
+        self.items_lock = threading.Lock()
+        # publishing interval -> SubscriptionGroup
+        self.groups = dict()
+        # key of the path -> SubscriptionItem
+        self.items = dict()
+        self.pool = NotificationPool(workers, max_pending)
+
+    def subscribe_many(self, paths, handler, period=100):
+        with self.lock:
+            # a path subscribed again moves to the new handler and interval
+            self.unsubscribe_many([path for path in paths if self.client.generate_key(path) in self.items])
+            group = self.groups.get(period)
+            if group is None:
+                group = SubscriptionGroup(self, period)
+                self.groups[period] = group
+            items = [
+                SubscriptionItem(self.client.generate_key(path), list(path), handler, period)
+                for path in paths
+            ]
+            nodes = self.client.find_nodes(paths)
+            group.early = []
+            try:
+                handles = group.subscription.subscribe_data_change(nodes)
+            except Exception:
+                group.add_items([], [])
+                # a group without items (e.g. created for this call) is not kept
+                if len(group.keys) == 0:
+                    self.delete_group(group)
+                raise
+            group.add_items(items, handles)
+            if len(group.keys) == 0:
+                self.delete_group(group)
+
+    def unsubscribe_many(self, paths):
+        with self.lock:
+            # items to delete of each group
+            handles = dict()
+            with self.items_lock:
+                for path in paths:
+                    item = self.items.pop(self.client.generate_key(path))
+                    handles.setdefault(item.period, []).append(item.handle)
+                    del self.groups[item.period].keys[item.handle]
+            for period, group_handles in handles.items():
+                group = self.groups[period]
+                if len(group.keys) == 0:
+                    # deleting the subscription deletes its items
+                    self.delete_group(group)
+                else:
+                    group.subscription.unsubscribe(group_handles)
+
+    def delete_group(self, group):
+        del self.groups[group.period]
+        try:
+            group.subscription.delete()
+        except Exception as error:
+            logger.warning("Error deleting the subscription of {0} ms: {1}".format(group.period, error))
+
+    def restore(self):
+        # subscribes the items again in a new session (the old subscriptions are gone)
+        with self.lock:
+            batches = dict()
+            for item in self.items.values():
+                batch = batches.setdefault((item.period, id(item.handler)), (item.handler, []))
+                batch[1].append(item.path)
+            with self.items_lock:
+                self.items.clear()
+            self.groups.clear()
+            for (period, _), (handler, paths) in batches.items():
+                self.subscribe_many(paths, handler, period)
+
+    def close(self):
+        self.pool.stop()
@@ -0,0 +1,14 @@
+import time
+
+
+class BENCH_DELAY:
+
+    def schedule(self, event_name, event_value, delay):
+        if event_name == 'INIT':
+            return [event_value, None]
+
+        elif event_name == 'REQ':
+            if delay is not None:
+                time.sleep(delay)
+            # stamps the event again, so each lap is measured on its own
+            return [None, time.perf_counter_ns()]
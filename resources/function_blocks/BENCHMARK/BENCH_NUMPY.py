@@ -0,0 +1,17 @@
+import numpy as np
+
+
+class BENCH_NUMPY:
+
+    def __init__(self):
+        self.matrix = np.random.default_rng(0).random((64, 64))
+
+    def schedule(self, event_name, event_value, value):
+        if event_name == 'INIT':
+            return [event_value, None, value]
+
+        elif event_name == 'REQ':
+            # a matrix product and a spectrum, typical of the processing FBs
+            product = self.matrix @ self.matrix
+            spectrum = np.abs(np.fft.rfft(product, axis=0))
+            return [None, event_value, float(spectrum.mean())]
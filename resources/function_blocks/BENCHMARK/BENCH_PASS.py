@@ -0,0 +1,8 @@
+class BENCH_PASS:
+
+    def schedule(self, event_name, event_value, value):
+        if event_name == 'INIT':
+            return [event_value, None, value]
+
+        elif event_name == 'REQ':
+            return [None, event_value, value]
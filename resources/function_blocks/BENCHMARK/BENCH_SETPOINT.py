@@ -0,0 +1,9 @@
+class BENCH_SETPOINT:
+
+    def schedule(self, event_name, event_value, setpoint, gain):
+        if event_name == 'INIT':
+            return [event_value, None, None]
+
+        elif event_name == 'REQ':
+            gain = 1.0 if gain is None else gain
+            return [None, event_value, None if setpoint is None else setpoint * gain]
@@ -0,0 +1,13 @@
+import time
+
+
+class BENCH_SINK:
+
+    def __init__(self):
+        # latency (ns) of every event received, stamped at the source
+        self.latencies = []
+
+    def schedule(self, event_name, event_value):
+        if event_name == 'REQ':
+            self.latencies.append(time.perf_counter_ns() - event_value)
+        return []
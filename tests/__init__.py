@@ -11,6 +11,15 @@ from tests import test_fb
 from tests import test_xml
 from tests import test_opcua
 from tests import test_data_model
+from tests import test_async_server
+from tests import test_monitoring
+from tests import test_anomaly
+from tests import test_startup_profile
+from tests import test_headless
+from tests import test_ua_publisher
+from tests import test_historian
+from tests import test_monitor
+from tests import test_fb_usage
 
 
 loader = unittest.TestLoader()
@@ -22,6 +31,15 @@ suite.addTests(loader.loadTestsFromModule(test_fb))
 suite.addTests(loader.loadTestsFromModule(test_xml))
 suite.addTests(loader.loadTestsFromModule(test_opcua))
 suite.addTests(loader.loadTestsFromModule(test_data_model))
+suite.addTests(loader.loadTestsFromModule(test_async_server))
+suite.addTests(loader.loadTestsFromModule(test_monitoring))
+suite.addTests(loader.loadTestsFromModule(test_anomaly))
+suite.addTests(loader.loadTestsFromModule(test_startup_profile))
+suite.addTests(loader.loadTestsFromModule(test_headless))
+suite.addTests(loader.loadTestsFromModule(test_ua_publisher))
+suite.addTests(loader.loadTestsFromModule(test_historian))
+suite.addTests(loader.loadTestsFromModule(test_monitor))
+suite.addTests(loader.loadTestsFromModule(test_fb_usage))
 
 logging.disable(logging.CRITICAL)
 
@@ -1,5 +1,16 @@
 import struct
 import socket
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import sys
+import threading
+import time
+from xml.etree import ElementTree as ETree
 
 
 class DiacSimulator:
@@ -25,6 +36,14 @@ class DiacSimulator:
         except socket.error as msg:
             print(msg)
 
+    def send_request(self, message_payload, configuration_name=''):
+        # sends one request and waits for the whole response
+        message = self.__build_message(message_payload.encode('utf-8'), configuration_name.encode('utf-8'))
+        self.sock.sendall(message)
+        header = self.__receive(3)
+        response_len = struct.unpack('>H', header[1:3])[0]
+        return self.__receive(response_len)
+
     def upload_dinasore(self, file_path):
         # creates the first message
         first_message = self.__build_message(b'<Request ID="0" Action="QUERY"><FB Name="*" Type="*"/></Request>', b'')
@@ -53,6 +72,15 @@ class DiacSimulator:
     def disconnect(self):
         self.sock.close()
 
+    def __receive(self, size):
+        data = b''
+        while len(data) < size:
+            chunk = self.sock.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError('connection closed by dinasore')
+            data += chunk
+        return data
+
     @staticmethod
     def __build_message(message_payload, configuration_name):
         # build the first part of the header
@@ -74,5 +102,234 @@ class DiacSimulator:
         return response
 
 
-# diac = DiacSimulator('localhost', 61499)
-# diac.upload_dinasore('opc_ua_FORTE_PC.fboot')
+class SyntheticApplication:
+    """
+    Synthetic 4diac application made of a chain of BENCH_PASS function blocks
+    """
+
+    def __init__(self, n_fbs, n_connections=None, n_watches=0, resource_name='BENCH_RES', fb_type='BENCH_PASS'):
+        self.resource_name = resource_name
+        self.fb_type = fb_type
+        self.fb_names = ['FB_{0}'.format(i) for i in range(n_fbs)]
+
+        # event connections first, then the data connections of the chain
+        max_connections = 2 * (n_fbs - 1)
+        if n_connections is None or n_connections > max_connections:
+            n_connections = max_connections
+        self.connections = []
+        for i in range(n_fbs - 1):
+            self.connections.append(('{0}.CNF'.format(self.fb_names[i]), '{0}.REQ'.format(self.fb_names[i + 1])))
+        for i in range(n_fbs - 1):
+            self.connections.append(('{0}.VALUE_O'.format(self.fb_names[i]), '{0}.VALUE'.format(self.fb_names[i + 1])))
+        self.connections = self.connections[:n_connections]
+
+        self.watches = ['{0}.VALUE_O'.format(fb_name) for fb_name in self.fb_names[:n_watches]]
+        # the event at the end of the chain tells when the first event arrived
+        self.sink_fb = self.fb_names[self.last_connected_fb()]
+        self.sink_watch = '{0}.CNF'.format(self.sink_fb)
+        self.request_id = 0
+
+    def last_connected_fb(self):
+        last = 0
+        for source, destination in self.connections:
+            if destination.endswith('.REQ'):
+                last = self.fb_names.index(destination.split('.')[0])
+        return last
+
+    def next_id(self):
+        self.request_id += 1
+        return self.request_id
+
+    def resource_requests(self):
+        return [('', '<Request ID="{0}" Action="QUERY"><FB Name="*" Type="*"/></Request>'.format(self.next_id())),
+                ('', '<Request ID="{0}" Action="CREATE"><FB Name="{1}" Type="EMB_RES" /></Request>'.format(
+                    self.next_id(), self.resource_name))]
+
+    def fb_requests(self):
+        return [(self.resource_name, '<Request ID="{0}" Action="CREATE"><FB Name="{1}" Type="{2}" /></Request>'.format(
+            self.next_id(), fb_name, self.fb_type)) for fb_name in self.fb_names]
+
+    def connection_requests(self):
+        requests = [(self.resource_name,
+                     '<Request ID="{0}" Action="WRITE"><Connection Source="1.0" Destination="{1}.VALUE" /></Request>'.format(
+                         self.next_id(), self.fb_names[0]))]
+        for source, destination in self.connections:
+            requests.append((self.resource_name,
+                             '<Request ID="{0}" Action="CREATE"><Connection Source="{1}" Destination="{2}" /></Request>'.format(
+                                 self.next_id(), source, destination)))
+        return requests
+
+    def start_request(self):
+        return self.resource_name, '<Request ID="{0}" Action="START"/>'.format(self.next_id())
+
+    def watch_requests(self):
+        return [(self.resource_name, '<Request ID="{0}" Action="CREATE"><Watch Source="{1}" Destination="" /></Request>'.format(
+            self.next_id(), watch)) for watch in self.watches + [self.sink_watch]]
+
+    def event_request(self):
+        return self.resource_name, '<Request ID="{0}" Action="WRITE"><Connection Source="$e" Destination="{1}.REQ" /></Request>'.format(
+            self.next_id(), self.fb_names[0])
+
+    def read_request(self):
+        return '', '<Request ID="{0}" Action="READ"><Watches/></Request>'.format(self.next_id())
+
+    def reached_sink(self, response):
+        element = ETree.fromstring(response)
+        for fb in element.iter('FB'):
+            if fb.get('name') == self.sink_fb:
+                for port in fb.iter('Port'):
+                    if port.get('name') == 'CNF':
+                        return True
+        return False
+
+
+class DeployBenchmark:
+    """
+    Deploys synthetic applications through the TcpServer/Manager path over loopback
+    """
+
+    def __init__(self, address='localhost', port_diac=61599, port_opc=4850, use_async=False, read_samples=50,
+                 timeout=60):
+        self.address = address
+        self.port_diac = port_diac
+        self.port_opc = port_opc
+        self.use_async = use_async
+        self.read_samples = read_samples
+        # seconds waiting for the event at the end of the chain
+        self.timeout = timeout
+        self.fboot_path = os.path.join(os.path.dirname(sys.path[0]), 'resources', 'data_model.fboot')
+
+    def run(self, sizes, connections=None, watches=None):
+        # keeps the deployed data model of the node
+        backup_path = self.fboot_path + '.bench_backup'
+        has_fboot = os.path.exists(self.fboot_path)
+        if has_fboot:
+            shutil.copyfile(self.fboot_path, backup_path)
+
+        results = []
+        try:
+            for n_fbs in sizes:
+                n_watches = n_fbs if watches is None else min(watches, n_fbs)
+                results.append(self.run_size(n_fbs, connections, n_watches))
+                print('{0} FBs: {1}'.format(n_fbs, results[-1]))
+        finally:
+            if has_fboot:
+                shutil.move(backup_path, self.fboot_path)
+            elif os.path.exists(self.fboot_path):
+                os.remove(self.fboot_path)
+        return results
+
+    def run_size(self, n_fbs, n_connections, n_watches):
+        from communication import tcp_server
+        from communication import async_server
+        from core import manager
+
+        # starts from an empty data model
+        if os.path.exists(self.fboot_path):
+            os.remove(self.fboot_path)
+
+        m = manager.Manager()
+        m.build_ua_manager_fboot(self.address, self.port_opc)
+        if self.use_async:
+            server = async_server.AsyncTcpServer(self.address, self.port_diac, 10, m)
+            server_thread = threading.Thread(target=server.serve_forever, daemon=True)
+            server_thread.start()
+            server.started.wait(10)
+        else:
+            server = tcp_server.TcpServer(self.address, self.port_diac, 10, m)
+            server_thread = threading.Thread(target=server.handle_client, daemon=True)
+            server_thread.start()
+
+        app = SyntheticApplication(n_fbs, n_connections, n_watches)
+        diac = DiacSimulator(self.address, self.port_diac)
+        result = {'fbs': n_fbs, 'connections': len(app.connections), 'watches': len(app.watches)}
+        try:
+            result['create_s'] = self.timed(diac, app.resource_requests() + app.fb_requests())
+            result['connections_s'] = self.timed(diac, app.connection_requests())
+            result['start_s'] = self.timed(diac, [app.start_request()])
+            result['watches_s'] = self.timed(diac, app.watch_requests())
+
+            # time until the event reaches the end of the chain
+            tic = time.perf_counter()
+            self.send(diac, app.event_request())
+            try:
+                self.wait_sink(diac, app)
+                result['first_event_s'] = time.perf_counter() - tic
+            except TimeoutError as error:
+                # the other timings of the size are still reported
+                result['first_event_s'] = None
+                result['error'] = str(error)
+
+            latencies = []
+            for _ in range(self.read_samples):
+                tic = time.perf_counter()
+                self.send(diac, app.read_request())
+                latencies.append((time.perf_counter() - tic) * 1000)
+            latencies.sort()
+            result['read_watch_ms'] = {
+                'mean': statistics.mean(latencies),
+                'p50': latencies[len(latencies) // 2],
+                'p99': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+            }
+        finally:
+            diac.disconnect()
+            m.manager_ua_fboot.stop_ua()
+            server.stop_server()
+            server_thread.join(5)
+        return result
+
+    def wait_sink(self, diac, app):
+        deadline = time.perf_counter() + self.timeout
+        while not app.reached_sink(self.send(diac, app.read_request())):
+            if time.perf_counter() > deadline:
+                raise TimeoutError('the event did not reach the end of the chain in {0} s'.format(self.timeout))
+
+    @staticmethod
+    def send(diac, request):
+        config_name, payload = request
+        return diac.send_request(payload, config_name)
+
+    def timed(self, diac, requests):
+        tic = time.perf_counter()
+        for request in requests:
+            self.send(diac, request)
+        return time.perf_counter() - tic
+
+
+def save_results(results, output_path, options):
+    report = {
+        'benchmark': 'deploy',
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'options': options,
+        'results': results,
+    }
+    with open(output_path, 'w') as f:
+        json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    # same import paths as core/main.py
+    root_path = os.path.dirname(sys.path[0])
+    sys.path.append(root_path)
+    sys.path.append(os.path.join(root_path, 'core'))
+    sys.path.append(os.path.join(root_path, 'resources'))
+    os.chdir(root_path)
+    # keeps the output readable, the opc-ua peer configures INFO otherwise
+    logging.basicConfig(level=logging.WARNING)
+
+    parser = argparse.ArgumentParser(description='deployment throughput benchmark (run from the repository root)')
+    parser.add_argument('--sizes', nargs='+', type=int, default=[10, 50, 100], help='number of FBs of each application')
+    parser.add_argument('--connections', type=int, default=None, help='connections per application (default: full chain)')
+    parser.add_argument('--watches', type=int, default=None, help='watches per application (default: one per FB)')
+    parser.add_argument('--reads', type=int, default=50, help='READ requests used to measure the watch latency')
+    parser.add_argument('--timeout', type=float, default=60, help='seconds waiting for the first event of each size')
+    parser.add_argument('--async', dest='use_async', action='store_true', help='uses the asyncio 4diac server')
+    parser.add_argument('--output', default='deploy_benchmark.json', help='json file with the results')
+    args = parser.parse_args()
+
+    benchmark = DeployBenchmark(use_async=args.use_async, read_samples=args.reads, timeout=args.timeout)
+    bench_results = benchmark.run(args.sizes, args.connections, args.watches)
+    save_results(bench_results, args.output, vars(args))
+    print('results saved at {0}'.format(args.output))
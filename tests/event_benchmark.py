@@ -0,0 +1,216 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import time
+
+
+class EventBenchmark:
+    """
+    Builds in-process configurations of BENCH_* function blocks and measures
+    the event throughput and the latency from the source to the sink FB
+    """
+
+    # every way the runtime can execute the fbs
+    MODES = {
+        'threaded': None,
+        'monitored': [10, 20],
+    }
+
+    FB_TYPES = {
+        'trivial': 'BENCH_PASS',
+        'numpy': 'BENCH_NUMPY',
+    }
+
+    def __init__(self, mode='threaded', fb_kind='trivial', events=2000, latency_samples=2000, timeout=60):
+        self.mode = mode
+        self.fb_type = self.FB_TYPES[fb_kind]
+        self.events = events
+        self.latency_samples = latency_samples
+        self.timeout = timeout
+        self.conf = None
+
+    def build(self, shape, size):
+        from core import configuration
+
+        monitor = self.MODES[self.mode]
+        self.conf = configuration.Configuration('BENCH_RES', 'EMB_RES', monitor=monitor)
+        self.create('SINK', 'BENCH_SINK')
+
+        # number of events the sink receives for each event of the source
+        if shape == 'chain':
+            names = [self.create('FB_{0}'.format(i)) for i in range(size)]
+            for source, destination in zip(names, names[1:]):
+                self.connect(source, destination)
+            self.connect(names[-1], 'SINK')
+            fan = 1
+
+        elif shape == 'fanout':
+            # binary tree with size levels, the leaves feed the sink
+            level = [self.create('FB_0')]
+            for depth in range(1, size):
+                next_level = []
+                for parent in level:
+                    for branch in range(2):
+                        child = self.create('FB_{0}_{1}'.format(depth, len(next_level)))
+                        self.connect(parent, child)
+                        next_level.append(child)
+                level = next_level
+            for leaf in level:
+                self.connect(leaf, 'SINK')
+            names = ['FB_0']
+            fan = len(level)
+
+        elif shape == 'diamond':
+            # one source splits into size branches that join at the sink
+            names = [self.create('FB_0')]
+            for i in range(size):
+                branch = self.create('FB_B{0}'.format(i))
+                self.connect(names[0], branch)
+                self.connect(branch, 'SINK')
+            fan = size
+
+        elif shape == 'cycle':
+            # ring closed through a delay, the sink listens to the last fb
+            names = [self.create('FB_{0}'.format(i)) for i in range(size)]
+            for source, destination in zip(names, names[1:]):
+                self.connect(source, destination)
+            self.create('DELAY', 'BENCH_DELAY')
+            self.conf.write_connection('0.001', 'DELAY.DELAY')
+            self.connect(names[-1], 'DELAY')
+            self.connect('DELAY', names[0])
+            self.connect(names[-1], 'SINK')
+            fan = None
+
+        else:
+            raise ValueError('unknown shape {0}'.format(shape))
+
+        self.conf.start_work()
+        return names[0], fan
+
+    def create(self, fb_name, fb_type=None):
+        from core.fb_resources import FBResources
+
+        fb_type = self.fb_type if fb_type is None else fb_type
+        fb_resource = FBResources(fb_type, self.conf.fb_dict[fb_type])
+        self.conf.create_fb(fb_name, fb_resource, monitor=self.MODES[self.mode] is not None)
+        return fb_name
+
+    def connect(self, source, destination):
+        self.conf.create_connection('{0}.CNF'.format(source), '{0}.REQ'.format(destination))
+
+    def run(self, shape, size):
+        head, fan = self.build(shape, size)
+        head_fb = self.conf.get_fb(head)
+        sink = self.conf.get_fb('SINK').fb_obj
+
+        try:
+            if fan is None:
+                result = self.measure_cycle(head_fb, sink)
+            else:
+                result = self.measure_pipeline(head_fb, sink, fan)
+        finally:
+            self.conf.stop_work()
+
+        result.update({'shape': shape, 'size': size, 'mode': self.mode, 'fb_type': self.fb_type,
+                       'fbs': len(self.conf.fb_dictionary) - 1})
+        return result
+
+    def measure_pipeline(self, head_fb, sink, fan):
+        # throughput: the source pushes every event at once
+        tic = time.perf_counter()
+        for _ in range(self.events):
+            head_fb.push_event('REQ', time.perf_counter_ns())
+        self.wait_arrivals(sink, self.events * fan)
+        elapsed = time.perf_counter() - tic
+        received = len(sink.latencies)
+
+        # latency: one event in flight at a time
+        sink.latencies.clear()
+        for i in range(self.latency_samples):
+            head_fb.push_event('REQ', time.perf_counter_ns())
+            self.wait_arrivals(sink, (i + 1) * fan)
+
+        return {
+            'source_events_per_s': self.events / elapsed,
+            'sink_events_per_s': received / elapsed,
+            'latency_us': self.percentiles(sink.latencies),
+        }
+
+    def measure_cycle(self, head_fb, sink):
+        # a single event runs around the ring, restamped at each lap
+        tic = time.perf_counter()
+        head_fb.push_event('REQ', time.perf_counter_ns())
+        self.wait_arrivals(sink, self.latency_samples)
+        elapsed = time.perf_counter() - tic
+
+        return {
+            'laps_per_s': len(sink.latencies) / elapsed,
+            'latency_us': self.percentiles(sink.latencies),
+        }
+
+    def wait_arrivals(self, sink, expected):
+        deadline = time.perf_counter() + self.timeout
+        while len(sink.latencies) < expected:
+            if time.perf_counter() > deadline:
+                raise TimeoutError('sink received {0} of {1} events'.format(len(sink.latencies), expected))
+            time.sleep(0.0001)
+
+    @staticmethod
+    def percentiles(latencies_ns):
+        values = sorted(latencies_ns)
+        if len(values) == 0:
+            return {}
+
+        def pick(fraction):
+            return values[min(len(values) - 1, int(len(values) * fraction))] / 1000
+
+        return {'p50': pick(0.5), 'p99': pick(0.99), 'p999': pick(0.999), 'max': values[-1] / 1000}
+
+
+if __name__ == '__main__':
+    # same import paths as core/main.py
+    root_path = os.path.dirname(sys.path[0])
+    sys.path.append(root_path)
+    sys.path.append(os.path.join(root_path, 'core'))
+    sys.path.append(os.path.join(root_path, 'resources'))
+    os.chdir(root_path)
+    logging.basicConfig(level=logging.WARNING)
+    # the monitored mode writes its samples there
+    os.makedirs(os.path.join(root_path, 'resources', 'monitoring'), exist_ok=True)
+
+    parser = argparse.ArgumentParser(description='event throughput and latency benchmark (run from the repository root)')
+    parser.add_argument('--shapes', nargs='+', default=['chain', 'fanout', 'diamond', 'cycle'],
+                        help='chain, fanout, diamond and/or cycle')
+    parser.add_argument('--sizes', nargs='+', type=int, default=[4],
+                        help='chain/cycle length, tree depth or diamond width')
+    parser.add_argument('--modes', nargs='+', default=['threaded'], choices=list(EventBenchmark.MODES))
+    parser.add_argument('--fb', nargs='+', default=['trivial'], choices=list(EventBenchmark.FB_TYPES))
+    parser.add_argument('--events', type=int, default=2000, help='events pushed for the throughput')
+    parser.add_argument('--samples', type=int, default=2000, help='events measured for the latency')
+    parser.add_argument('--output', default='event_benchmark.json', help='json file with the results')
+    args = parser.parse_args()
+
+    results = []
+    for mode in args.modes:
+        for fb_kind in args.fb:
+            for shape in args.shapes:
+                for size in args.sizes:
+                    benchmark = EventBenchmark(mode, fb_kind, args.events, args.samples)
+                    results.append(benchmark.run(shape, size))
+                    print(results[-1])
+
+    report = {
+        'benchmark': 'events',
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'options': vars(args),
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print('results saved at {0}'.format(args.output))
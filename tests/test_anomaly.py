@@ -0,0 +1,290 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from core import anomaly
+from core import anomaly_models
+from core import monitoring_log
+
+
+class FakeFB:
+    MONITOR_FEATURES = ('count', 'mean', 'std')
+    MONITOR_WINDOWS = (0.25, 0.5, 1.0)
+
+    def __init__(self, fb_name, monitoring_path, seed):
+        self.fb_name = fb_name
+        self.fb_type = 'FAKE_FB'
+        self.monitor_fb = [3, 4]
+        self.monitoring_path = monitoring_path
+        self.first_event = True
+        self.stop_thread = False
+        self.rng = np.random.default_rng(seed)
+
+    def get_monitoring(self):
+        return (self.rng.normal(size=18) + 10).tolist()
+
+    def get_event_counts(self):
+        return 10, 10
+
+
+class TestBatchScoring(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        # every fb has its own training data and its own models
+        self.models = [anomaly.fit_models(rng.normal(size=(40, 18)) * (i + 1), 0.05) for i in range(4)]
+        self.samples = rng.normal(size=(4, 18)) * 3
+
+    def test_projection(self):
+        points = anomaly_models.project(self.models, self.samples)
+        for model, sample, point in zip(self.models, self.samples, points):
+            expected = model.pca.transform(model.scaler.transform(sample.reshape(1, -1)))[0]
+            np.testing.assert_allclose(expected, point)
+
+    def test_predictions(self):
+        points = anomaly_models.project(self.models, self.samples)
+        covariance = anomaly_models.predict_covariance(self.models, points)
+        svm = anomaly.predict_svm(self.models, points)
+        dbscan = anomaly.predict_dbscan(self.models, points)
+
+        for i, model in enumerate(self.models):
+            point = points[i].reshape(1, -1)
+            self.assertEqual(model.covariance.predict(point)[0], covariance[i])
+            self.assertEqual(model.svm.predict(point)[0], svm[i])
+            # DBSCAN of the training data plus the new sample
+            label = model.dbscan.fit_predict(np.vstack((model.points, point)))[-1]
+            self.assertEqual(-1 if label == -1 else 1, dbscan[i])
+
+
+class TestOnlineModels(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.models = []
+        for i in range(3):
+            model = anomaly_models.OnlineModels(0.05)
+            data = rng.normal(size=(40, 18)) * (i + 1)
+            for sample in data:
+                model.partial_fit_projection(sample)
+            model.fit_detectors(data, anomaly.avg_dist(model.transform(data)))
+            self.models.append(model)
+        self.samples = rng.normal(size=(3, 18)) * 3
+
+    def test_incremental_scaler(self):
+        data = np.random.default_rng(2).normal(size=(10, 18))
+        model = anomaly_models.OnlineModels(0.05)
+        projected = [model.partial_fit_projection(sample) for sample in data]
+        # the pca is updated every two samples
+        self.assertEqual([0, 2] * 5, [len(p) for p in projected])
+        np.testing.assert_allclose(data.mean(axis=0), model.scaler.mean_)
+
+    def test_online_covariance(self):
+        points = np.random.default_rng(3).normal(size=(50, 2))
+        covariance = anomaly_models.OnlineCovariance(0.05)
+        covariance.partial_fit(points[:20]).partial_fit(points[20:])
+        np.testing.assert_allclose(points.mean(axis=0), covariance.location_)
+        np.testing.assert_allclose(np.linalg.inv(np.cov(points.T)), covariance.precision_)
+
+    def test_predictions(self):
+        points = anomaly_models.project(self.models, self.samples)
+        predictions = anomaly_models.OnlineModels.predict_batch(self.models, points)
+
+        for i, model in enumerate(self.models):
+            point = points[i].reshape(1, -1)
+            np.testing.assert_allclose(model.transform(self.samples[i].reshape(1, -1)), point)
+            self.assertEqual(model.svm.predict(model.rbf.transform(point))[0], predictions['One Class SVM'][i])
+            # nearest core point by brute force
+            core = np.asarray(model.tree.get_arrays()[0])
+            distance = np.sqrt(((core - point) ** 2).sum(axis=1)).min()
+            self.assertEqual(1 if distance <= model.dbscan.eps else -1, predictions['DBSCAN'][i])
+
+
+class TestAnomalyService(unittest.TestCase):
+    online = False
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.models_path = os.path.join(self.folder.name, 'models')
+        self.service = anomaly.AnomalyService(tick=1, max_trainings=1, online=self.online,
+                                              models_path=self.models_path)
+        self.fbs = [FakeFB('FB_{0}'.format(i), os.path.join(self.folder.name, ''), i) for i in range(3)]
+        for fb in self.fbs:
+            self.service.register(fb).ready_ns = 0
+
+    def tearDown(self):
+        self.service.stop()
+        self.folder.cleanup()
+
+    def test_train_and_classify(self):
+        published = []
+        self.service.add_publisher(published.append)
+        now = 10**12
+        # first tick waits for a whole time_per_sample
+        self.service.sample(now)
+        detectors = list(self.service.detectors.values())
+        self.assertTrue(all(len(d.anomaly_data) == 0 for d in detectors))
+
+        # (3 * 4) - 3 + 1 training samples
+        for i in range(10):
+            self.service.sample(now + (4 + i) * 10**9)
+        self.service.pool.shutdown(wait=True)
+        self.assertTrue(all(d.state == anomaly.CLASSIFYING for d in detectors))
+
+        self.service.sample(now + 20 * 10**9)
+        # the first tick publishes the initial state, then every tick with samples
+        self.assertEqual(12, len(published))
+        self.assertEqual([anomaly.CLASSIFYING] * 3, [d.state for d in published[-1]])
+        self.assertTrue(all(p != 0 for p in published[-1][0].predictions.values()))
+        for fb in self.fbs:
+            reader = monitoring_log.LogReader(monitoring_log.log_path(self.folder.name, fb.fb_name))
+            records = reader.read()
+            self.assertEqual(11, (records['kind'] == monitoring_log.EVENTS).sum())
+            # the last tick scored the sample with every algorithm
+            samples = records[records['kind'] == monitoring_log.SAMPLE]
+            self.assertEqual([0, 1, 2], samples['algorithm'].tolist())
+            self.assertTrue(set(samples['label'].tolist()) <= {1, -1})
+            self.assertEqual(0, len(reader.read()))
+
+    def train(self):
+        now = 10**12
+        for i in range(12):
+            self.service.sample(now + (4 * (i > 0) + i) * 10**9)
+        self.service.pool.shutdown(wait=True)
+
+    def test_persisted_models(self):
+        self.train()
+        self.assertEqual(3, len(os.listdir(self.models_path)))
+
+        # a restarted node loads the models of the same fbs
+        service = anomaly.AnomalyService(tick=1, online=self.online, models_path=self.models_path)
+        restarted = service.register(FakeFB('FB_0', os.path.join(self.folder.name, ''), 0))
+        self.assertEqual(anomaly.CLASSIFYING, restarted.state)
+        restarted.ready_ns = 0
+        service.sample(10**12)
+        service.sample(10**12 + 4 * 10**9)
+        self.assertTrue(all(p != 0 for p in restarted.predictions.values()))
+
+        # other monitoring parameters need new models
+        changed = FakeFB('FB_1', os.path.join(self.folder.name, ''), 1)
+        changed.monitor_fb = [5, 4]
+        self.assertEqual(anomaly.COLLECTING, service.register(changed).state)
+        # and so do other windows
+        windows = FakeFB('FB_2', os.path.join(self.folder.name, ''), 2)
+        windows.MONITOR_WINDOWS = (0.5, 1.0)
+        self.assertEqual(anomaly.COLLECTING, service.register(windows).state)
+        service.stop()
+
+    def test_retrain(self):
+        service = anomaly.AnomalyService(tick=1, online=self.online, processes=False, retrain_samples=2)
+        detector = service.register(FakeFB('FB_R', os.path.join(self.folder.name, ''), 5))
+        detector.ready_ns = 0
+        for i in range(11):
+            service.sample(10**12 + (4 * (i > 0) + i) * 10**9)
+        while detector.training:
+            time.sleep(0.01)
+        models = detector.models
+        self.assertIsNotNone(models)
+
+        service.sample(10**12 + 20 * 10**9)
+        service.sample(10**12 + 21 * 10**9)
+        service.pool.shutdown(wait=True)
+        if self.online:
+            # the online models keep learning instead
+            self.assertIs(models, detector.models)
+        else:
+            self.assertIsNot(models, detector.models)
+            self.assertEqual(anomaly.CLASSIFYING, detector.state)
+            self.assertEqual(detector.training_samples + 1, len(detector.anomaly_data))
+        service.stop()
+
+    def test_unregister(self):
+        self.fbs[0].stop_thread = True
+        self.service.unregister(self.fbs[1])
+        self.service.sample(10**12)
+        self.assertEqual(['FB_0', 'FB_2'], sorted(self.service.detectors))
+        self.assertIsNone(self.service.detectors['FB_0'].start_ns)
+        self.assertIsNotNone(self.service.detectors['FB_2'].start_ns)
+
+
+class TestOnlineAnomalyService(TestAnomalyService):
+    online = True
+
+    def test_save_on_unregister(self):
+        self.train()
+        detector = self.service.detectors['FB_1']
+        locked = []
+        dump = anomaly.joblib.dump
+
+        def checked_dump(*args):
+            locked.append((self.service.lock.locked(), detector.lock.locked()))
+            return dump(*args)
+
+        # the learned models are saved without holding the service or the models
+        with mock.patch.object(anomaly.joblib, 'dump', checked_dump):
+            self.service.unregister(self.fbs[1])
+        self.assertEqual([(False, False)], locked)
+        self.assertEqual(['FB_0', 'FB_2'], sorted(self.service.detectors))
+        self.assertTrue(os.path.exists(detector.models_file()))
+
+
+class TestAnomalyVariables(unittest.TestCase):
+
+    def setUp(self):
+        from core import configuration
+        from data_model_fboot import ua_manager
+
+        self.folder = tempfile.TemporaryDirectory()
+        self.ua_peer = ua_manager.UaManagerFboot('localhost', 4862)
+        self.config = configuration.Configuration('EMB_RES', 'EMB_RES')
+        self.ua_peer(self.config)
+
+    def tearDown(self):
+        self.ua_peer.stop_ua()
+        self.folder.cleanup()
+
+    def test_publish(self):
+        from core.fb_resources import FBResources
+
+        self.ua_peer.parse_fbt(FBResources('BENCH_PASS', self.config.fb_dict['BENCH_PASS']), 'ANOMALY_FB')
+        item = self.ua_peer.ua_objects['ANOMALY_FB']
+        # the fb is not monitored
+        self.assertEqual(0, len(item.anomaly_vars))
+
+        detector = anomaly.AnomalyDetector(FakeFB('ANOMALY_FB', os.path.join(self.folder.name, ''), 0))
+        item.populate_anomaly_folder(detector)
+        self.assertEqual('collecting', item.anomaly_vars['TRAINING_STATE'].get_value())
+        self.assertEqual(0, item.anomaly_vars['DBSCAN'].get_value())
+
+        detector.features = [1.0, 2.5]
+        detector.state = anomaly.CLASSIFYING
+        for _ in range(2):
+            detector.set_predictions({'Empirical Covariance': -1, 'DBSCAN': -1, 'One Class SVM': 1})
+        self.ua_peer.publish_anomaly([detector])
+
+        self.assertEqual(-1, item.anomaly_vars['EMPIRICAL_COVARIANCE'].get_value())
+        self.assertEqual(1, item.anomaly_vars['ONE_CLASS_SVM'].get_value())
+        self.assertEqual(2, item.anomaly_vars['ALERTS'].get_value())
+        self.assertEqual([1.0, 2.5], item.anomaly_vars['FEATURES'].get_value())
+        self.assertEqual('classifying', item.anomaly_vars['TRAINING_STATE'].get_value())
+        detector.log.close()
+
+    def test_remove_publisher(self):
+        from core import configuration
+        from data_model_fboot import ua_manager
+
+        service = anomaly.AnomalyService(tick=1, processes=False)
+        self.addCleanup(service.stop)
+        self.ua_peer.add_anomaly_service(service)
+        self.ua_peer.add_anomaly_service(service)
+        self.assertEqual([self.ua_peer.publish_anomaly], service.publishers)
+
+        # a stopped server no longer receives the results of the shared service
+        ua_peer = ua_manager.UaManagerFboot('localhost', 4873)
+        ua_peer(configuration.Configuration('EMB_RES', 'EMB_RES'))
+        ua_peer.add_anomaly_service(service)
+        ua_peer.stop_ua()
+        self.assertEqual([self.ua_peer.publish_anomaly], service.publishers)
@@ -0,0 +1,103 @@
+import socket
+import struct
+import threading
+import time
+import unittest
+
+from communication import async_server
+
+
+class FakeManager:
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.requests = []
+
+    def parse_general(self, xml_data):
+        time.sleep(self.delay)
+        self.requests.append(('', xml_data))
+        return self.build_response(xml_data)
+
+    def parse_configuration(self, xml_data, config_id):
+        time.sleep(self.delay)
+        self.requests.append((config_id, xml_data))
+        return self.build_response(xml_data)
+
+    @staticmethod
+    def build_response(xml_data):
+        payload = xml_data.encode('utf-8')
+        return b''.join([b'\x50', struct.pack('>H', len(payload)), payload])
+
+
+def build_message(payload, config_id=b''):
+    return b''.join([b'\x50', struct.pack('>H', len(config_id)), config_id,
+                     b'\x50', struct.pack('>H', len(payload)), payload])
+
+
+def read_response(sock):
+    header = sock.recv(3, socket.MSG_WAITALL)
+    size = struct.unpack('>H', header[1:3])[0]
+    return sock.recv(size, socket.MSG_WAITALL)
+
+
+class TestAsyncServer(unittest.TestCase):
+    port = 61510
+
+    def setUp(self):
+        self.manager = FakeManager(delay=0.01)
+        self.server = async_server.AsyncTcpServer('localhost', self.port, 2, self.manager,
+                                                  idle_timeout=0.5, max_workers=2)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+        self.server.started.wait(5)
+
+    def tearDown(self):
+        self.server.stop_server()
+        self.thread.join(5)
+
+    def connect(self):
+        sock = socket.create_connection(('localhost', self.port))
+        sock.settimeout(5)
+        return sock
+
+    def test_pipelined_requests(self):
+        sock = self.connect()
+        # sends every request before reading any response
+        messages = [build_message('<Request ID="{0}"/>'.format(i).encode('utf-8'), b'RES')
+                    for i in range(5)]
+        sock.sendall(b''.join(messages))
+
+        responses = [read_response(sock) for _ in range(5)]
+        sock.close()
+
+        self.assertEqual(responses, [('<Request ID="{0}"/>'.format(i)).encode('utf-8') for i in range(5)])
+        self.assertEqual(self.manager.requests[0][0], 'RES')
+
+    def test_general_request(self):
+        sock = self.connect()
+        sock.sendall(build_message(b'<Request ID="0" Action="QUERY"/>'))
+        self.assertEqual(read_response(sock), b'<Request ID="0" Action="QUERY"/>')
+        sock.close()
+
+        self.assertEqual(self.manager.requests, [('', '<Request ID="0" Action="QUERY"/>')])
+
+    def test_connection_limit(self):
+        sock_1 = self.connect()
+        sock_2 = self.connect()
+        sock_1.sendall(build_message(b'<Request ID="1"/>'))
+        sock_2.sendall(build_message(b'<Request ID="2"/>'))
+        read_response(sock_1)
+        read_response(sock_2)
+
+        # the third client is refused while the others are connected
+        sock_3 = self.connect()
+        self.assertEqual(sock_3.recv(3), b'')
+
+        for sock in (sock_1, sock_2, sock_3):
+            sock.close()
+
+    def test_idle_timeout(self):
+        sock = self.connect()
+        # the server closes the connection after the idle timeout
+        self.assertEqual(sock.recv(3), b'')
+        sock.close()
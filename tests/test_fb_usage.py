@@ -0,0 +1,76 @@
+import time
+import tracemalloc
+import unittest
+
+from core import configuration
+from core import fb_usage
+from core.fb_resources import FBResources
+
+
+class Hoarder:
+
+    def schedule(self):
+        self.data = [bytes(1000) for _ in range(100)]
+
+
+class FakeFB:
+
+    def __init__(self, fb_obj):
+        self.fb_obj = fb_obj
+        self.usage = fb_usage.FBUsage()
+
+
+class TestFBUsage(unittest.TestCase):
+
+    def test_cpu_time(self):
+        usage = fb_usage.FBUsage()
+        started = usage.start()
+        end = time.thread_time() + 0.02
+        while time.thread_time() < end:
+            pass
+        usage.stop(started)
+        usage.stop(usage.start())
+        self.assertEqual(2, usage.executions)
+        self.assertGreaterEqual(usage.max_cpu_time, 0.02)
+        self.assertGreaterEqual(usage.cpu_time, usage.max_cpu_time)
+        self.assertAlmostEqual(usage.cpu_time / 2, usage.average())
+
+    def test_allocations(self):
+        was_tracing = tracemalloc.is_tracing()
+        fb_usage.start_tracing()
+        if not was_tracing:
+            self.addCleanup(tracemalloc.stop)
+        fb = FakeFB(Hoarder())
+        fb.fb_obj.schedule()
+        # the memory allocated in the source file of the fb
+        fb_usage.update_allocations([fb])
+        self.assertGreaterEqual(fb.usage.alloc_bytes, 100 * 1000)
+        self.assertEqual(fb.usage.alloc_bytes, fb.usage.alloc_delta)
+        fb.fb_obj.data = None
+        fb_usage.update_allocations([fb])
+        self.assertLess(fb.usage.alloc_delta, -90 * 1000)
+
+    def test_summary(self):
+        config = configuration.Configuration('EMB_RES', 'EMB_RES')
+        config.create_fb('PASS_1', FBResources('BENCH_PASS', config.fb_dict['BENCH_PASS']))
+        config.create_fb('PASS_2', FBResources('BENCH_PASS', config.fb_dict['BENCH_PASS']))
+        fb = config.get_fb('PASS_1')
+        self.addCleanup(config.stop_work)
+        fb.push_event('REQ', 1)
+        fb.push_event('REQ', 2)
+        # the queued events are counted before they run
+        self.assertEqual(2, fb.event_queue.qsize())
+        self.assertGreater(fb_usage.queue_bytes(fb), 0)
+
+        fb.start()
+        deadline = time.time() + 5
+        while fb.usage.executions < 2 and time.time() < deadline:
+            time.sleep(0.01)
+        rows = fb_usage.summary(config)
+        # the most expensive fb first
+        self.assertEqual(('PASS_1', 'BENCH_PASS', 2), rows[0][:3])
+        self.assertEqual(('PASS_2', 'BENCH_PASS', 0), rows[1][:3])
+        self.assertEqual(100.0, rows[0][4])
+        table = fb_usage.format_table(rows).splitlines()
+        self.assertEqual(3, len(table))
+        self.assertTrue(table[0].startswith('FB      TYPE'))
@@ -0,0 +1,68 @@
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+
+from core import configuration
+from core import manager
+
+FBOOT = (
+    ';<Request ID="1" Action="CREATE"><FB Name="EMB_RES" Type="EMB_RES" /></Request>\n'
+    'EMB_RES;<Request ID="2" Action="CREATE"><FB Name="PASS_1" Type="BENCH_PASS" /></Request>\n'
+    'EMB_RES;<Request ID="3" Action="WRITE"><Connection Source="2.5" Destination="PASS_1.VALUE" /></Request>\n'
+)
+
+
+class TestHeadless(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.manager_4diac = manager.Manager(headless=True)
+        self.loader = self.manager_4diac.create_fboot_manager('localhost', 4863)
+        self.loader.fboot_path = os.path.join(self.folder.name, 'data_model.fboot')
+        self.config = configuration.Configuration('EMB_RES', 'EMB_RES')
+        self.manager_4diac.set_config('EMB_RES', self.config)
+        self.loader(self.config)
+
+    def tearDown(self):
+        self.loader.stop_ua()
+        self.folder.cleanup()
+
+    def test_from_fboot(self):
+        with open(self.loader.fboot_path, 'w') as f:
+            f.write(FBOOT)
+        self.loader.from_fboot()
+
+        # START.COLD -> PASS_1.INIT is created from the fboot file
+        fb = self.config.get_fb('PASS_1')
+        self.assertTrue(fb.init_is_connected())
+        for _ in range(100):
+            if fb.read_attr('VALUE_O')[1] == 2.5:
+                break
+            time.sleep(0.01)
+        self.assertEqual(2.5, fb.read_attr('VALUE_O')[1])
+
+        # watches are served through the 4diac protocol
+        self.manager_4diac.parse_configuration(
+            '<Request ID="4" Action="CREATE"><Watch Source="PASS_1.VALUE_O" Destination="" /></Request>', 'EMB_RES')
+        response = self.manager_4diac.parse_general('<Request ID="5" Action="READ"><Watches /></Request>')
+        self.assertIn(b'PASS_1', response)
+
+    def test_save_fboot(self):
+        self.loader.save_fboot(['<Request ID="1" Action="CREATE"><FB Name="EMB_RES" Type="EMB_RES" /></Request>',
+                                '<Request ID="2" Action="CREATE"><FB Name="PASS_1" Type="BENCH_PASS" /></Request>'])
+        with open(self.loader.fboot_path) as f:
+            self.assertEqual(FBOOT.splitlines()[:2], f.read().splitlines())
+
+    def test_without_opcua(self):
+        # a fresh interpreter does not load the opc-ua stack
+        code = ('from core import manager; import sys; '
+                'manager.Manager(headless=True).create_fboot_manager(None, None); '
+                'print("opcua" in sys.modules)')
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join([root, os.path.join(root, 'core')]))
+        output = subprocess.run([sys.executable, '-c', code], cwd=root, env=env,
+                                capture_output=True, text=True, check=True).stdout
+        self.assertEqual('False', output.strip())
@@ -0,0 +1,90 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from opcua import ua
+
+from data_model_fboot import historian
+from opc_ua import client
+
+
+class HistorianTests(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+        # raw values for 10 s, 1 s averages for 1 hour
+        self.tiers = [historian.Tier(0, 5, 10), historian.Tier(1, 60, 3600)]
+        self.now = 1700000000.0
+
+    def test_tiers(self):
+        history = historian.Historian(self.path, tiers=self.tiers)
+        for index in range(40):
+            history.record('FB_1/VALUE', float(index), self.now - 20 + index * 0.5)
+        history.record('FB_1/TEXT', 'not a number', self.now)
+        history.flush(now=self.now)
+
+        # the recent values are raw
+        times, values = history.query('FB_1/VALUE', self.now - 5, self.now, now=self.now)
+        self.assertEqual(list(range(30, 40)), values.tolist())
+        # the older ones are averages of 1 s (the raw segments expired)
+        times, values = history.query('FB_1/VALUE', self.now - 20, self.now - 15, now=self.now)
+        self.assertEqual([0.5, 2.5, 4.5, 6.5, 8.5, 10.5], values.tolist())
+        self.assertEqual(self.now - 20, times[0])
+        self.assertLessEqual(len(os.listdir(os.path.join(self.path, 'FB_1', 'VALUE', 'raw'))), 6)
+        self.assertFalse(os.path.exists(os.path.join(self.path, 'FB_1', 'TEXT')))
+
+    def test_day_query(self):
+        history = historian.Historian(self.path, tiers=[historian.Tier(0, 60, 600), historian.Tier(1, 3600, 86400)])
+        # one day at 100 Hz, written in batches of one hour
+        for hour in range(24):
+            times = self.now - 86400 + hour * 3600 + np.arange(360000) / 100.0
+            history.append('FB_1/VALUE', times, np.full(len(times), float(hour)))
+            history.flush(now=times[-1])
+
+        start = time.perf_counter()
+        times, values = history.query('FB_1/VALUE', self.now - 86400, self.now, now=self.now)
+        elapsed = time.perf_counter() - start
+        self.assertEqual(86399, len(times))
+        self.assertEqual(23.0, values[-1])
+        self.assertLess(elapsed, 0.1)
+
+
+class HistoryReadTests(unittest.TestCase):
+
+    def setUp(self):
+        from core import configuration
+        from data_model_fboot import ua_manager
+
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+        self.ua_peer = ua_manager.UaManagerFboot('localhost', 4870, history_path=self.path)
+        self.addCleanup(self.ua_peer.stop_ua)
+        self.config = configuration.Configuration('EMB_RES', 'EMB_RES')
+        self.ua_peer(self.config)
+
+    def test_history_read(self):
+        from core.fb_resources import FBResources
+
+        self.ua_peer.parse_fbt(FBResources('BENCH_PASS', self.config.fb_dict['BENCH_PASS']), 'PASS_1')
+        item = self.ua_peer.ua_objects['PASS_1']
+        fb = self.config.get_fb('PASS_1')
+        for value in (1.0, 2.0, 3.0):
+            fb.set_attr('VALUE_O', value)
+            item.update_variables()
+            self.ua_peer.publisher.flush()
+
+        c = client.UaClient(self.ua_peer.endpoint)
+        self.addCleanup(c.disconnect)
+        node = c.find_node(item.folders['VarFolder']['path'] + ['VALUE_O'])
+        self.assertTrue(node.get_attribute(ua.AttributeIds.Historizing).Value.Value)
+        end = datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(seconds=1)
+        values = node.read_raw_history(end - timedelta(minutes=1), end)
+        self.assertEqual([1.0, 2.0, 3.0], [data_value.Value.Value for data_value in values])
+        # the newest first without a start time, limited to the requested number
+        values = node.read_raw_history(None, end, numvalues=2)
+        self.assertEqual([3.0, 2.0], [data_value.Value.Value for data_value in values])
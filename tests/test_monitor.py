@@ -0,0 +1,87 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from data_model_fboot import monitor
+
+
+class LogTailTests(unittest.TestCase):
+
+    def setUp(self):
+        folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, folder)
+        self.path = os.path.join(folder, 'error_list.log')
+        open(self.path, 'w').close()
+
+    def write(self, text, mode='a'):
+        with open(self.path, mode) as logs_file:
+            logs_file.write(text)
+
+    def test_tail(self):
+        tail = monitor.LogTail(self.path, capacity=3)
+        self.assertFalse(tail.poll())
+
+        self.write('[ERROR  |2024-01-01T00:00:00.000|FB_1] first\nTraceback\n  line 1\n[WARNING|2024-01-01T00:00:01.000|FB_2] sec')
+        self.assertTrue(tail.poll())
+        self.assertEqual([{'level': 'ERROR', 'timestamp': '2024-01-01T00:00:00.000', 'thread_name': 'FB_1',
+                           'message': 'first\nTraceback\n  line 1'}],
+                         [json.loads(value) for value in tail.values()])
+
+        # the end of the line is read by the next poll, from the saved offset
+        self.write('ond\n')
+        self.assertTrue(tail.poll())
+        self.assertEqual('second', json.loads(tail.values()[-1])['message'])
+        self.assertEqual(os.path.getsize(self.path), tail.offset)
+        self.assertFalse(tail.poll())
+
+        # only the newest entries are kept
+        for index in range(5):
+            self.write('[INFO   |2024-01-01T00:00:02.000|MainThread] entry {0}\n'.format(index))
+        tail.poll()
+        self.assertEqual(['entry 2', 'entry 3', 'entry 4'], [json.loads(value)['message'] for value in tail.values()])
+
+        # a truncated log is read again from the start
+        self.write('[ERROR  |2024-01-01T00:00:03.000|MainThread] new\n', mode='w')
+        self.assertTrue(tail.poll())
+        self.assertEqual('new', json.loads(tail.values()[-1])['message'])
+
+    def test_chunk(self):
+        tail = monitor.LogTail(self.path, chunk=64)
+        for index in range(10):
+            self.write('[INFO   |2024-01-01T00:00:00.000|MainThread] entry {0}\n'.format(index))
+        # each poll reads at most one chunk
+        tail.poll()
+        self.assertEqual(64, tail.offset)
+        while tail.poll():
+            pass
+        self.assertEqual(['entry {0}'.format(index) for index in range(10)],
+                         [json.loads(value)['message'] for value in tail.values()])
+
+
+class ProcessMetricsTests(unittest.TestCase):
+
+    def test_threads(self):
+        metrics = monitor.ProcessMetrics()
+        stop = threading.Event()
+
+        def busy():
+            while not stop.is_set():
+                sum(range(1000))
+
+        thread = threading.Thread(target=busy, name='BUSY_FB')
+        thread.start()
+        try:
+            time.sleep(0.3)
+            process, threads = metrics.sample()
+        finally:
+            stop.set()
+            thread.join()
+        self.assertGreater(process['PROCESS_RSS'], 0)
+        self.assertGreaterEqual(process['PROCESS_THREADS'], 2)
+        busy_thread = [item for item in threads if item[0] == 'BUSY_FB']
+        self.assertEqual(1, len(busy_thread))
+        self.assertGreater(busy_thread[0][1], 0.0)
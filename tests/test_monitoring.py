@@ -0,0 +1,184 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from core import monitoring
+from core import monitoring_log
+
+
+# batch versions of the window statistics, the reference of the incremental ones
+def since(ring, start_ns):
+    # copy of the timestamps of the ring newer than start_ns, oldest first
+    return newer_than(np.concatenate(ring.segments()), start_ns)
+
+
+def newer_than(timestamps, start_ns):
+    # view of the sorted timestamps newer than start_ns
+    return timestamps[np.searchsorted(timestamps, start_ns, side='right'):]
+
+
+def interval_stats(timestamps):
+    # count, mean and std (in seconds) of the time between consecutive events
+    intervals = np.diff(timestamps) / 1e9
+    count = len(intervals)
+    return [
+        count,
+        0 if count == 0 else round(float(intervals.mean()), 4),
+        0 if count <= 1 else round(float(intervals.std(ddof=1)), 4),
+    ]
+
+
+class TestTimestampRing(unittest.TestCase):
+
+    def test_since(self):
+        ring = monitoring.TimestampRing(capacity=8)
+        for timestamp in range(1, 6):
+            ring.append(timestamp * 10)
+
+        self.assertEqual(5, len(ring))
+        self.assertEqual([30, 40, 50], since(ring, 20).tolist())
+        self.assertEqual(3, ring.count_since(20))
+        self.assertEqual([10, 20, 30, 40, 50], since(ring, 0).tolist())
+        self.assertEqual([], since(ring, 50).tolist())
+
+    def test_wrap_around(self):
+        ring = monitoring.TimestampRing(capacity=4)
+        for timestamp in range(1, 11):
+            ring.append(timestamp)
+
+        # only the last 4 timestamps are kept, in order
+        self.assertEqual(4, len(ring))
+        self.assertEqual([7, 8, 9, 10], since(ring, 0).tolist())
+        self.assertEqual([9, 10], since(ring, 8).tolist())
+        self.assertEqual([8, 9, 10], since(ring, 7).tolist())
+        self.assertEqual(2, ring.count_since(8))
+
+    def test_interval_stats(self):
+        timestamps = np.array([0, 10**9, 3 * 10**9, 6 * 10**9])
+        count, mean, std = interval_stats(timestamps)
+        self.assertEqual(3, count)
+        self.assertEqual(2.0, mean)
+        self.assertEqual(1.0, std)
+
+        self.assertEqual([0, 0, 0], interval_stats(timestamps[:1]))
+        self.assertEqual([1, 1.0, 0], interval_stats(timestamps[:2]))
+        self.assertEqual([10**9, 3 * 10**9, 6 * 10**9],
+                         newer_than(timestamps, 0).tolist())
+
+
+class TestEventStatistics(unittest.TestCase):
+
+    def check_against_batch(self, capacity):
+        rng = np.random.default_rng(1)
+        timestamps = np.cumsum(rng.integers(1, 10**8, size=500))
+        windows = [2 * 10**9, 5 * 10**9, 10**10]
+        stats = monitoring.EventStatistics(windows, capacity=capacity)
+
+        for i, timestamp in enumerate(timestamps):
+            stats.append(int(timestamp))
+            if i % 37 == 0:
+                now = int(timestamp) + 10**7
+                expected = []
+                # only the last events fit in the ring
+                kept = timestamps[max(0, i + 1 - capacity):i + 1]
+                for window in windows:
+                    expected += interval_stats(newer_than(kept, now - window))
+                self.assertEqual(expected, stats.features(now))
+
+    def test_matches_batch_statistics(self):
+        self.check_against_batch(capacity=1024)
+
+    def test_ring_overwrite(self):
+        # the windows never hold more events than the ring
+        self.check_against_batch(capacity=64)
+
+    def test_ring_growth(self):
+        # 100 events per second in a 10 s window do not fit in 64 slots
+        stats = monitoring.EventStatistics([10**10], capacity=64, max_capacity=4096)
+        timestamps = np.arange(1, 1001) * 10**7
+        for timestamp in timestamps:
+            stats.append(int(timestamp))
+        self.assertEqual(1024, stats.ring.capacity)
+        self.assertFalse(stats.truncated)
+        now = int(timestamps[-1])
+        expected = interval_stats(newer_than(timestamps, now - 10**10))
+        self.assertEqual(expected, stats.features(now))
+
+        # at the maximum capacity the windows keep the newest events and it is logged once
+        stats = monitoring.EventStatistics([10**10], capacity=64, max_capacity=128)
+        with mock.patch.object(monitoring.logger, 'warning') as warning:
+            for timestamp in timestamps:
+                stats.append(int(timestamp))
+        self.assertTrue(stats.truncated)
+        self.assertEqual(1, warning.call_count)
+        self.assertEqual(128, stats.ring.capacity)
+        self.assertEqual(127, stats.features(now)[0])
+
+    def test_extra_features(self):
+        stats = monitoring.EventStatistics([10**10], features=('p50', 'p90', 'burstiness'))
+        for timestamp in [0, 10**8, 3 * 10**8, 6 * 10**8, 10 * 10**8]:
+            stats.append(timestamp)
+
+        intervals = np.array([0.1, 0.2, 0.3, 0.4])
+        p50, p90, burstiness = stats.features(10**9)
+        self.assertEqual(round(np.percentile(intervals, 50), 4), p50)
+        self.assertEqual(round(np.percentile(intervals, 90), 4), p90)
+        mean, std = intervals.mean(), intervals.std(ddof=1)
+        self.assertEqual(round((std - mean) / (std + mean), 4), burstiness)
+
+    def test_expired_window(self):
+        stats = monitoring.EventStatistics([10**9])
+        stats.append(0)
+        stats.append(10**8)
+        self.assertEqual([1, 0.1, 0], stats.features(5 * 10**8))
+        self.assertEqual([0, 0, 0], stats.features(5 * 10**9))
+        # a new event does not pair with the expired ones
+        stats.append(6 * 10**9)
+        self.assertEqual([0, 0, 0], stats.features(6 * 10**9))
+
+
+class TestMonitoringLog(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.path = monitoring_log.log_path(self.folder.name, 'FB_1')
+        self.log = monitoring_log.MonitoringLog(self.path, ['A', 'B'], buffer_records=4)
+
+    def tearDown(self):
+        self.log.close()
+        self.folder.cleanup()
+
+    def test_buffered_writes(self):
+        reader = monitoring_log.LogReader(self.path)
+        self.log.events(3, 2)
+        # nothing is written before the flush
+        self.assertEqual(0, len(reader.read()))
+        self.log.flush()
+        records = reader.read()
+        self.assertEqual(['A', 'B'], reader.algorithms)
+        self.assertEqual([(3.0, 2.0)], list(zip(records['x'], records['y'])))
+
+        # a full buffer is written by the next append
+        for i in range(5):
+            self.log.sample('B', [i, -i], -1)
+        records = reader.read()
+        self.assertEqual(4, len(records))
+        self.assertEqual([1] * 4, records['algorithm'].tolist())
+        self.assertEqual([-1] * 4, records['label'].tolist())
+
+    def test_cursor(self):
+        self.log.training([[0.5, 1.5], [2.5, 3.5]])
+        self.log.flush()
+        reader = monitoring_log.LogReader(self.path)
+        kinds = reader.read()['kind'].tolist()
+        self.assertEqual([monitoring_log.RESET, monitoring_log.TRAINING, monitoring_log.TRAINING] * 2, kinds)
+
+        # a new reader continues from the saved cursor
+        self.log.events(1, 1)
+        self.log.flush()
+        resumed = monitoring_log.LogReader(self.path, cursor=reader.cursor)
+        self.assertEqual([monitoring_log.EVENTS], resumed.read()['kind'].tolist())
+        self.assertEqual(os.path.getsize(self.path), resumed.cursor)
@@ -1,8 +1,10 @@
 from opcua import ua
+import importlib.util
 import time
 import unittest
 from opc_ua import client
 from opc_ua import handler
+from opc_ua import node_builder
 from opc_ua import peer
 from opc_ua.examples import methods_example
 
@@ -19,6 +21,8 @@ class OpcUaTests(unittest.TestCase):
 
     def setUp(self):
         self.peer = peer.UaPeer(self.address)
+        # a cleanup, so the clients of the tests disconnect before the server stops
+        self.addCleanup(self.peer.stop)
         self.peer.create_object(2, self.object_name)
         object_path = self.peer.generate_path([(2, self.object_name)])
         self.peer.create_variable(object_path, 2, self.var_name, 6.01, True)
@@ -31,9 +35,6 @@ class OpcUaTests(unittest.TestCase):
         self.peer.create_folder(object_path, 2, self.folder_name)
         self.peer.create_property(object_path, 2, self.property_name, 'This is a property')
 
-    def tearDown(self):
-        self.peer.stop()
-
     def test_subscription(self):
         c = client.UaClient(self.address)
 
@@ -46,6 +47,86 @@ class OpcUaTests(unittest.TestCase):
 
         c.disconnect()
 
+    def test_subscription_groups(self):
+        import threading
+
+        class RecordHandler:
+            def __init__(self):
+                self.values = dict()
+                self.changed = threading.Condition()
+
+            def datachange_notification(self, node, val, data):
+                with self.changed:
+                    self.values.setdefault(node.get_browse_name().Name, []).append(val)
+                    self.changed.notify_all()
+
+            def wait(self, name, value):
+                with self.changed:
+                    return self.changed.wait_for(lambda: value in self.values.get(name, []), 5)
+
+        object_path = self.peer.generate_path([(2, self.object_name)])
+        paths = []
+        for index in range(3):
+            self.peer.create_variable(object_path, 2, 'Sub{0}'.format(index), float(index), True)
+            paths.append(object_path + ['2:Sub{0}'.format(index)])
+        c = client.UaClient(self.address)
+        self.addCleanup(c.disconnect)
+        record = RecordHandler()
+
+        self.assertNotEqual(c.generate_key(paths[0]), c.generate_key(paths[1]))
+        c.subscribe_many(paths[:2], record, period=50)
+        c.subscribe(paths[2], record, period=200)
+        # one subscription per publishing interval
+        self.assertEqual([50, 200], sorted(c.subscriptions.groups))
+        self.assertEqual(3, len(c.subscriptions.items))
+
+        self.peer.write(paths[1], ua.Variant(11.0))
+        self.peer.write(paths[2], ua.Variant(12.0))
+        self.assertTrue(record.wait('Sub1', 11.0))
+        self.assertTrue(record.wait('Sub2', 12.0))
+
+        c.unsubscribe_many(paths[:2])
+        self.assertEqual([200], list(c.subscriptions.groups))
+        c.unsubscribe(paths[2])
+        self.assertEqual(0, len(c.subscriptions.groups))
+
+        # a failed subscribe does not keep the subscription created for it
+        from unittest import mock
+        from opcua.common.subscription import Subscription
+
+        with mock.patch.object(Subscription, 'subscribe_data_change', side_effect=ua.UaError('refused')), \
+                mock.patch.object(Subscription, 'delete', autospec=True, side_effect=Subscription.delete) as delete:
+            self.assertRaises(ua.UaError, c.subscribe_many, paths[:2], record, 100)
+        self.assertEqual(1, delete.call_count)
+        self.assertEqual(0, len(c.subscriptions.groups))
+        self.assertEqual(0, len(c.subscriptions.items))
+
+    def test_notification_pool(self):
+        import threading
+        from opc_ua import subscriptions
+
+        started = threading.Event()
+        release = threading.Event()
+        handled = []
+
+        class SlowHandler:
+            def datachange_notification(self, node, val, data):
+                started.set()
+                release.wait(5)
+                handled.append(val)
+
+        pool = subscriptions.NotificationPool(workers=1, max_pending=2)
+        self.addCleanup(pool.stop)
+        pool.submit(SlowHandler(), None, 0, None)
+        started.wait(5)
+        for val in range(1, 5):
+            pool.submit(SlowHandler(), None, val, None)
+        release.set()
+        pool.join()
+        # the worker was busy with the first one, the oldest queued were dropped
+        self.assertEqual(2, pool.dropped)
+        self.assertEqual([0, 3, 4], handled)
+
     def test_method(self):
         c = client.UaClient(self.address)
 
@@ -91,3 +172,424 @@ class OpcUaTests(unittest.TestCase):
         peer_aux.stop()
 
         self.assertEqual(len(peer_aux.client_dictionary), 0)
+
+    def test_client_bulk(self):
+        object_path = self.peer.generate_path([(2, self.object_name)])
+        paths = []
+        for index in range(20):
+            self.peer.create_variable(object_path, 2, 'Tag{0}'.format(index), float(index), True)
+            paths.append(object_path + ['2:Tag{0}'.format(index)])
+        self.peer.add_client(self.address)
+        self.addCleanup(self.peer.remove_all_clients)
+        c = self.peer.client_dictionary[self.address]
+        requests = []
+        get_attributes = c.uaclient.get_attributes
+        c.uaclient.get_attributes = lambda *args: requests.append(args) or get_attributes(*args)
+
+        self.assertEqual([float(index) for index in range(20)], self.peer.client_read_many(self.address, paths))
+        self.peer.client_write_many(self.address, paths, [index * 2.0 for index in range(20)])
+        self.assertEqual([index * 2.0 for index in range(20)], self.peer.client_read_many(self.address, paths))
+        # one read request for the 20 variables
+        self.assertEqual(2, len(requests))
+
+    def test_client_reconnect(self):
+        path = self.peer.generate_path([(2, self.object_name), (2, self.var_name)])
+        self.peer.add_client(self.address)
+        self.addCleanup(self.peer.remove_all_clients)
+        self.assertEqual(6.01, self.peer.client_read(self.address, path))
+
+        # the connection is lost, the next request opens a new one
+        self.peer.client_dictionary[self.address].disconnect_socket()
+        self.assertEqual(6.01, self.peer.client_read(self.address, path))
+
+    def test_client_endpoints(self):
+        import threading
+
+        path = self.peer.generate_path([(2, self.object_name), (2, self.var_name)])
+        peer_aux = peer.UaPeer(self.address_auxiliary)
+        try:
+            self.peer.add_client(self.address)
+            self.peer.add_client(self.address_auxiliary)
+            # a busy endpoint does not block the requests to the others
+            with self.peer.client_locks[self.address_auxiliary]:
+                results = []
+                thread = threading.Thread(target=lambda: results.append(self.peer.client_read(self.address, path)))
+                thread.start()
+                thread.join(5)
+                self.assertEqual([6.01], results)
+        finally:
+            self.peer.remove_all_clients()
+            peer_aux.stop()
+
+    def test_node_cache(self):
+        var_path = self.peer.generate_path([(2, self.object_name), (2, self.var_name)])
+        # the created nodes are cached with their browse path
+        var = self.peer.node_cache[tuple(var_path)]
+        self.assertEqual(var.nodeid, self.peer.root.get_child(var_path).nodeid)
+
+        folder_path = self.peer.generate_path([(2, self.object_name), (2, self.folder_name)])
+        new_var = self.peer.create_variable(folder_path, 2, 'CachedVar', 1.5)
+        self.assertEqual(1.5, new_var.get_value())
+
+        # read and write do not resolve the browse path again
+        root = self.peer.root
+        self.peer.root = None
+        try:
+            self.peer.write(var_path, 2.5)
+            self.assertEqual(2.5, self.peer.read(var_path))
+            self.assertEqual(1.5, self.peer.read(folder_path + ['2:CachedVar']))
+        finally:
+            self.peer.root = root
+
+    def test_client_node_cache(self):
+        c = client.UaClient(self.address)
+
+        path = self.peer.generate_path([(2, self.object_name), (2, self.var_name)])
+        self.assertEqual(6.01, c.read(path))
+        self.assertIn(tuple(path), c.node_cache)
+
+        # a new session browses the paths again
+        c.disconnect()
+        c.connect()
+        self.assertEqual(0, len(c.node_cache))
+        self.assertEqual(6.01, c.read(path))
+
+        c.disconnect()
+
+
+class NodeBuilderTests(unittest.TestCase):
+    address = 'opc.tcp://localhost:4843'
+
+    def setUp(self):
+        self.peer = peer.UaPeer(self.address)
+        # a cleanup, so the clients of the tests disconnect before the server stops
+        self.addCleanup(self.peer.stop)
+
+    def test_commit(self):
+        builder = node_builder.NodeBuilder(self.peer)
+        objects = ['0:Objects']
+        builder.create_object(2, 'BuiltObject', path=objects)
+        object_path = objects + ['2:BuiltObject']
+        builder.create_folder(object_path, 'ns=2;s=BuiltObject:Folder', '2:Folder')
+        var = builder.create_typed_variable(object_path + ['2:Folder'], 'ns=2;s=BuiltObject:Folder:Var', 'Var',
+                                            ua.VariantType.Float, 0, writable=True)
+        builder.create_method(object_path, 2, 'hello_word', methods_example.hello_word,
+                              input_args=[ua.VariantType.String], output_args=[ua.VariantType.Boolean])
+        # the method arguments are properties of the method node
+        self.assertEqual(6, len(builder))
+        # nothing is in the address space before the commit
+        self.assertRaises(ua.UaError, self.peer.get_objects_node().get_child, ['2:BuiltObject'])
+
+        committed = []
+        builder.on_commit(lambda: committed.append(True))
+        builder.commit()
+        self.assertEqual([True], committed)
+        self.assertEqual(0, len(builder))
+
+        var.set_value(ua.Variant(1.5, ua.VariantType.Float))
+        self.assertEqual(1.5, self.peer.read(object_path + ['2:Folder', 'Var']))
+        self.assertEqual(ua.NodeId(ua.ObjectIds.FolderType),
+                         self.peer.get_objects_node().get_child(['2:BuiltObject', '2:Folder']).get_type_definition())
+        self.assertIn(ua.AccessLevel.CurrentWrite, var.get_access_level())
+        self.assertEqual(True, self.peer.call_method(object_path + ['2:hello_word'], 'World'))
+
+
+class BackendTests(unittest.TestCase):
+    address = 'opc.tcp://localhost:4866'
+
+    def test_select(self):
+        from opc_ua import backend
+
+        ua_peer = peer.UaPeer(self.address)
+        try:
+            self.assertIsInstance(ua_peer.backend, backend.OpcUaBackend)
+            # the server methods of the stack are still available
+            self.assertEqual(ua_peer.backend.server.get_objects_node(), ua_peer.get_objects_node())
+        finally:
+            ua_peer.stop()
+        self.assertRaises(ValueError, backend.select, 'unknown')
+        # the modules already have the python-opcua types
+        self.assertRaises(RuntimeError, backend.select, 'asyncua')
+        backend.select('opcua')
+
+    @unittest.skipUnless(importlib.util.find_spec('asyncua'), 'asyncua is not installed')
+    def test_asyncua(self):
+        import os
+        import subprocess
+        import sys
+
+        code = ('from opc_ua import backend; backend.select("asyncua"); '
+                'from opc_ua import peer, node_builder; from opc_ua.backend import ua; '
+                'p = peer.UaPeer("{0}"); b = node_builder.NodeBuilder(p); '
+                'b.create_object(2, "Obj", path=["0:Objects"]); '
+                'v = b.create_variable(["0:Objects", "2:Obj"], 2, "Var", 1.0); b.commit(); '
+                'p.write_values([v.nodeid], [ua.Variant(2.5, ua.VariantType.Double)]); '
+                'print(p.read(["0:Objects", "2:Obj", "2:Var"])); p.stop()').format(self.address)
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join([root, os.path.join(root, 'core')]))
+        output = subprocess.run([sys.executable, '-c', code], cwd=root, env=env,
+                                capture_output=True, text=True, timeout=60, check=True).stdout
+        self.assertEqual('2.5', output.strip().splitlines()[-1])
+
+
+class UaObjectTests(unittest.TestCase):
+
+    def setUp(self):
+        from core import configuration
+        from data_model_fboot import ua_manager
+
+        self.ua_peer = ua_manager.UaManagerFboot('localhost', 4864)
+        self.config = configuration.Configuration('EMB_RES', 'EMB_RES')
+        self.ua_peer(self.config)
+        self.addCleanup(self.ua_peer.stop_ua)
+
+    def test_rebuild(self):
+        from core.fb_resources import FBResources
+
+        self.ua_peer.parse_fbt(FBResources('BENCH_PASS', self.config.fb_dict['BENCH_PASS']), 'PASS_1')
+        item = self.ua_peer.ua_objects['PASS_1']
+        self.assertEqual(['VALUE', 'VALUE_O', 'INIT', 'REQ', 'INIT_O', 'CNF'], list(item.ua_vars))
+        var_path = item.folders['VarFolder']['path'] + ['VALUE']
+        self.ua_peer.write(var_path, ua.Variant(2.5, ua.VariantType.Float))
+
+        # the subtree is added again, with the initial values
+        item.rebuild()
+        self.assertEqual([], self.ua_peer.read(var_path))
+        item.ua_vars['VALUE'].set_value(ua.Variant(1.5, ua.VariantType.Float))
+        self.assertEqual(1.5, self.ua_peer.read(var_path))
+
+    def test_writable_inputs(self):
+        from core.fb_resources import FBResources
+
+        self.ua_peer.parse_fbt(FBResources('BENCH_SETPOINT', self.config.fb_dict['BENCH_SETPOINT']), 'SETPOINT_1')
+        item = self.ua_peer.ua_objects['SETPOINT_1']
+        fb = self.config.get_fb('SETPOINT_1')
+        fb.start()
+        var_path = item.folders['VarFolder']['path']
+        c = client.UaClient(self.ua_peer.endpoint)
+        self.addCleanup(c.disconnect)
+
+        # both inputs are set by one write, which raises one REQ event
+        c.write_many([var_path + ['SETPOINT'], var_path + ['GAIN']],
+                     [ua.Variant(4.0, ua.VariantType.Double), ua.Variant(0.5, ua.VariantType.Double)])
+        deadline = time.time() + 5
+        while item.published.get('VALUE_O') != 2.0 and time.time() < deadline:
+            self.ua_peer.publisher.flush()
+            time.sleep(0.01)
+        self.assertEqual(2.0, c.read(var_path + ['VALUE_O']))
+        self.assertEqual(2, self.ua_peer.inputs.applied)
+        self.assertEqual(1, fb.read_attr('REQ')[1])
+
+        # the inputs mirrored back by the publisher are not client writes
+        self.ua_peer.publisher.flush()
+        c.write(var_path + ['GAIN'], ua.Variant(2.0, ua.VariantType.Double))
+        deadline = time.time() + 5
+        while self.ua_peer.inputs.applied < 3 and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(2.0, fb.read_attr('GAIN')[1])
+        self.assertEqual(1, fb.read_attr('REQ')[1])
+
+    def test_usage(self):
+        from core.fb_resources import FBResources
+
+        self.ua_peer.parse_fbt(FBResources('BENCH_PASS', self.config.fb_dict['BENCH_PASS']), 'PASS_3')
+        item = self.ua_peer.ua_objects['PASS_3']
+        fb = self.config.get_fb('PASS_3')
+        fb.start()
+        for value in range(3):
+            fb.push_event('REQ', value + 1)
+        deadline = time.time() + 5
+        while fb.usage.executions < 3 and time.time() < deadline:
+            time.sleep(0.01)
+
+        self.ua_peer.monitor_hardware.update_usage()
+        usage_path = item.folders['UsageFolder']['path']
+        self.assertEqual(3, self.ua_peer.read(usage_path + ['2:EXECUTIONS']))
+        self.assertEqual(fb.usage.cpu_time, self.ua_peer.read(usage_path + ['2:CPU_TIME']))
+        # the table of every fb, on demand
+        summary = self.ua_peer.call_method(self.ua_peer.monitor_hardware.folder_path + ['2:USAGE_SUMMARY'])
+        self.assertEqual(['FB', 'PASS_3'], [line.split()[0] for line in summary.splitlines()])
+
+    def test_update_variables(self):
+        from core.fb_resources import FBResources
+
+        self.ua_peer.parse_fbt(FBResources('BENCH_PASS', self.config.fb_dict['BENCH_PASS']), 'PASS_2')
+        item = self.ua_peer.ua_objects['PASS_2']
+        fb = self.config.get_fb('PASS_2')
+        writes = []
+        write_values = self.ua_peer.write_values
+        self.ua_peer.write_values = lambda nodeids, variants: writes.append(len(nodeids)) or write_values(nodeids, variants)
+
+        fb.set_attr('VALUE', 2)
+        item.update_variables()
+        self.ua_peer.publisher.flush()
+        # the variables without a value are not written, the integer is written as a LREAL
+        self.assertEqual([1], writes)
+        self.assertEqual(ua.Variant(2.0, ua.VariantType.Double), item.ua_vars['VALUE'].get_data_value().Value)
+
+        # only the changed ones are written again
+        item.update_variables()
+        self.ua_peer.publisher.flush()
+        fb.set_attr('VALUE_O', 1.5)
+        fb.set_attr('CNF', 1)
+        item.update_variables()
+        self.ua_peer.publisher.flush()
+        self.assertEqual([1, 2], writes)
+        self.assertEqual(1.5, item.ua_vars['VALUE_O'].get_value())
+
+        # values without an opc-ua type are written as strings
+        fb.set_attr('VALUE', {'a': 1})
+        item.update_variables()
+        self.ua_peer.publisher.flush()
+        self.assertEqual("{'a': 1}", item.ua_vars['VALUE'].get_value())
+
+
+class UaMethodTests(unittest.TestCase):
+    address = 'opc.tcp://localhost:4865'
+
+    def setUp(self):
+        from xml.etree import ElementTree as ETree
+        from core import configuration
+        from core.fb_resources import FBResources
+        from data_model_fboot import ua_manager
+        from data_model_fboot import ua_method
+
+        self.ua_peer = ua_manager.UaManagerFboot('localhost', 4865)
+        self.config = configuration.Configuration('EMB_RES', 'EMB_RES')
+        self.ua_peer(self.config)
+        self.addCleanup(self.ua_peer.stop_ua)
+        # PASS_A -> PASS_B, called with PASS_A.VALUE and returning both VALUE_O
+        for fb_name in ('PASS_A', 'PASS_B'):
+            self.ua_peer.parse_fbt(FBResources('BENCH_PASS', self.config.fb_dict['BENCH_PASS']), fb_name)
+        self.config.create_connection('PASS_A.CNF', 'PASS_B.REQ')
+        self.config.create_connection('PASS_A.VALUE_O', 'PASS_B.VALUE')
+        self.ua_peer.method_event = 'PASS_A.REQ'
+        self.ua_peer.method_final_fb = 'PASS_B'
+        self.method = ua_method.UaMethod(self.ua_peer, self.ua_peer.folders['OPC-UA_Methods'],
+                                         ETree.Element('FBType', {'Name': 'PIPE'}))
+        self.client = client.UaClient(self.address)
+        self.addCleanup(self.client.disconnect)
+
+    def call(self, value):
+        folder = self.client.find_node(self.ua_peer.folders['OPC-UA_Methods']['path'])
+        return folder.call_method('2:PIPE', ua.Variant(value, ua.VariantType.Double), '1')
+
+    def test_concurrent_calls(self):
+        import threading
+
+        self.config.get_fb('PASS_A').start()
+        self.config.get_fb('PASS_B').start()
+        results = dict()
+
+        def call(value):
+            results[value] = self.call(value)
+
+        threads = [threading.Thread(target=call, args=(float(value),)) for value in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+        # each call gets the values of its own execution
+        self.assertEqual({float(value): [float(value), float(value)] for value in range(20)}, results)
+
+    def test_server_not_blocked(self):
+        import threading
+
+        results = []
+        thread = threading.Thread(target=lambda: results.append(self.call(3.0)))
+        thread.start()
+        # the fbs are not running: the call waits, the other requests are answered
+        time.sleep(0.2)
+        var_path = self.ua_peer.ua_objects['PASS_A'].folders['VarFolder']['path'] + ['VALUE_O']
+        self.client.find_node(var_path).get_value()
+        self.assertEqual([], results)
+
+        self.config.get_fb('PASS_A').start()
+        self.config.get_fb('PASS_B').start()
+        thread.join(10)
+        self.assertEqual([[3.0, 3.0]], results)
+
+    def test_local_call(self):
+        self.config.get_fb('PASS_A').start()
+        self.config.get_fb('PASS_B').start()
+        # without the server loop the method waits for the final fb
+        result = self.method._UaMethod__execute(None, ua.Variant(4.0), ua.Variant('1'))
+        self.assertEqual([ua.Variant(4.0), ua.Variant(4.0)], result)
+
+
+class ManagerRedeployTests(unittest.TestCase):
+
+    def setUp(self):
+        import os
+        import sys
+        import tempfile
+        from core import manager
+
+        # the resources of the delete request are read next to sys.path[0]
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        resources = os.path.join(folder.name, 'resources')
+        os.makedirs(os.path.join(resources, 'monitoring'))
+        for name in ('data_model.fboot', 'data_model_copy.fboot'):
+            open(os.path.join(resources, name), 'w').close()
+        self.addCleanup(sys.path.__setitem__, 0, sys.path[0])
+        sys.path[0] = os.path.join(folder.name, 'core')
+
+        self.manager_4diac = manager.Manager(history_path=os.path.join(folder.name, 'history'))
+        self.manager_4diac.ua_integration = True
+        self.manager_4diac.build_ua_manager_fboot('localhost', 4872)
+        self.addCleanup(lambda: self.manager_4diac.manager_ua_fboot.stop_ua())
+
+    def test_delete(self):
+        old_manager = self.manager_4diac.manager_ua_fboot
+        self.manager_4diac.parse_general(
+            '<Request ID="1" Action="DELETE"><FB Name="EMB_RES" Type="EMB_RES" /></Request>')
+
+        # the new manager serves on the port of the stopped one
+        new_manager = self.manager_4diac.manager_ua_fboot
+        self.assertIsNot(old_manager, new_manager)
+        self.assertFalse(old_manager.monitor_hardware.is_alive())
+        self.assertFalse(old_manager.publisher.is_alive())
+        c = client.UaClient('opc.tcp://localhost:4872')
+        self.addCleanup(c.disconnect)
+        self.assertEqual('DINASORE OPC-UA', c.find_node(new_manager.ROOT_PATH).get_browse_name().Name)
+
+    def test_create(self):
+        import threading
+
+        managers = [self.manager_4diac.manager_ua_fboot]
+        # waiting to be written when the first redeploy arrives
+        recorded = time.time()
+        managers[0].historian.record('PASS_1/VALUE', 2.5, timestamp=recorded)
+        for request_id in ('1', '2'):
+            self.manager_4diac.parse_general(
+                '<Request ID="{0}" Action="CREATE"><FB Name="EMB_RES" Type="EMB_RES" /></Request>'.format(request_id))
+            managers.append(self.manager_4diac.manager_ua_fboot)
+
+        # every redeploy stops the threads of the previous manager
+        self.assertEqual(3, len(set(map(id, managers))))
+        for old_manager in managers[:-1]:
+            self.assertFalse(old_manager.monitor_hardware.is_alive())
+            self.assertFalse(old_manager.publisher.is_alive())
+            self.assertFalse(old_manager.historian.is_alive())
+        names = [thread.name for thread in threading.enumerate()]
+        for name in ('ua_publisher', 'historian', 'monitoring_thread'):
+            self.assertEqual(1, names.count(name))
+        # the new historian reads what the stopped one wrote in the same directory
+        times, values = managers[-1].historian.query('PASS_1/VALUE', recorded - 1, recorded + 1)
+        self.assertEqual(([recorded], [2.5]), (times.tolist(), values.tolist()))
+
+    def test_create_anomaly_publisher(self):
+        from core import anomaly
+
+        service = anomaly.AnomalyService(tick=1, processes=False)
+        self.addCleanup(service.stop)
+        old_manager = self.manager_4diac.manager_ua_fboot
+        old_manager.add_anomaly_service(service)
+        self.manager_4diac.parse_general(
+            '<Request ID="1" Action="CREATE"><FB Name="EMB_RES" Type="EMB_RES" /></Request>')
+
+        # the shared service no longer publishes to the replaced manager
+        self.assertEqual([], service.publishers)
+        self.manager_4diac.manager_ua_fboot.add_anomaly_service(service)
+        self.assertEqual([self.manager_4diac.manager_ua_fboot.publish_anomaly], service.publishers)
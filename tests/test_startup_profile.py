@@ -0,0 +1,44 @@
+import time
+import unittest
+
+from core import startup_profile
+
+
+class TestStartupProfile(unittest.TestCase):
+
+    def setUp(self):
+        self.profile = startup_profile.StartupProfile()
+
+    def test_nested_phases(self):
+        with self.profile.phase("outer"):
+            time.sleep(0.02)
+            with self.profile.phase("inner"):
+                time.sleep(0.05)
+        # the inner phase is not accounted twice
+        self.assertLess(self.profile.phases["outer"][1], self.profile.phases["inner"][1])
+        self.assertGreaterEqual(self.profile.phases["inner"][1], 0.05)
+
+    def test_repeated_phases(self):
+        for _ in range(3):
+            with self.profile.phase("fb creation"):
+                pass
+        self.assertEqual(3, self.profile.phases["fb creation"][0])
+        report = self.profile.report().splitlines()
+        self.assertEqual(["phase", "fb creation", "total"], [line[:16].strip() for line in report])
+
+    def test_timed(self):
+        @startup_profile.timed("timed test")
+        def work(value):
+            return value * 2
+
+        self.assertEqual(4, work(2))
+        self.assertEqual(1, startup_profile.profile.phases["timed test"][0])
+
+    def test_stop(self):
+        with self.profile.phase("fboot parsing"):
+            pass
+        self.profile.stop()
+        with self.profile.phase("fboot parsing"):
+            with self.profile.phase("fb creation"):
+                pass
+        self.assertEqual({"fboot parsing": 1}, {name: entry[0] for name, entry in self.profile.phases.items()})
@@ -0,0 +1,75 @@
+import unittest
+
+from data_model_fboot import ua_publisher
+
+
+class FakeItem:
+
+    def __init__(self, fb_name):
+        self.fb_name = fb_name
+        self.published = dict()
+        self.batches = []
+
+    def changed(self, var_name, value):
+        return var_name not in self.published or self.published[var_name] != value
+
+    def publish(self, values):
+        self.batches.append(dict(values))
+        for var_name, (_, value) in values.items():
+            self.published[var_name] = value
+        return len(values)
+
+
+class TestUaPublisher(unittest.TestCase):
+
+    def test_coalesce(self):
+        publisher = ua_publisher.UaPublisher()
+        item = FakeItem('FB_1')
+        publisher.push(item, {'A': ('REAL', 1.0), 'B': ('INT', 1)})
+        # the newer value replaces the pending one
+        publisher.push(item, {'A': ('REAL', 2.0), 'B': ('INT', 1)})
+        self.assertEqual(2, publisher.queue_depth)
+        self.assertEqual(1, publisher.dropped)
+
+        publisher.flush()
+        self.assertEqual([{'A': ('REAL', 2.0), 'B': ('INT', 1)}], item.batches)
+        self.assertEqual({'queue_depth': 0, 'max_queue_depth': 2, 'dropped': 1, 'published': 2},
+                         publisher.stats())
+
+        # the values already published are not queued again
+        publisher.push(item, {'A': ('REAL', 2.0), 'B': ('INT', 3)})
+        self.assertEqual(1, publisher.queue_depth)
+        publisher.flush()
+        self.assertEqual({'B': ('INT', 3)}, item.batches[-1])
+
+    def test_rate(self):
+        publisher = ua_publisher.UaPublisher(max_rate=10)
+        publisher.set_rate('FB_1', 1, var_name='B')
+        item = FakeItem('FB_1')
+
+        publisher.push(item, {'A': ('REAL', 1.0), 'B': ('INT', 1)})
+        due, wait = publisher.take_due(100.0)
+        self.assertEqual([(item, {'A': ('REAL', 1.0), 'B': ('INT', 1)})], due)
+        self.assertIsNone(wait)
+
+        # each variable waits for its own period
+        publisher.push(item, {'A': ('REAL', 2.0), 'B': ('INT', 2)})
+        due, wait = publisher.take_due(100.05)
+        self.assertEqual([], due)
+        self.assertAlmostEqual(0.05, wait)
+        due, wait = publisher.take_due(100.1)
+        self.assertEqual([(item, {'A': ('REAL', 2.0)})], due)
+        self.assertAlmostEqual(0.9, wait)
+        due, wait = publisher.take_due(101.0)
+        self.assertEqual([(item, {'B': ('INT', 2)})], due)
+        self.assertEqual(0, publisher.queue_depth)
+
+    def test_thread(self):
+        publisher = ua_publisher.UaPublisher()
+        publisher.start()
+        item = FakeItem('FB_1')
+        publisher.push(item, {'A': ('REAL', 1.0)})
+        publisher.stop()
+        publisher.flush()
+        self.assertEqual({'A': 1.0}, item.published)
+        self.assertFalse(publisher.is_alive())